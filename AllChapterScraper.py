@@ -1,7 +1,15 @@
+import argparse
 import requests
-from bs4 import BeautifulSoup, NavigableString
+from bs4 import BeautifulSoup
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin
+from chapter_downloader import ChapterDownloader
+from chapter_extractor import DEFAULT_EXTRACTOR, EXTRACTORS, get_extractor
+from chapter_manifest import ChapterManifest
+from html_cache import CACHE_DIR, HtmlCache, read_object
+import profiling
 
 base_url = "https://www.piaotia.com"
 toc_url = "https://www.piaotia.com/html/3/3224/"
@@ -16,77 +24,213 @@ headers = {
 }
 
 # Step 1: Scrape all chapter links from the ToC
-def get_all_chapter_links():
-    response = requests.get(toc_url, headers=headers)
+def get_all_chapter_links(http=requests, url=toc_url, manifest=None):
+    request_headers = dict(headers)
+    if manifest is not None:
+        request_headers.update(manifest.toc_conditional_headers(url))
+    with profiling.phase("toc fetch"):
+        response = http.get(url, headers=request_headers)
+    if response.status_code == 304 and manifest is not None:
+        links = manifest.toc_links()
+        print(f"✅ ToC not modified; {len(links)} chapter links from manifest.")
+        return links
+    response.raise_for_status()
     response.encoding = "gbk"  # Site uses Chinese encoding
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    links = []
-    for li in soup.select("ul li a"):
-        href = li.get("href")
-        title = li.get_text(strip=True)
-        if href and href.endswith(".html"):
-            full_url = base_url + "/html/3/3224/" + href
-            links.append((title, full_url))
+    with profiling.phase("toc parse", cpu=True):
+        soup = BeautifulSoup(response.text, "html.parser")
+
+        links = []
+        for li in soup.select("ul li a"):
+            href = li.get("href")
+            title = li.get_text(strip=True)
+            if href and href.endswith(".html"):
+                full_url = urljoin(url, href)
+                links.append((title, full_url))
     print(f"✅ Found {len(links)} chapter links.")
+    if manifest is not None:
+        manifest.record_toc(url, links, response.headers)
     return links
 
-# Step 2: Extract chapter text from its HTML page
-def extract_chapter_text(soup, chapter_number):
-    title_tag = soup.find("h1")
-    title = title_tag.get_text(strip=True) if title_tag else f"Chapter {chapter_number}"
-
-    content_lines = []
-    first_br = soup.find("br")
-    while first_br and not isinstance(first_br, NavigableString):
-        if first_br.name == "br":
-            break
-        first_br = first_br.next_element
-
-    current = first_br
-    while current:
-        if isinstance(current, NavigableString):
-            line = current.strip()
-            if line:
-                content_lines.append(line)
-        elif getattr(current, "name", None) == "br":
-            content_lines.append("")
-        elif getattr(current, "name", None) == "div" and current.get("class") == ["bottomlink"]:
-            break
-        current = current.next_element
-
-    content = "\n".join(content_lines).strip()
-    return title, content
+# Step 2: Extract chapter text from its HTML page (see chapter_extractor for the backends)
+extractor = DEFAULT_EXTRACTOR
+# Raw responses are kept here (see html_cache) so extraction fixes can be replayed offline.
+html_cache = None
 
 # Step 3: Save chapter to .txt file
+def chapter_path(number):
+    return os.path.join(output_folder, f"ch{number:04d}.txt")
+
 def save_chapter(title, content, number):
     os.makedirs(output_folder, exist_ok=True)
-    filename = os.path.join(output_folder, f"ch{number:04d}.txt")
-    with open(filename, "w", encoding="utf-8") as f:
+    filename = chapter_path(number)
+    with profiling.phase("save chapter"), open(filename, "w", encoding="utf-8") as f:
         f.write(title + "\n\n" + content)
     print(f"✅ Saved: {filename}")
 
 # Step 4: Download a chapter by URL
-def process_chapter(index, url):
+def parse_chapter(response, index):
+    response.encoding = "gb2312"  # Works with both gb2312 and gbk
+    with profiling.phase("extract", cpu=True):
+        return get_extractor(extractor)(response.text, index)
+
+def cache_response(url, index, response):
+    if html_cache is not None:
+        with profiling.phase("html cache write"):
+            html_cache.put(url, index, response.content, response.encoding or "gb2312")
+
+def fetch_chapter(index, url, http=requests):
+    with profiling.phase("fetch"):
+        response = http.get(url, headers=headers)
+    response.raise_for_status()
+    title, content = parse_chapter(response, index)
+    cache_response(url, index, response)
+    save_chapter(title, content, index)
+
+def process_chapter(index, url, http=requests):
     try:
-        response = requests.get(url, headers=headers)
-        response.encoding = "gb2312"  # Works with both gb2312 and gbk
-        soup = BeautifulSoup(response.text, "html.parser")
-        title, content = extract_chapter_text(soup, index)
-        save_chapter(title, content, index)
+        fetch_chapter(index, url, http)
+        return True
     except Exception as e:
         print(f"❌ Failed to process chapter {index}: {url}\nReason: {e}")
+        return False
+
+# Step 5: Incremental sync — only chapters that are new, moved, retitled or missing locally
+def plan_sync(links, manifest, start, end, recheck=False):
+    """Return (index, toc_title, url, reason) for every chapter in the range that needs a request."""
+    jobs = []
+    for i, (title, url) in enumerate(links[start - 1:end], start=start):
+        reason = manifest.needs_fetch(i, title, url, chapter_path(i))
+        if reason:
+            jobs.append((i, title, url, reason))
+        elif recheck:
+            jobs.append((i, title, url, "recheck"))
+    return jobs
+
+def sync_chapter(index, toc_title, url, manifest, http=requests, conditional=False):
+    """Fetch one chapter, rewriting the .txt only if its content hash changed. Returns True if changed."""
+    request_headers = dict(headers)
+    if conditional:
+        request_headers.update(manifest.chapter_conditional_headers(url))
+    with profiling.phase("fetch"):
+        response = http.get(url, headers=request_headers)
+    if response.status_code == 304:
+        manifest.touch(url)
+        return False
+    response.raise_for_status()
+    title, content = parse_chapter(response, index)
+    cache_response(url, index, response)
+    with profiling.phase("manifest"):
+        changed = manifest.record_chapter(url, index, toc_title, title + "\n\n" + content, response.headers)
+    if changed or not os.path.exists(chapter_path(index)):
+        save_chapter(title, content, index)
+    return changed
+
+def run_sync(downloader, args):
+    manifest = ChapterManifest(args.manifest)
+    try:
+        links = get_all_chapter_links(downloader, args.toc_url, manifest)
+        jobs = plan_sync(links, manifest, args.start or 1, args.end or len(links), recheck=args.recheck)
+        titles = {i: (title, reason) for i, title, _, reason in jobs}
+        print(f"🔎 {len(jobs)} chapter(s) to fetch out of {len(links)} in the ToC.")
+        report = downloader.run(
+            [(i, url) for i, _, url, _ in jobs],
+            lambda i, url: sync_chapter(i, titles[i][0], url, manifest, downloader,
+                                        conditional=titles[i][1] == "recheck"),
+        )
+    finally:
+        manifest.save()
+    return report, len(jobs)
+
+# Step 6: Rebuild chapter files from the raw HTML cache, no network
+def _reextract_one(job):
+    index, path, encoding, extractor_name = job
+    html = read_object(path).decode(encoding, errors="replace")  # same decode as requests' response.text
+    title, content = get_extractor(extractor_name)(html, index)
+    return index, title, content
+
+def reextract_all(cache, start=None, end=None, jobs=None):
+    latest = {}  # chapter index -> newest cache entry for it
+    for entry in cache.index.values():
+        i = entry["index"]
+        if (start and i < start) or (end and i > end):
+            continue
+        if i not in latest or entry["fetched"] > latest[i]["fetched"]:
+            latest[i] = entry
+    work = [
+        (i, cache.object_path(e["sha256"]), e.get("encoding") or "gb2312", extractor)
+        for i, e in sorted(latest.items())
+    ]
+    # Extraction runs in worker processes, so it shows up here as "reextract (pool)" minus the saves.
+    with profiling.phase("reextract (pool)"), ProcessPoolExecutor(max_workers=jobs) as pool:
+        for index, title, content in pool.map(_reextract_one, work, chunksize=16):
+            save_chapter(title, content, index)
+    return len(work)
 
 # Main routine
 def main():
-    links = get_all_chapter_links()
-    start_ch = 1
-    end_ch = 10
-    test_links = links[start_ch - 1:end_ch]  # Adjusting for 0-based indexing
-
-    for i, (title, url) in enumerate(test_links, start=start_ch):
-        process_chapter(i, url)
-        time.sleep(1)  # polite delay between requests
+    parser = argparse.ArgumentParser(description="Download piaotian chapters listed in the ToC.")
+    parser.add_argument("--start", type=int, help="First chapter (1-based ToC position). Default 1.")
+    parser.add_argument("--end", type=int, help="Last chapter (inclusive). Default 10, or the whole ToC with --sync.")
+    parser.add_argument("--toc-url", default=toc_url)
+    parser.add_argument("--workers", type=int, default=4, help="Parallel download workers.")
+    parser.add_argument("--rate", type=float, default=1.0, help="Max requests per second per host.")
+    parser.add_argument("--max-in-flight", type=int, default=2, help="Max concurrent requests per host.")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per chapter, with exponential backoff.")
+    parser.add_argument("--sync", action="store_true",
+                        help="Incremental mode: conditional ToC request, fetch only new/changed chapters.")
+    parser.add_argument("--recheck", action="store_true",
+                        help="With --sync, also send conditional requests for chapters already downloaded.")
+    parser.add_argument("--manifest", default=os.path.join(output_folder, "manifest.json"))
+    parser.add_argument("--extractor", choices=sorted(EXTRACTORS), default=DEFAULT_EXTRACTOR,
+                        help="Chapter body extractor backend.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Raw HTML cache directory.")
+    parser.add_argument("--no-html-cache", action="store_true", help="Do not store raw responses.")
+    parser.add_argument("--reextract", action="store_true",
+                        help="Rebuild chapter files from the raw HTML cache only (no network).")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Processes for --reextract.")
+    parser.add_argument("--profile", action="store_true", help="Print a per-phase timing breakdown (or set PROFILE=1).")
+    parser.add_argument("--profile-dir", help="Also cProfile the CPU-bound phases and write .pstats files here.")
+    args = parser.parse_args()
+
+    global extractor, html_cache
+    extractor = args.extractor
+    if args.profile or args.profile_dir:
+        profiling.enable(args.profile_dir)
+    else:
+        profiling.enable_from_env()
+
+    if args.reextract:
+        t0 = time.perf_counter()
+        count = reextract_all(HtmlCache(args.cache_dir), args.start, args.end, args.jobs)
+        print(f"🏁 Re-extracted {count} chapters from {args.cache_dir} in {time.perf_counter() - t0:.1f}s.")
+        profiling.report()
+        return
+
+    if not args.no_html_cache:
+        html_cache = HtmlCache(args.cache_dir)
+    downloader = ChapterDownloader(headers, workers=args.workers, rate=args.rate,
+                                   max_in_flight=args.max_in_flight, retries=args.retries)
+    try:
+        if args.sync:
+            report, total = run_sync(downloader, args)
+        else:
+            start = args.start or 1
+            end = args.end or 10
+            links = get_all_chapter_links(downloader, args.toc_url)
+            test_links = links[start - 1:end]  # Adjusting for 0-based indexing
+            jobs = [(i, url) for i, (title, url) in enumerate(test_links, start=start)]
+            total = len(jobs)
+            report = downloader.run(jobs, lambda i, url: fetch_chapter(i, url, downloader))
+    finally:
+        downloader.close()
+        if html_cache is not None:
+            html_cache.save()
+
+    print(f"🏁 Downloaded {len(report.succeeded)}/{total} chapters in {report.elapsed:.1f}s "
+          f"({report.attempts} attempts).")
+    if report.failed:
+        print(f"❌ Failed chapters: {[i for i, _, _ in report.failed]}")
+    profiling.report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,80 @@
+import argparse
+import re
+from pathlib import Path
+from typing import Dict
+
+from glossary_matcher import ANNOTATION_MODES, annotate_with_glossary, find_terms, glossary_table, load_glossary
+
+try:
+    import tiktoken  # type: ignore
+except ImportError:
+    tiktoken = None
+
+CJK_RE = re.compile(r"[　-〿一-鿿＀-￯]")
+
+
+def make_token_counter():
+    """Exact counts with tiktoken when installed, else ~1 token per CJK char plus 1 per 4 other chars."""
+    if tiktoken is not None:
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text)), "tiktoken o200k_base"
+
+    def estimate(text: str) -> int:
+        cjk = len(CJK_RE.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+    return estimate, "estimate (install tiktoken for exact counts)"
+
+
+def measure_chapter(text: str, glossary: Dict[str, str], matcher, every: int, count_tokens) -> Dict[str, tuple]:
+    """(chars, tokens) of the annotated chapter, plus the term table, for every mode."""
+    hits = find_terms(text, matcher)
+    sizes = {}
+    for mode in ANNOTATION_MODES:
+        annotated = annotate_with_glossary(text, glossary, hits=hits, mode=mode, every=every)
+        if mode == "table" and len(hits):
+            annotated = glossary_table(hits) + "\n\n" + annotated
+        sizes[mode] = (len(annotated), count_tokens(annotated))
+    sizes["raw"] = (len(text), count_tokens(text))
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report prompt size per glossary annotation mode across the raw corpus.")
+    parser.add_argument("--dir", default="piaotian_chapters", help="Raw chapter folder (chXXXX.txt).")
+    parser.add_argument("--glossary", default="glossary.json")
+    parser.add_argument("--every", type=int, default=10, help="Paragraph window for the 'paragraphs' mode.")
+    parser.add_argument("--limit", type=int, help="Only the first N chapters.")
+    args = parser.parse_args()
+
+    files = sorted(Path(args.dir).glob("ch*.txt"))[:args.limit]
+    if not files:
+        print(f"No chapters found in {args.dir}")
+        return
+    glossary, matcher = load_glossary(args.glossary)
+    count_tokens, token_source = make_token_counter()
+
+    totals = {mode: [0, 0] for mode in ("raw",) + ANNOTATION_MODES}
+    for path in files:
+        sizes = measure_chapter(path.read_text(encoding="utf-8"), glossary, matcher, args.every, count_tokens)
+        for mode, (chars, tokens) in sizes.items():
+            totals[mode][0] += chars
+            totals[mode][1] += tokens
+
+    raw_chars, raw_tokens = totals["raw"]
+    all_chars, all_tokens = totals["all"]
+    print(f"📊 {len(files)} chapters, {len(glossary)} glossary terms, tokens: {token_source}")
+    print(f"{'mode':<16} | {'chars':>11} | {'tokens':>10} | {'annotation tokens':>17} | {'saved vs all':>12}")
+    for mode in ("raw",) + ANNOTATION_MODES:
+        chars, tokens = totals[mode]
+        label = f"{mode} ({args.every})" if mode == "paragraphs" else mode
+        overhead = tokens - raw_tokens
+        saved = (all_tokens - tokens) / all_tokens * 100 if all_tokens else 0.0
+        saved_text = f"{saved:>11.1f}%" if mode != "raw" else f"{'':>12}"
+        print(f"{label:<16} | {chars:>11,} | {tokens:>10,} | {overhead:>17,} | {saved_text}")
+    if all_tokens > raw_tokens:
+        print(f"Inline annotations in 'all' mode add {(all_tokens - raw_tokens) / raw_tokens * 100:.1f}% to the chapter text "
+              f"({(all_chars - raw_chars) / len(files):,.0f} chars per chapter).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare the single-pass glossary annotator against the old per-term re.sub loop.
+
+Also times loading the compiled matcher from the on-disk cache (what every run after the
+first pays) and a chapter scan that reuses one GlossaryHits for annotation.
+
+Usage: python benchmarks/bench_annotate.py [--sizes 1000 10000 50000] [--chars 6000]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import glossary_matcher
+from glossary_matcher import (annotate_with_glossary, annotate_with_glossary_loop, compile_glossary,
+                             find_terms, load_matcher)
+
+HANZI = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)]
+FILLER = "，。！？“”的了是在他她我你这那说道"
+
+
+def make_glossary(size: int, rng: random.Random) -> dict:
+    glossary = {}
+    while len(glossary) < size:
+        term = "".join(rng.choice(HANZI) for _ in range(rng.choice((2, 2, 3, 3, 4, 5))))
+        glossary[term] = f"Term {len(glossary)}"
+    return glossary
+
+
+def make_chapter(glossary: dict, chars: int, rng: random.Random) -> str:
+    terms = list(glossary)
+    parts = []
+    length = 0
+    while length < chars:
+        if rng.random() < 0.15:
+            piece = rng.choice(terms)
+        else:
+            piece = "".join(rng.choice(FILLER + "".join(HANZI[:200])) for _ in range(rng.randint(3, 12)))
+        if rng.random() < 0.05:
+            piece += "\n\n"
+        parts.append(piece)
+        length += len(piece)
+    return "".join(parts)
+
+
+def timed(fn, *args, repeat=1):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark glossary annotation engines.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--chars", type=int, default=6000, help="Synthetic chapter length in characters.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'terms':>7} | {'loop (s)':>9} | {'compile (s)':>11} | {'cached (s)':>10} | {'scan (s)':>9} | "
+          f"{'speedup':>8} | {'hits':>5} | identical")
+    for size in args.sizes:
+        glossary = make_glossary(size, rng)
+        chapter = make_chapter(glossary, args.chars, rng)
+        loop_time, expected = timed(annotate_with_glossary_loop, chapter, glossary, repeat=args.repeat)
+        compile_time, matcher = timed(compile_glossary, glossary)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            glossary_matcher._pickle_written = False  # every size writes its own pickle
+            load_matcher(glossary, cache_dir)
+            glossary_matcher._matchers.clear()
+            cached_time, matcher = timed(load_matcher, glossary, cache_dir)
+            glossary_matcher._matchers.clear()
+        scan_time, actual = timed(annotate_with_glossary, chapter, glossary, matcher, repeat=args.repeat)
+        hits = find_terms(chapter, matcher)
+        speedup = loop_time / (cached_time + scan_time)
+        print(f"{size:>7} | {loop_time:>9.4f} | {compile_time:>11.4f} | {cached_time:>10.4f} | {scan_time:>9.4f} | "
+              f"{speedup:>7.1f}x | {len(hits):>5} | {actual == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Per-update cost of maintaining chapters.json: full rebuild vs the incremental indexer.
+
+Each round rewrites one chapter (as a translation or edit would) and then refreshes the index:
+  legacy       the old update_chapters_index (list, open and stat every file, rewrite)
+  incremental  chapters_index.update_chapters_index with a directory scan
+  changed      chapters_index.update_chapters_index told which file was written
+The resulting chapters.json must be identical in all three modes.
+
+Usage: python benchmarks/bench_chapters_index.py [--files 5000] [--rounds 20]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+from chapters_index import update_chapters_index
+
+
+def legacy_update_chapters_index(chapters_dir, output_file):
+    chapters = []
+    for fname in sorted(os.listdir(chapters_dir)):
+        if fname.endswith(".md"):
+            path = os.path.join(chapters_dir, fname)
+            title = fname
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        title = line.lstrip("#").strip()
+                        break
+            mtime = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).isoformat()
+            chapters.append({"id": fname[:-3], "title": title, "updated": mtime})
+    with open(output_file, "w", encoding="utf-8") as out:
+        json.dump(chapters, out, ensure_ascii=False, indent=2)
+
+
+def write_chapter(directory: Path, n: int, revision: int = 0):
+    body = "\n\n".join(f"Paragraph {p} of chapter {n}, revision {revision}." for p in range(60))
+    (directory / f"ch{n:04}.md").write_text(f"# Chapter {n}: Title r{revision}\n\n{body}\n", encoding="utf-8")
+
+
+def run_mode(directory: Path, mode: str, rounds: int, files: int):
+    output = directory / "chapters.json"
+    times = []
+    for r in range(rounds):
+        n = (r * 37) % files + 1
+        write_chapter(directory, n, revision=r + 1)
+        t0 = time.perf_counter()
+        if mode == "legacy":
+            legacy_update_chapters_index(str(directory), str(output))
+        elif mode == "incremental":
+            update_chapters_index(str(directory), str(output))
+        else:
+            update_chapters_index(str(directory), str(output), changed=[str(directory / f"ch{n:04}.md")])
+        times.append(time.perf_counter() - t0)
+    return times, output.read_text(encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chapters.json maintenance.")
+    parser.add_argument("--files", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'files':>6} | {'mode':<12} | {'first (ms)':>10} | {'median/update (ms)':>18} | identical")
+    for files in args.files:
+        results = {}
+        for mode in ("legacy", "incremental", "changed"):
+            with tempfile.TemporaryDirectory() as tmp:
+                directory = Path(tmp)
+                for n in range(1, files + 1):
+                    write_chapter(directory, n)
+                    os.utime(directory / f"ch{n:04}.md", ns=(n * 10**9, n * 10**9))
+                t0 = time.perf_counter()
+                if mode == "legacy":
+                    legacy_update_chapters_index(str(directory), str(directory / "chapters.json"))
+                else:
+                    update_chapters_index(str(directory))
+                first = time.perf_counter() - t0
+                times, final = run_mode(directory, mode, args.rounds, files)
+                # mtimes of the rewritten files differ between runs; compare ids and titles.
+                results[mode] = [(c["id"], c["title"]) for c in json.loads(final)]
+                median = sorted(times)[len(times) // 2]
+            same = results[mode] == results["legacy"]
+            print(f"{files:>6} | {mode:<12} | {first * 1000:>10.1f} | {median * 1000:>18.2f} | {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Wall-clock time of one long chapter: single request vs paragraph-aligned concurrent chunks.
+
+The fake API charges a fixed latency plus a per-completion-token delay, so a single request for a
+long chapter is dominated by generation time, as with the real model. With --fail-rate some calls
+fail with HTTP 500 and only the affected chunk is retried.
+
+Usage: python benchmarks/bench_chunked_translation.py [--paragraphs 240] [--budgets 0 4000 2000 1000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+REPO = HERE.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(HERE))
+
+from fake_openai_server import FakeOpenAI, start_server
+from fake_piaotian_server import chapter_paragraphs
+
+
+def seed_workdir(workdir: Path, paragraphs: int):
+    shutil.copy(REPO / "rules.md", workdir / "rules.md")
+    shutil.copy(REPO / "glossary.json", workdir / "glossary.json")
+    raw = workdir / "piaotian_chapters"
+    raw.mkdir()
+    paras = []
+    index = 1
+    while len(paras) < paragraphs:
+        paras.extend(chapter_paragraphs(index))
+        index += 1
+    text = "第1章 很长的章节\n\n" + "\n\n".join(paras[:paragraphs - 1])
+    (raw / "ch0001.txt").write_text(text, encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunked translation of a long chapter.")
+    parser.add_argument("--paragraphs", type=int, default=240)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 4000, 2000, 1000],
+                        help="Chunk budgets in characters; 0 = single request.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--per-token", type=float, default=0.002, help="Fake seconds per completion token.")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    api = FakeOpenAI(latency=args.latency, per_token=args.per_token, fail_rate=args.fail_rate)
+    server, base_url = start_server(api)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    os.environ["LLM_CACHE"] = "0"
+    os.environ["TM"] = "0"
+
+    print(f"{'budget':>7} | {'calls':>5} | {'seconds':>8} | {'paragraphs out':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        seed_workdir(workdir, args.paragraphs)
+        os.chdir(workdir)
+        import translatorV3 as tr
+        tr.CHUNK_WORKERS = args.workers
+        for budget in args.budgets:
+            calls = api.calls
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = tr.translate_chapter("0001", verbose=False, mirror_to_obsidian=False, chunk_chars=budget)
+            elapsed = time.perf_counter() - t0
+            output = Path(summary["output_path"]).read_text(encoding="utf-8")
+            out_paras = len(set(re.findall(r"^@P(\d+):", output, flags=re.MULTILINE)))
+            label = "single" if budget == 0 else str(budget)
+            print(f"{label:>7} | {api.calls - calls:>5} | {elapsed:>8.2f} | {out_paras:>6}/{summary['paragraphs']}")
+        os.chdir(REPO)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Throughput of the pooled, concurrent downloader against the local fake piaotian server.
+
+Compares the old sequential loop (fresh requests.get per chapter, fixed sleep) with
+ChapterDownloader at several worker counts. Nothing touches the network.
+
+Usage: python benchmarks/bench_downloader.py [--chapters 60] [--latency 0.05] [--fail-rate 0.05]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import AllChapterScraper as scraper
+from chapter_downloader import ChapterDownloader
+from fake_piaotian_server import FakeSite, start_server
+
+
+def run_sequential(links, sleep):
+    start = time.perf_counter()
+    ok = 0
+    for i, (_, url) in enumerate(links, start=1):
+        ok += scraper.process_chapter(i, url)
+        time.sleep(sleep)
+    return ok, time.perf_counter() - start
+
+
+def run_concurrent(links, workers, rate, max_in_flight, retries):
+    downloader = ChapterDownloader(scraper.headers, workers=workers, rate=rate, max_in_flight=max_in_flight,
+                                   retries=retries, backoff=0.05)
+    jobs = [(i, url) for i, (_, url) in enumerate(links, start=1)]
+    try:
+        report = downloader.run(jobs, lambda i, url: scraper.fetch_chapter(i, url, downloader))
+    finally:
+        downloader.close()
+    return len(report.succeeded), report.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chapter download throughput.")
+    parser.add_argument("--chapters", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server delay per request (s).")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--sleep", type=float, default=1.0, help="Sleep used by the sequential baseline.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--rate", type=float, default=0, help="Per-host requests/sec limit (0 = unlimited).")
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    site = FakeSite(args.chapters, args.latency, args.fail_rate)
+    server, toc = start_server(site)
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper.output_folder = tmp
+        links = scraper.get_all_chapter_links(url=toc)
+
+        rows = []
+        ok, elapsed = run_sequential(links, args.sleep)
+        rows.append((f"sequential (sleep {args.sleep}s)", ok, elapsed, site.max_in_flight))
+        for workers in args.workers:
+            site.max_in_flight = 0
+            ok, elapsed = run_concurrent(links, workers, args.rate, args.max_in_flight, retries=3)
+            rows.append((f"pooled, {workers} workers", ok, elapsed, site.max_in_flight))
+    server.shutdown()
+
+    print(f"\n{'mode':<28} | {'ok':>5} | {'seconds':>8} | {'chapters/s':>10} | peak in-flight")
+    for name, ok, elapsed, peak in rows:
+        print(f"{name:<28} | {ok:>5} | {elapsed:>8.2f} | {ok / elapsed:>10.1f} | {peak}")
+
+
+if __name__ == "__main__":
+    main()
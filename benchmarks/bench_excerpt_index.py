@@ -0,0 +1,113 @@
+"""Excerpt lookup: scanning every final_chapters/ch*.md vs the persistent FTS5 excerpt index.
+
+Builds a synthetic corpus of translated chapters in a temporary directory, then runs the same
+queries (single-paragraph phrases, phrases crossing @P boundaries, excerpts cut mid-word and
+phrases that appear nowhere) through retranslate_excerpt.scan_chapters and ExcerptIndex.search.
+Results must be identical.
+
+Usage: python benchmarks/bench_excerpt_index.py [--chapters 1000] [--paragraphs 80] [--queries 40]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+from excerpt_index import ExcerptIndex
+from retranslate_excerpt import scan_chapters
+
+WORDS = ("the sect elder qi realm sword disciple heaven dao martial peak yang kai palace spirit stone "
+         "ancient beast demon saint master pill formation array technique soul domain void emperor").split()
+
+
+def make_paragraph(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(12, 40))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice([".", "!", "?", ",\" he said."])
+
+
+def write_corpus(directory: Path, chapters: int, paragraphs: int, rng: random.Random):
+    directory.mkdir()
+    corpus = {}
+    for n in range(1, chapters + 1):
+        paras = [make_paragraph(rng) for _ in range(paragraphs)]
+        body = "\n\n".join(f"@P{i}: {p}" for i, p in enumerate(paras, 1))
+        text = f"# Chapter {n}\n\n=== TRANSLATION START ===\n{body}\n=== TRANSLATION END ===\n"
+        (directory / f"ch{n:04}.md").write_text(text, encoding="utf-8")
+        corpus[n] = paras
+    return corpus
+
+
+def make_queries(corpus, count: int, rng: random.Random):
+    queries = []
+    for q in range(count):
+        paras = corpus[rng.randint(1, len(corpus))]
+        i = rng.randrange(len(paras) - 1)
+        kind = q % 4
+        if kind == 0:    # whole words inside one paragraph
+            words = paras[i].split()
+            start = rng.randrange(len(words) - 4)
+            queries.append(" ".join(words[start:start + rng.randint(3, 6)]))
+        elif kind == 1:  # crosses a paragraph boundary
+            queries.append(" ".join(paras[i].split()[-3:] + paras[i + 1].split()[:3]))
+        elif kind == 2:  # cut mid-word at both ends
+            start = rng.randrange(len(paras[i]) // 2)
+            queries.append(paras[i][start:start + rng.randint(15, 40)])
+        else:            # not in the corpus
+            queries.append("the jade beauty whispered softly " + str(q))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark excerpt lookup.")
+    parser.add_argument("--chapters", type=int, default=1000)
+    parser.add_argument("--paragraphs", type=int, default=80)
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        corpus = write_corpus(Path("final_chapters"), args.chapters, args.paragraphs, rng)
+        queries = make_queries(corpus, args.queries, rng)
+
+        t0 = time.perf_counter()
+        index = ExcerptIndex("excerpts.sqlite3")
+        index.refresh()
+        build = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index.refresh()
+        noop_refresh = time.perf_counter() - t0
+
+        scan_times, index_times, identical = [], [], 0
+        for query in queries:
+            t0 = time.perf_counter()
+            expected = scan_chapters(query)
+            scan_times.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            index.refresh()
+            actual = index.search(query)
+            index_times.append(time.perf_counter() - t0)
+            identical += actual == expected
+        index.close()
+        os.chdir(HERE)
+
+    def median_ms(times):
+        return sorted(times)[len(times) // 2] * 1000
+
+    print(f"{args.chapters} chapters x {args.paragraphs} paragraphs, {len(queries)} queries")
+    print(f"index build: {build:.2f}s, no-op refresh: {noop_refresh * 1000:.1f} ms")
+    print(f"scan all files : median {median_ms(scan_times):8.1f} ms/query")
+    print(f"excerpt index  : median {median_ms(index_times):8.1f} ms/query (including refresh)")
+    print(f"identical results: {identical}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
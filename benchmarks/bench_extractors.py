@@ -0,0 +1,75 @@
+"""Check that every extractor backend gives identical (title, content) and report pages/sec.
+
+The corpus is the GBK fixture pages in benchmarks/fixtures/pages plus synthetic pages from
+the fake piaotian server; --pages-dir adds any directory of saved GBK chapter pages.
+
+Usage: python benchmarks/bench_extractors.py [--synthetic 300] [--repeat 3] [--pages-dir DIR]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+from chapter_extractor import EXTRACTORS, UnsupportedMarkup, extract_streaming
+from fake_piaotian_server import render_chapter_page
+
+FIXTURE_DIR = HERE / "fixtures" / "pages"
+
+
+def load_corpus(synthetic: int, pages_dir=None):
+    corpus = []
+    dirs = [FIXTURE_DIR] + ([Path(pages_dir)] if pages_dir else [])
+    for directory in dirs:
+        for path in sorted(directory.glob("*.html")):
+            corpus.append((path.name, path.read_bytes().decode("gbk", errors="replace")))
+    for i in range(1, synthetic + 1):
+        corpus.append((f"synthetic-{i}", render_chapter_page(i)))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chapter extractor backends.")
+    parser.add_argument("--synthetic", type=int, default=300, help="Synthetic pages added to the fixtures.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pages-dir", help="Extra directory of GBK .html chapter pages.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.synthetic, args.pages_dir)
+    results = {}
+    print(f"{'backend':<8} | {'pages':>6} | {'best (s)':>9} | {'pages/s':>9}")
+    for name, extract in EXTRACTORS.items():
+        best = None
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            out = [extract(html, i) for i, (_, html) in enumerate(corpus, start=1)]
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = out
+        print(f"{name:<8} | {len(corpus):>6} | {best:>9.4f} | {len(corpus) / best:>9.1f}")
+
+    fallbacks = []
+    for i, (label, html) in enumerate(corpus, start=1):
+        try:
+            extract_streaming(html, i)
+        except UnsupportedMarkup as e:
+            fallbacks.append(f"{label}: {e}")
+    print(f"\nstreaming fast path handled {len(corpus) - len(fallbacks)}/{len(corpus)} pages; bs4 fallback for:")
+    for line in fallbacks:
+        print(f"  {line}")
+
+    reference = results["bs4"]
+    mismatches = [
+        corpus[i][0] for name, out in results.items() for i, pair in enumerate(out) if pair != reference[i]
+    ]
+    if mismatches:
+        print(f"\n❌ Output differs from bs4 on: {sorted(set(mismatches))}")
+        sys.exit(1)
+    print("\n✅ All backends produced byte-identical (title, content) on the corpus.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""locate_excerpt_in_chapter: legacy growing-string span search vs the offset-table version.
+
+Chapters have 500+ paragraphs; queries are phrases inside one paragraph, phrases crossing a
+boundary (placed towards the end of the chapter, the legacy worst case), near-misses that only
+the fuzzy fallback resolves, and phrases that do not occur.
+
+The legacy span search always starts its run at the first paragraph (every longer prefix also
+contains the phrase), so for boundary-crossing phrases it returns P1..Pj. The new search returns
+the covering run Pi..Pj; the check is that both agree on single-paragraph hits, fuzzy hits and
+on the final paragraph of a span, and that the new span is a suffix of the legacy one.
+
+Usage: python benchmarks/bench_locate_excerpt.py [--paragraphs 500 1000] [--queries 12]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+from retranslate_excerpt import NormalisedChapter, locate_excerpt_in_chapter, normalise
+
+WORDS = ("the sect elder qi realm sword disciple heaven dao martial peak yang kai palace spirit stone "
+         "ancient beast demon saint master pill formation array technique soul domain void emperor").split()
+
+
+def legacy_locate(paragraphs, excerpt, fuzzy=False):
+    phrase = normalise(excerpt)
+    if not phrase:
+        return None
+    hits = [pnum for pnum, txt in paragraphs if phrase in normalise(txt)]
+    if hits:
+        return hits
+    norm_paras = [normalise(txt) for _, txt in paragraphs]
+    n = len(norm_paras)
+    for i in range(n):
+        acc = norm_paras[i]
+        if phrase in acc:
+            return [paragraphs[i][0]]
+        for j in range(i + 1, n):
+            acc += ' ' + norm_paras[j]
+            if phrase in acc:
+                return [paragraphs[k][0] for k in range(i, j + 1)]
+    if fuzzy:
+        phrase_tokens = set(phrase.split())
+        scored = []
+        for pnum, txt in paragraphs:
+            tokens = set(normalise(txt).split())
+            inter = phrase_tokens & tokens
+            if inter:
+                scored.append((len(inter), pnum))
+        if scored:
+            scored.sort(reverse=True)
+            best_count = scored[0][0]
+            return [p for c, p in scored if c == best_count]
+    return None
+
+
+def make_chapter(paragraphs: int, rng: random.Random):
+    # Distinct per-paragraph markers keep boundary phrases from also occurring earlier.
+    return [(i, f"Para{i} " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 45))) + f"  end{i}.")
+            for i in range(1, paragraphs + 1)]
+
+
+def make_queries(chapter, count: int, rng: random.Random):
+    n = len(chapter)
+    queries = []
+    for q in range(count):
+        i = rng.randrange(n * 3 // 4, n - 1)
+        kind = q % 4
+        if kind == 0:
+            queries.append(chapter[i][1][:30])
+        elif kind == 1:
+            queries.append(f"end{i + 1}. Para{i + 2}")
+        elif kind == 2:
+            queries.append(f"sword MISSPELT{q} end{i + 1}. Para{i + 1} xyz")
+        else:
+            queries.append(f"jade beauty {q}")
+    return queries
+
+
+def agree(new, old):
+    if new is None or old is None:
+        return new == old
+    return new == old or (new[-1] == old[-1] and old[-len(new):] == new)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark excerpt span matching.")
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[500, 1000])
+    parser.add_argument("--queries", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'paragraphs':>10} | {'legacy ms/query':>15} | {'new ms/query':>12} | {'reused ms/query':>15} | agree")
+    for n in args.paragraphs:
+        chapter = make_chapter(n, rng)
+        queries = make_queries(chapter, args.queries, rng)
+
+        t0 = time.perf_counter()
+        expected = [legacy_locate(chapter, q, fuzzy=True) for q in queries]
+        legacy = (time.perf_counter() - t0) / len(queries)
+
+        t0 = time.perf_counter()
+        actual = [locate_excerpt_in_chapter(chapter, q, fuzzy=True) for q in queries]
+        new = (time.perf_counter() - t0) / len(queries)
+
+        prepared = NormalisedChapter(chapter)
+        t0 = time.perf_counter()
+        reused = [locate_excerpt_in_chapter(prepared, q, fuzzy=True) for q in queries]
+        reused_time = (time.perf_counter() - t0) / len(queries)
+
+        ok = sum(agree(a, e) and a == r for a, e, r in zip(actual, expected, reused))
+        print(f"{n:>10} | {legacy * 1000:>15.2f} | {new * 1000:>12.2f} | {reused_time * 1000:>15.2f} | {ok}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Micro-benchmarks for the pure text-processing hot paths, on a synthetic corpus (no network).
+
+Each case runs on chapters of several paragraph counts (and, for glossary work, several glossary
+sizes). Per-call min and median times are written as JSON, together with the machine, Python and
+git commit, so runs can be compared over time:
+
+    python benchmarks/bench_micro.py                       # writes benchmarks/results/micro-<time>.json
+    python benchmarks/bench_micro.py --compare OLD.json    # also prints new/old ratios
+    python benchmarks/bench_micro.py --filter annotate --quick
+
+Cases: annotate_with_glossary, find_terms, split_into_paragraphs, split_raw_chinese,
+cleanup_chapters.transform, extract_glossary_block, parse_translation_paragraphs,
+locate_excerpt_in_chapter (offset table and plain list), extract_chapter_text (bs4) and the fast
+extractor.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+HERE = Path(__file__).resolve().parent
+REPO = HERE.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(HERE))
+
+from corpus import make_chapter, make_glossary
+
+RESULTS_DIR = HERE / "results"
+SLOWER = 1.10  # --compare flags cases at least this much slower
+
+
+def import_pipeline():
+    """Import the pipeline modules from a scratch directory (translatorV3 creates its output dirs)."""
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            import translatorV3
+        finally:
+            os.chdir(cwd)
+    return translatorV3
+
+
+def build_cases(paragraph_counts: List[int], glossary_sizes: List[int]) -> List[Tuple[str, Dict, Callable]]:
+    tr = import_pipeline()
+    import cleanup_chapters
+    from bs4 import BeautifulSoup
+    from chapter_chunks import parse_translation_paragraphs
+    from chapter_extractor import extract_chapter_text, get_extractor
+    from glossary_matcher import annotate_with_glossary, compile_glossary, find_terms
+    from retranslate_excerpt import (NormalisedChapter, extract_translation_section, locate_excerpt_in_chapter,
+                                     parse_p_paragraphs, split_raw_chinese)
+
+    cases = []
+    for size in glossary_sizes:
+        glossary = make_glossary(size)
+        matcher = compile_glossary(glossary)
+        for count in paragraph_counts:
+            text = make_chapter(1, count, glossary).raw_text
+            params = {"glossary": size, "paragraphs": count, "chars": len(text)}
+            cases.append(("annotate_with_glossary", params,
+                          lambda t=text, g=glossary, m=matcher: annotate_with_glossary(t, g, m)))
+            cases.append(("find_terms", params, lambda t=text, m=matcher: find_terms(t, m)))
+
+    glossary = make_glossary(min(glossary_sizes))
+    extract_fast = get_extractor("fast")
+    for count in paragraph_counts:
+        chapter = make_chapter(2, count, glossary)
+        raw, output, html = chapter.raw_text, chapter.model_output, chapter.html
+        paragraphs = parse_p_paragraphs(extract_translation_section(output))
+        table = NormalisedChapter(paragraphs)
+        # A phrase spanning the last two paragraphs: the slowest path for span matching.
+        excerpt = " ".join(paragraphs[-2][1].split()[-4:] + paragraphs[-1][1].split()[:4]) if count > 1 \
+            else paragraphs[-1][1][:40]
+        params = {"paragraphs": count, "chars": len(raw)}
+        out_params = {"paragraphs": count, "chars": len(output)}
+        cases += [
+            ("split_into_paragraphs", params, lambda r=raw: tr.split_into_paragraphs(r)),
+            ("split_raw_chinese", params, lambda r=raw: split_raw_chinese(r)),
+            ("cleanup_transform", out_params, lambda o=output: cleanup_chapters.transform(o)),
+            ("extract_glossary_block", out_params, lambda o=output: tr.extract_glossary_block(o)),
+            ("parse_translation_paragraphs", out_params, lambda o=output: parse_translation_paragraphs(o)),
+            ("locate_excerpt[table]", out_params, lambda c=table, e=excerpt: locate_excerpt_in_chapter(c, e)),
+            ("locate_excerpt[list]", out_params, lambda p=paragraphs, e=excerpt: locate_excerpt_in_chapter(p, e)),
+            ("extract_chapter_text[bs4]", {"paragraphs": count, "chars": len(html)},
+             lambda h=html: extract_chapter_text(BeautifulSoup(h, "html.parser"), 2)),
+            ("extract_chapter_text[fast]", {"paragraphs": count, "chars": len(html)},
+             lambda h=html: extract_fast(h, 2)),
+        ]
+    return cases
+
+
+def case_id(name: str, params: Dict) -> str:
+    return name + "(" + ",".join(f"{k}={v}" for k, v in params.items() if k != "chars") + ")"
+
+
+def measure(fn: Callable, repeat: int, min_time: float) -> Dict:
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    runs = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"number": number, "repeat": repeat, "min_us": min(runs) * 1e6, "median_us": statistics.median(runs) * 1e6}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: List[Dict], old_path: str):
+    old = {r["id"]: r for r in json.loads(Path(old_path).read_text(encoding="utf-8"))["results"]}
+    print(f"\nvs {old_path}:")
+    print(f"  {'case':<58} | {'old µs':>10} | {'new µs':>10} | {'ratio':>6}")
+    for r in results:
+        before = old.get(r["id"])
+        if before is None:
+            continue
+        ratio = r["min_us"] / before["min_us"] if before["min_us"] else float("inf")
+        flag = "  ⚠️ slower" if ratio >= SLOWER else ""
+        print(f"  {r['id']:<58} | {before['min_us']:>10.1f} | {r['min_us']:>10.1f} | {ratio:>5.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the text-processing hot paths.")
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[20, 80, 300])
+    parser.add_argument("--glossary-sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--filter", help="Only cases whose name contains this string.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timing run (calls are batched).")
+    parser.add_argument("--quick", action="store_true", help="--repeat 3 --min-time 0.05")
+    parser.add_argument("--out", help="Result file (default benchmarks/results/micro-<time>.json).")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    args = parser.parse_args()
+    if args.quick:
+        args.repeat, args.min_time = 3, 0.05
+
+    cases = [c for c in build_cases(args.paragraphs, args.glossary_sizes) if not args.filter or args.filter in c[0]]
+    results = []
+    print(f"  {'case':<58} | {'min µs':>10} | {'median µs':>10} | {'Mchar/s':>7}")
+    for name, params, fn in cases:
+        stats = measure(fn, args.repeat, args.min_time)
+        result = {"id": case_id(name, params), "name": name, "params": params, **stats}
+        results.append(result)
+        rate = params["chars"] / stats["min_us"] if stats["min_us"] else 0.0  # chars per µs = million chars/s
+        print(f"  {result['id']:<58} | {stats['min_us']:>10.1f} | {stats['median_us']:>10.1f} | {rate:>7.1f}")
+
+    payload = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"micro-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    print(f"\n💾 Results written to {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Legacy regex extraction vs the single-pass model_output parser, on well-formed and adversarial output.
+
+The regex extraction (kept here as the reference) searched the output once per block and fell back
+to `({[\\s\\S]+})\\s*$` for a trailing glossary; on outputs without a closing brace that pattern, and
+the lazy fenced/marker patterns with an unterminated block, retry from every "{" and go quadratic.
+Each adversarial case is run at doubling sizes so the growth is visible in the ratio column.
+
+Usage: python benchmarks/bench_output_parser.py [--sizes 2000 4000 8000 16000] [--paragraphs 300]
+"""
+import argparse
+import re
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+from corpus import make_chapter, make_glossary
+from model_output import parse_model_output
+
+LEGACY_TRANSLATION_RE = re.compile(r"=== TRANSLATION START ===\s*([\s\S]*?)=== TRANSLATION END ===")
+LEGACY_QA_RE = re.compile(r"=== QA REPORT START ===\s*([\s\S]*?)\s*=== QA REPORT END ===")
+LEGACY_GLOSSARY_RE = re.compile(r"=== GLOSSARY START ===\s*({[\s\S]*?})\s*=== GLOSSARY END ===")
+LEGACY_FENCED_JSON_RE = re.compile(r"```json\s*({[\s\S]+?})\s*```", re.IGNORECASE)
+LEGACY_FENCED_RE = re.compile(r"```\s*({[\s\S]+?})\s*```")
+LEGACY_TRAILING_RE = re.compile(r"({[\s\S]+})\s*$")
+MAX_SECONDS = 20.0  # a legacy run slower than this stops its size series
+
+
+def legacy_extract(text: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """(translation body, QA body, glossary JSON) the way the pipeline found them before the parser."""
+    translation = LEGACY_TRANSLATION_RE.search(text)
+    qa = LEGACY_QA_RE.search(text)
+    glossary = LEGACY_GLOSSARY_RE.search(text) or LEGACY_FENCED_JSON_RE.search(text) \
+        or LEGACY_FENCED_RE.search(text) or LEGACY_TRAILING_RE.search(text)
+    return (translation.group(1) if translation else None, qa.group(1) if qa else None,
+            glossary.group(1) if glossary else None)
+
+
+def parser_extract(text: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    parsed = parse_model_output(text)
+    found = parsed.glossary_block()
+    return parsed.body("TRANSLATION"), parsed.body("QA REPORT"), found[0] if found else None
+
+
+def adversarial_cases() -> List[Tuple[str, Callable[[int], str]]]:
+    """name -> builder of an output of roughly n characters."""
+    head = "=== TRANSLATION START ===\n@P1: Text.\n=== TRANSLATION END ===\n"
+    return [
+        ("braces, no closing brace", lambda n: head + "{" * n),
+        ("unterminated glossary block", lambda n: head + "=== GLOSSARY START ===\n" + '{"k": "v", ' * (n // 11)),
+        ("unclosed fences", lambda n: head + "```{\n" * (n // 5)),
+        ("missing END markers", lambda n: "=== TRANSLATION START ===\n=== QA REPORT START ===\n" * (n // 50)
+         + "{ x" * (n // 3)),
+    ]
+
+
+def best_of(fn: Callable, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Legacy regex extraction vs the model_output parser.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 4000, 8000, 16000])
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[20, 300, 2000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"  {'case':<30} | {'chars':>8} | {'legacy ms':>10} | {'parser ms':>9} | {'legacy growth':>13}")
+    glossary = make_glossary(100)
+    for count in args.paragraphs:
+        text = make_chapter(1, count, glossary).model_output
+        legacy, new = legacy_extract(text), parser_extract(text)
+        if (legacy[0].strip(), legacy[1], legacy[2]) != new:
+            print(f"  ⚠️ well-formed output with {count} paragraphs extracts differently")
+        old_s, new_s = best_of(lambda: legacy_extract(text), args.repeat), best_of(lambda: parser_extract(text), args.repeat)
+        print(f"  {'well-formed (' + str(count) + ' paragraphs)':<30} | {len(text):>8} | {old_s * 1000:>10.2f} | "
+              f"{new_s * 1000:>9.2f} |")
+
+    for name, build in adversarial_cases():
+        previous = None
+        for size in args.sizes:
+            text = build(size)
+            t0 = time.perf_counter()
+            legacy_extract(text)
+            if time.perf_counter() - t0 > MAX_SECONDS:
+                print(f"  {name:<30} | {len(text):>8} | {'> %.0fs' % MAX_SECONDS:>10} | (stopping this series)")
+                break
+            old_s = best_of(lambda: legacy_extract(text), args.repeat)
+            new_s = best_of(lambda: parser_extract(text), args.repeat)
+            growth = f"{old_s / previous:>12.1f}x" if previous else ""
+            previous = old_s
+            print(f"  {name:<30} | {len(text):>8} | {old_s * 1000:>10.2f} | {new_s * 1000:>9.2f} | {growth:>13}")
+    print("\nDoubling the input should roughly double a linear time; the legacy growth column shows ~4x "
+          "where the regexes backtrack quadratically.")
+
+
+if __name__ == "__main__":
+    main()
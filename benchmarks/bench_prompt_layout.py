@@ -0,0 +1,71 @@
+"""Provider-side prompt caching with the legacy vs the prefix prompt layout.
+
+Translates the same synthetic chapters once per layout against the fake API, which caches
+prompt prefixes like the real one (1024+ tokens, 128-token blocks) and charges latency only for
+uncached prompt tokens. Reports the share of prompt tokens served from the cache, the wall
+time, and the input cost at the given prices.
+
+Usage: python benchmarks/bench_prompt_layout.py [--chapters 8] [--workers 1]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+REPO = HERE.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(HERE))
+
+from bench_translate_queue import seed_workdir
+from fake_openai_server import FakeOpenAI, start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt layouts against a prefix-caching fake API.")
+    parser.add_argument("--chapters", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--per-prompt-token", type=float, default=0.0002, help="Fake seconds per uncached prompt token.")
+    parser.add_argument("--input-price", type=float, default=0.25, help="USD per 1M uncached input tokens.")
+    parser.add_argument("--cached-price", type=float, default=0.025, help="USD per 1M cached input tokens.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    os.environ["LLM_CACHE"] = "0"
+    os.environ["TM"] = "0"
+    print(f"{'layout':<8} | {'prompt tokens':>13} | {'cached':>9} | {'cached %':>8} | {'seconds':>8} | {'input cost $':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        seed_workdir(workdir, args.chapters)
+        os.chdir(workdir)
+        for layout in ("legacy", "prefix"):
+            api = FakeOpenAI(latency=args.latency, per_prompt_token=args.per_prompt_token)
+            server, base_url = start_server(api)
+            os.environ["OPENAI_BASE_URL"] = base_url
+            sys.modules.pop("translatorV3", None)
+            sys.modules.pop("translate_queue", None)
+            import translatorV3 as tr
+            import translate_queue
+            tr.PROMPT_LAYOUT = layout
+            chapters = [f"{i:04}" for i in range(1, args.chapters + 1)]
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                translate_queue.run_batch(chapters, workers=args.workers, mirror_to_obsidian=False)
+            elapsed = time.perf_counter() - t0
+            server.shutdown()
+            usage = tr.USAGE_TOTALS
+            uncached = usage["prompt_tokens"] - usage["cached_tokens"]
+            cost = (uncached * args.input_price + usage["cached_tokens"] * args.cached_price) / 1e6
+            share = usage["cached_tokens"] / usage["prompt_tokens"] * 100
+            print(f"{layout:<8} | {usage['prompt_tokens']:>13,} | {usage['cached_tokens']:>9,} | {share:>7.1f}% | "
+                  f"{elapsed:>8.2f} | {cost:>12.5f}")
+        os.chdir(REPO)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Requests issued by `AllChapterScraper --sync` over a simulated week of daily runs.
+
+Day 1 is a full scrape; later days add a few chapters and revise one, and the
+sync should only touch the ToC plus the new chapters.
+
+Usage: python benchmarks/bench_sync.py [--chapters 300]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import AllChapterScraper as scraper
+from chapter_downloader import ChapterDownloader
+from fake_piaotian_server import FakeSite, start_server
+
+
+def sync_once(toc, manifest_path, recheck=False):
+    downloader = ChapterDownloader(scraper.headers, workers=8, rate=0, max_in_flight=8, retries=1, backoff=0.05)
+    args = SimpleNamespace(toc_url=toc, manifest=manifest_path, start=None, end=None, recheck=recheck)
+    try:
+        report, planned = scraper.run_sync(downloader, args)
+    finally:
+        downloader.close()
+    return report, planned
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count requests made by incremental ToC sync.")
+    parser.add_argument("--chapters", type=int, default=300)
+    parser.add_argument("--new-per-day", type=int, default=2)
+    args = parser.parse_args()
+
+    site = FakeSite(args.chapters)
+    server, toc = start_server(site)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper.output_folder = tmp
+        manifest_path = os.path.join(tmp, "manifest.json")
+
+        def day(label, recheck=False):
+            before = site.requests
+            report, planned = sync_once(toc, manifest_path, recheck)
+            rows.append((label, site.requests - before, planned, len(report.succeeded)))
+
+        day("day 1: initial scrape")
+        day("day 2: nothing changed")
+        site.add_chapters(args.new_per_day)
+        day(f"day 3: +{args.new_per_day} chapters")
+        site.add_chapters(args.new_per_day)
+        site.revise(5)
+        day(f"day 4: +{args.new_per_day}, ch5 revised")
+        day("day 5: --recheck", recheck=True)
+    server.shutdown()
+
+    print(f"\n{'run':<28} | {'HTTP requests':>13} | {'planned':>7} | completed")
+    for label, requests_made, planned, completed in rows:
+        print(f"{label:<28} | {requests_made:>13} | {planned:>7} | {completed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""End-to-end translation throughput against the local fake OpenAI server.
+
+Compares the old queue (one `python` subprocess per chapter plus a sleep) with the
+in-process worker pool in translate_queue.run_batch. Runs in a temporary working
+directory seeded with synthetic chapters, the repo's rules.md and glossary.json.
+
+Usage: python benchmarks/bench_translate_queue.py [--chapters 12] [--latency 0.5] [--workers 1 4 8]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+REPO = HERE.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(HERE))
+
+from fake_openai_server import FakeOpenAI, start_server
+from fake_piaotian_server import chapter_paragraphs
+from glossary_store import GlossaryStore
+
+
+def seed_workdir(workdir: Path, chapters: int):
+    shutil.copy(REPO / "rules.md", workdir / "rules.md")
+    shutil.copy(REPO / "glossary.json", workdir / "glossary.json")
+    raw = workdir / "piaotian_chapters"
+    raw.mkdir()
+    for i in range(1, chapters + 1):
+        text = f"第{i}章 测试章节{i}\n\n" + "\n\n".join(chapter_paragraphs(i))
+        (raw / f"ch{i:04}.txt").write_text(text, encoding="utf-8")
+
+
+def glossary_terms(workdir: Path) -> dict:
+    """Snapshot + pending log, so terms left uncompacted by the subprocess baseline count as existing."""
+    return dict(GlossaryStore(str(workdir / "glossary.json")).load())
+
+
+def run_subprocess_baseline(chapters, sleep):
+    env = dict(os.environ, PYTHONPATH=str(REPO))
+    code = "import sys, translatorV3 as t; t.translate_chapter(sys.argv[1], verbose=False, mirror_to_obsidian=False)"
+    t0 = time.perf_counter()
+    ok = 0
+    for ch in chapters:
+        ok += subprocess.run([sys.executable, "-c", code, ch], env=env, capture_output=True).returncode == 0
+        time.sleep(sleep)
+    return ok, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch translation against a fake API.")
+    parser.add_argument("--chapters", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake API seconds per call.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--baseline-sleep", type=float, default=3.0, help="Sleep of the old subprocess queue.")
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    api = FakeOpenAI(latency=args.latency)
+    server, base_url = start_server(api)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    os.environ["LLM_CACHE"] = "0"  # every run must reach the API
+    os.environ["TM"] = "0"  # and translate every paragraph
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        seed_workdir(workdir, args.chapters)
+        os.chdir(workdir)
+        chapters = [f"{i:04}" for i in range(1, args.chapters + 1)]
+
+        if not args.skip_baseline:
+            ok, elapsed = run_subprocess_baseline(chapters, args.baseline_sleep)
+            rows.append((f"subprocess queue (sleep {args.baseline_sleep:g}s)", ok, elapsed, 1))
+
+        import translate_queue
+        for workers in args.workers:
+            api.max_in_flight = 0
+            before = set(glossary_terms(workdir))
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = translate_queue.run_batch(chapters, workers=workers, mirror_to_obsidian=False)
+            elapsed = time.perf_counter() - t0
+            logged = set(glossary_terms(workdir)) - before
+            reported = [term for r in results if r["ok"] for term in r["added_terms"]]
+            if sorted(reported) != sorted(logged):
+                print(f"⚠️ {workers} workers: chapters reported {len(reported)} new terms, the glossary gained {len(logged)}")
+            rows.append((f"in-process, {workers} workers", sum(r["ok"] for r in results), elapsed, api.max_in_flight))
+        os.chdir(REPO)
+    server.shutdown()
+
+    print(f"{'mode':<34} | {'ok':>4} | {'seconds':>8} | {'chapters/min':>12} | peak concurrent calls")
+    for name, ok, elapsed, peak in rows:
+        print(f"{name:<34} | {ok:>4} | {elapsed:>8.2f} | {ok / elapsed * 60:>12.1f} | {peak}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Deterministic synthetic corpus for offline benchmarks.
+
+Builds glossaries of any size, raw Chinese chapters with a chosen paragraph count and glossary-term
+density, the matching model output (@P translation, QA and glossary blocks) and the piaotia HTML
+page, all from a seed. Run it to write a corpus tree the pipeline scripts can be pointed at.
+
+Usage: python benchmarks/corpus.py --out /tmp/corpus [--chapters 50] [--paragraphs 20 80 300] [--glossary 10000]
+"""
+import argparse
+import json
+import random
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from fake_piaotian_server import render_chapter_page
+
+HANZI = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)]
+COMMON = "的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学"
+WORDS = ("the sect elder qi realm sword disciple heaven dao martial peak yang kai palace spirit stone "
+         "ancient beast demon saint master pill formation array technique soul domain void emperor "
+         "said he she they with from into before after suddenly slowly coldly").split()
+
+
+@dataclass
+class SyntheticChapter:
+    number: int
+    title: str
+    paragraphs: List[str]       # raw Chinese
+    translations: List[str]     # English, one per paragraph
+
+    @property
+    def raw_text(self) -> str:
+        return self.title + "\n\n" + "\n\n".join(self.paragraphs)
+
+    @property
+    def model_output(self) -> str:
+        """What the translation model returns: @P lines, a QA block, a glossary block."""
+        body = "\n\n".join(f"@P{i}: {text}" for i, text in enumerate(self.translations, start=1))
+        terms = {self.paragraphs[0][:3]: "New Term"}
+        return (
+            f"=== TRANSLATION START ===\n{body}\n=== TRANSLATION END ===\n"
+            "=== QA REPORT START ===\nOK\n=== QA REPORT END ===\n"
+            f"=== GLOSSARY START ===\n{json.dumps(terms, ensure_ascii=False, indent=2)}\n=== GLOSSARY END ===\n"
+            "END-OF-OUTPUT"
+        )
+
+    @property
+    def html(self) -> str:
+        return render_chapter_page(self.number, paragraphs=self.paragraphs)
+
+
+def make_glossary(size: int, seed: int = 0) -> Dict[str, str]:
+    rng = random.Random(seed)
+    glossary = {}
+    while len(glossary) < size:
+        term = "".join(rng.choice(HANZI) for _ in range(rng.choice((2, 2, 3, 3, 4, 5))))
+        glossary[term] = f"Term {len(glossary)}"
+    return glossary
+
+
+def make_chapter(number: int, paragraphs: int, glossary: Dict[str, str], term_density: float = 0.15,
+                 seed: int = 0) -> SyntheticChapter:
+    """`term_density` is the share of phrases that are glossary terms."""
+    rng = random.Random(seed * 100003 + number)
+    terms = list(glossary)
+    chinese, english = [], []
+    for _ in range(paragraphs):
+        phrases = []
+        for _ in range(rng.randint(4, 16)):
+            if terms and rng.random() < term_density:
+                phrases.append(rng.choice(terms))
+            else:
+                phrases.append("".join(rng.choice(COMMON) for _ in range(rng.randint(3, 12))))
+            if rng.random() < 0.3:
+                phrases.append(rng.choice("，。！？"))
+        chinese.append("".join(phrases) + "。")
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 60)))
+        english.append(sentence[0].upper() + sentence[1:] + ".")
+    return SyntheticChapter(number, f"第{number}章 测试章节{number}", chinese, english)
+
+
+def write_corpus(out: Path, chapters: int, paragraph_counts: List[int], glossary_size: int, seed: int = 0):
+    """piaotian_chapters/, final_chapters/ (model output), html/ and glossary.json under `out`."""
+    glossary = make_glossary(glossary_size, seed)
+    for sub in ("piaotian_chapters", "final_chapters", "html"):
+        (out / sub).mkdir(parents=True, exist_ok=True)
+    (out / "glossary.json").write_text(json.dumps(glossary, ensure_ascii=False, indent=2), encoding="utf-8")
+    for n in range(1, chapters + 1):
+        chapter = make_chapter(n, paragraph_counts[(n - 1) % len(paragraph_counts)], glossary, seed=seed)
+        (out / "piaotian_chapters" / f"ch{n:04d}.txt").write_text(chapter.raw_text, encoding="utf-8")
+        (out / "final_chapters" / f"ch{n:04d}.md").write_text(chapter.model_output, encoding="utf-8")
+        (out / "html" / f"ch{n:04d}.html").write_text(chapter.html, encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic corpus for offline benchmarks.")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--chapters", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[20, 80, 300],
+                        help="Paragraph counts, cycled over the chapters.")
+    parser.add_argument("--glossary", type=int, default=10000, help="Glossary size.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_corpus(Path(args.out), args.chapters, args.paragraphs, args.glossary, args.seed)
+    print(f"✅ Wrote {args.chapters} chapters and a {args.glossary}-term glossary to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Local OpenAI-compatible stand-in for /v1/chat/completions.
+
+It answers the translator, retranslation and editor prompts with well-formed (fake) output,
+reports token usage, and can add latency and failures so the pipeline can be timed end to end.
+Like the real API it caches prompt prefixes of 1024+ tokens in 128-token blocks and reports
+them as usage.prompt_tokens_details.cached_tokens; uncached prompt tokens can cost latency.
+
+Usage: python benchmarks/fake_openai_server.py --port 8001 --latency 0.5
+then:  OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake python translate_queue.py ...
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+P_LINE_RE = re.compile(r"^@P(\d+)(\*?):\s*(.*)$", re.MULTILINE)
+NEW_TERM_RE = re.compile(r"[\u4e00-\u9fff]{4,}(?!\[)")  # Hanzi not directly followed by an annotation
+NEW_TERMS_PER_CHAPTER = 2
+
+
+CHARS_PER_TOKEN = 3
+CACHE_BLOCK_TOKENS = 128
+CACHE_MIN_TOKENS = 1024
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def fake_english(pnum: int, source: str) -> str:
+    return f"English rendering of paragraph {pnum} ({len(source)} source chars)."
+
+
+def section(text: str, start_marker: str, end_markers) -> str:
+    i = text.find(start_marker)
+    if i < 0:
+        return ""
+    i += len(start_marker)
+    ends = [text.find(m, i) for m in end_markers]
+    ends = [e for e in ends if e >= 0]
+    return text[i:min(ends)] if ends else text[i:]
+
+
+def respond_translation(user: str) -> str:
+    source = section(user, "SOURCE CHAPTER (", ["TASKS"])
+    seen = {}
+    for m in P_LINE_RE.finditer(source):
+        seen.setdefault(int(m.group(1)), m.group(3))
+    paras = "\n\n".join(f"@P{n}: {fake_english(n, src)}" for n, src in sorted(seen.items()))
+    # Like the real model, propose a few unannotated names as new glossary terms.
+    terms = {}
+    for src in seen.values():
+        for hanzi in NEW_TERM_RE.findall(src):
+            if len(terms) < NEW_TERMS_PER_CHAPTER:
+                terms.setdefault(hanzi[:4], f"Term {len(terms) + 1}")
+    return (
+        f"=== TRANSLATION START ===\n{paras}\n=== TRANSLATION END ===\n"
+        "=== QA REPORT START ===\nOK\n=== QA REPORT END ===\n"
+        f"=== GLOSSARY START ===\n{json.dumps(terms, ensure_ascii=False)}\n=== GLOSSARY END ===\nEND-OF-OUTPUT"
+    )
+
+
+def respond_retranslation(user: str) -> str:
+    current = section(user, "CURRENT TRANSLATION", ["INSTRUCTIONS"])
+    lines = [f"@P{m.group(1)}: Retranslated paragraph {m.group(1)}."
+             for m in P_LINE_RE.finditer(current) if m.group(2)]
+    return "=== RETRANSLATION START ===\n" + "\n".join(lines) + "\n=== RETRANSLATION END ==="
+
+
+def respond_editor(user: str) -> str:
+    return section(user, "DRAFT (English):", []).strip()
+
+
+def respond_editor_patch(user: str, every: int = 10) -> str:
+    """Patch-mode editor: rewrites every `every`-th draft paragraph, as an editor touching a few lines."""
+    draft = section(user, "DRAFT (English):", ["OUTPUT FORMAT"])
+    lines = [f"@P{m.group(1)}: {m.group(3)} (edited)" for m in P_LINE_RE.finditer(draft) if int(m.group(1)) % every == 0]
+    return "=== PATCH START ===\n" + "\n".join(lines) + "\n=== PATCH END ==="
+
+
+def respond(system: str, user: str) -> str:
+    if "=== PATCH START ===" in user:
+        return respond_editor_patch(user)
+    if "=== RETRANSLATION START ===" in user:
+        return respond_retranslation(user)
+    if "DRAFT (English):" in user:  # before TRANSLATION: the draft carries its own markers
+        return respond_editor(user)
+    if "=== TRANSLATION START ===" in user:
+        return respond_translation(user)
+    return "OK"
+
+
+class FakeOpenAI:
+    def __init__(self, latency: float = 0.0, per_token: float = 0.0, fail_rate: float = 0.0, seed: int = 0,
+                 per_prompt_token: float = 0.0):
+        self.latency = latency
+        self.per_token = per_token
+        self.per_prompt_token = per_prompt_token
+        self.fail_rate = fail_rate
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._prefixes = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self._rng.random() < self.fail_rate
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def cached_prefix_tokens(self, prompt: str) -> int:
+        """Longest previously seen prefix, in whole cache blocks, then remember this prompt's blocks."""
+        block_chars = CACHE_BLOCK_TOKENS * CHARS_PER_TOKEN
+        digest = hashlib.sha1()
+        keys = []
+        for start in range(0, len(prompt) - block_chars + 1, block_chars):
+            digest.update(prompt[start:start + block_chars].encode("utf-8"))
+            keys.append(digest.hexdigest())
+        with self._lock:
+            hit_blocks = 0
+            for key in keys:
+                if key not in self._prefixes:
+                    break
+                hit_blocks += 1
+            self._prefixes.update(keys)
+        cached = hit_blocks * CACHE_BLOCK_TOKENS
+        return cached if cached >= CACHE_MIN_TOKENS else 0
+
+    def complete(self, body: dict) -> dict:
+        messages = body.get("messages", [])
+        system = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+        user = "\n".join(m.get("content", "") for m in messages if m.get("role") == "user")
+        content = respond(system, user)
+        prompt = "".join(f"{m.get('role')}:{m.get('content', '')}\n" for m in messages)
+        prompt_tokens = estimate_tokens(system + user)
+        cached_tokens = min(self.cached_prefix_tokens(prompt), prompt_tokens)
+        completion_tokens = estimate_tokens(content)
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+        time.sleep(self.latency + self.per_token * completion_tokens
+                   + self.per_prompt_token * (prompt_tokens - cached_tokens))
+        return {
+            "id": f"chatcmpl-fake-{self.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+
+
+def make_handler(api: FakeOpenAI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": "not found"}})
+            fail = api.enter()
+            try:
+                if fail:
+                    return self._send_json(500, {"error": {"message": "fake server error", "type": "server_error"}})
+                return self._send_json(200, api.complete(body))
+            finally:
+                api.leave()
+
+    return Handler
+
+
+def start_server(api: FakeOpenAI, host: str = "127.0.0.1", port: int = 0):
+    """Start serving in a daemon thread. Returns (server, base_url) where base_url ends in /v1."""
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI chat completions API locally.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fixed seconds per call.")
+    parser.add_argument("--per-token", type=float, default=0.0, help="Extra seconds per completion token.")
+    parser.add_argument("--per-prompt-token", type=float, default=0.0, help="Extra seconds per uncached prompt token.")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    api = FakeOpenAI(args.latency, args.per_token, args.fail_rate, per_prompt_token=args.per_prompt_token)
+    server, base_url = start_server(api, port=args.port)
+    print(f"Fake OpenAI API at {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
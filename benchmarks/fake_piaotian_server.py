@@ -0,0 +1,187 @@
+"""Local stand-in for piaotia.com: serves a GBK table of contents and fake chapter pages.
+
+Usage: python benchmarks/fake_piaotian_server.py --port 8000 --chapters 300 --latency 0.05
+then:  python AllChapterScraper.py --toc-url http://127.0.0.1:8000/html/3/3224/
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOOK_PATH = "/html/3/3224/"
+FIRST_PAGE_ID = 1630000
+HANZI = "的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学么之都好看起发当没成只如事把还用第样道想作种开美总从无情己面最女但现前些所同日手又行意动方期它头经长儿回位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感"
+
+
+def chapter_id(index: int) -> int:
+    return FIRST_PAGE_ID + index
+
+
+def chapter_paragraphs(index: int, revision: int = 0) -> list:
+    rng = random.Random(index * 1000 + revision)
+    paragraphs = []
+    for _ in range(rng.randint(20, 60)):
+        sentences = []
+        for _ in range(rng.randint(1, 4)):
+            sentences.append("".join(rng.choice(HANZI) for _ in range(rng.randint(8, 30))) + rng.choice("。！？"))
+        paragraphs.append("".join(sentences))
+    return paragraphs
+
+
+def render_toc(chapters: int) -> str:
+    items = "\n".join(
+        f'<li><a href="{chapter_id(i)}.html">第{i}章 测试章节{i}</a></li>' for i in range(1, chapters + 1)
+    )
+    return (
+        '<html><head><meta http-equiv="Content-Type" content="text/html; charset=gbk" />'
+        "<title>武炼巅峰最新章节</title></head><body>\n"
+        '<div class="title"><h1>武炼巅峰最新章节</h1></div>\n'
+        f'<div class="centent"><ul>\n{items}\n</ul></div>\n'
+        "</body></html>"
+    )
+
+
+def render_chapter_page(index: int, revision: int = 0, paragraphs: list = None) -> str:
+    if paragraphs is None:
+        paragraphs = chapter_paragraphs(index, revision)
+    body = "<br />\n<br />\n".join("&nbsp;&nbsp;&nbsp;&nbsp;" + p for p in paragraphs)
+    return (
+        '<html><head><meta http-equiv="Content-Type" content="text/html; charset=gbk" />'
+        f"<title>第{index}章 测试章节{index}-武炼巅峰</title></head><body>\n"
+        '<div id="main">\n'
+        f'<h1><a href="/bookinfo/3/3224.html">武炼巅峰</a> 第{index}章 测试章节{index}</h1>\n'
+        '<table width="100%"><tr><td><script language="javascript">GetFont();</script></td></tr></table>\n'
+        '<div class="toplink"><a href="index.html">返回书页</a></div>\n'
+        f"<br />\n{body}<br />\n"
+        "<!-- 翻页上AD开始 -->\n"
+        '<div class="bottomlink"><a href="index.html">目录</a> <a href="#">下一章</a></div>\n'
+        "</div></body></html>"
+    )
+
+
+class FakeSite:
+    def __init__(self, chapters: int = 100, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+        self.chapters = chapters
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.revisions = {}  # chapter index -> revision number, bump to simulate an edited chapter
+        self.started = int(time.time())
+        self.modified = {}  # chapter index -> last-modified timestamp
+        self.toc_modified = self.started
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def revise(self, index: int):
+        self.revisions[index] = self.revisions.get(index, 0) + 1
+        self.modified[index] = int(time.time())
+
+    def add_chapters(self, count: int):
+        self.chapters += count
+        self.toc_modified = int(time.time())
+
+    def enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self._rng.random() < self.fail_rate
+        return fail
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def make_handler(site: FakeSite):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_page(self, body: bytes, modified: int):
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            validators = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True)}
+            if_none_match = self.headers.get("If-None-Match")
+            if_modified_since = self.headers.get("If-Modified-Since")
+            if if_none_match is not None:
+                not_modified = if_none_match == etag
+            elif if_modified_since is not None:
+                try:
+                    not_modified = parsedate_to_datetime(if_modified_since).timestamp() >= modified
+                except (TypeError, ValueError):
+                    not_modified = False
+            else:
+                not_modified = False
+            if not_modified:
+                return self._send(304, extra_headers=validators)
+            return self._send(200, body, validators)
+
+        def _send(self, status: int, body: bytes = b"", extra_headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=gbk")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (extra_headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            fail = site.enter()
+            try:
+                if site.latency:
+                    time.sleep(site.latency)
+                if fail:
+                    return self._send(503, b"busy")
+                path = self.path.split("?", 1)[0]
+                if path == BOOK_PATH:
+                    return self._send_page(render_toc(site.chapters).encode("gbk"), site.toc_modified)
+                if path.startswith(BOOK_PATH) and path.endswith(".html"):
+                    try:
+                        index = int(path[len(BOOK_PATH):-5]) - FIRST_PAGE_ID
+                    except ValueError:
+                        index = 0
+                    if 1 <= index <= site.chapters:
+                        page = render_chapter_page(index, site.revisions.get(index, 0)).encode("gbk")
+                        return self._send_page(page, site.modified.get(index, site.started))
+                return self._send(404, b"not found")
+            finally:
+                site.leave()
+
+    return Handler
+
+
+def start_server(site: FakeSite, host: str = "127.0.0.1", port: int = 0):
+    """Start serving `site` in a daemon thread. Returns (server, toc_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(site))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{BOOK_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake GBK piaotian pages locally.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--chapters", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of delay per request.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    args = parser.parse_args()
+    site = FakeSite(args.chapters, args.latency, args.fail_rate)
+    server, toc = start_server(site, port=args.port)
+    print(f"Serving {args.chapters} chapters at {toc} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
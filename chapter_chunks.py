@@ -0,0 +1,123 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from model_output import PARAGRAPH_PROBLEMS, OutputFormatError, parse_model_output
+
+P_LINE_RE = re.compile(r"^@P(\d+):\s?(.*)$")
+
+
+class ChunkError(ValueError):
+    pass
+
+
+@dataclass
+class Chunk:
+    """A paragraph-aligned slice of the indexed source; `before`/`after` are context-only lines."""
+    number: int
+    lines: List[str]
+    before: List[str]
+    after: List[str]
+
+    @property
+    def first(self) -> int:
+        return paragraph_number(self.lines[0])
+
+    @property
+    def last(self) -> int:
+        return paragraph_number(self.lines[-1])
+
+    @property
+    def source(self) -> str:
+        return "\n".join(self.lines)
+
+
+def paragraph_number(line: str) -> int:
+    m = P_LINE_RE.match(line)
+    if not m:
+        raise ChunkError(f"Not an indexed paragraph line: {line[:60]!r}")
+    return int(m.group(1))
+
+
+def split_indexed_source(indexed_source: str, budget_chars: int, overlap: int = 1) -> List[Chunk]:
+    """Split `@Pn: ...` lines into consecutive chunks of at most `budget_chars` characters.
+
+    A chunk always holds at least one paragraph, so a paragraph longer than the budget gets a chunk
+    of its own. Each chunk carries up to `overlap` neighbouring paragraphs on each side as context.
+    """
+    lines = [ln for ln in indexed_source.split("\n") if ln.strip()]
+    groups: List[Tuple[int, int]] = []
+    start = size = 0
+    for i, line in enumerate(lines):
+        if i > start and size + len(line) + 1 > budget_chars:
+            groups.append((start, i))
+            start, size = i, 0
+        size += len(line) + 1
+    if lines:
+        groups.append((start, len(lines)))
+    return [
+        Chunk(number=n, lines=lines[a:b], before=lines[max(0, a - overlap):a], after=lines[b:b + overlap])
+        for n, (a, b) in enumerate(groups, start=1)
+    ]
+
+
+def context_block(chunk: Chunk, total_chunks: int) -> str:
+    """Prompt section telling the model which paragraphs to translate and which are context only."""
+    parts = [
+        f"CHUNK {chunk.number} OF {total_chunks}: translate ONLY @P{chunk.first}–@P{chunk.last} below. "
+        "The CONTEXT paragraphs are for continuity only; do NOT translate or output them."
+    ]
+    if chunk.before:
+        parts.append("CONTEXT BEFORE:\n" + "\n".join(chunk.before))
+    if chunk.after:
+        parts.append("CONTEXT AFTER:\n" + "\n".join(chunk.after))
+    return "\n\n".join(parts)
+
+
+def parse_translation_paragraphs(text: str) -> Dict[int, str]:
+    """@P number -> English text from the translation block (continuation lines are kept)."""
+    parsed = parse_model_output(text)
+    try:
+        parsed.require("missing_translation")
+    except OutputFormatError as e:
+        raise ChunkError(str(e))
+    return parsed.paragraphs
+
+
+def parse_chunk_output(text: str, chunk: Chunk) -> Tuple[Dict[int, str], List[str], Dict[str, str]]:
+    """Returns (paragraphs of this chunk, QA issue lines, glossary candidates). Raises ChunkError.
+
+    Each paragraph of the chunk must appear exactly once; context paragraphs echoed back are ignored.
+    """
+    wanted = [paragraph_number(line) for line in chunk.lines]
+    parsed = parse_model_output(text, expected=wanted)
+    try:
+        parsed.require("missing_translation", *PARAGRAPH_PROBLEMS)
+    except OutputFormatError as e:
+        raise ChunkError(f"Chunk {chunk.number}: {e}")
+    glossary = parsed.glossary_block(fallbacks=False)
+    try:
+        terms = json.loads(glossary[0]) if glossary else {}
+    except json.JSONDecodeError as e:
+        raise ChunkError(f"Chunk {chunk.number} glossary JSON could not be parsed: {e}")
+    return {p: parsed.paragraphs[p] for p in wanted}, parsed.qa_lines, terms
+
+
+def stitch(results: List[Tuple[Dict[int, str], List[str], Dict[str, str]]]) -> str:
+    """Reassemble per-chunk results (in chunk order) into a single-request style model output."""
+    paragraphs: Dict[int, str] = {}
+    qa_lines: List[str] = []
+    terms: Dict[str, str] = {}
+    for chunk_paragraphs, chunk_qa, chunk_terms in results:
+        paragraphs.update(chunk_paragraphs)
+        qa_lines.extend(chunk_qa)
+        for k, v in chunk_terms.items():
+            terms.setdefault(k, v)
+    translation = "\n\n".join(f"@P{p}: {paragraphs[p]}" for p in sorted(paragraphs))
+    return (
+        f"=== TRANSLATION START ===\n{translation}\n=== TRANSLATION END ===\n"
+        f"=== QA REPORT START ===\n{chr(10).join(qa_lines) or 'OK'}\n=== QA REPORT END ===\n"
+        f"=== GLOSSARY START ===\n{json.dumps(terms, ensure_ascii=False, indent=2)}\n=== GLOSSARY END ===\n"
+        "END-OF-OUTPUT"
+    )
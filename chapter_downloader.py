@@ -0,0 +1,120 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HostLimiter:
+    """Per-host politeness: at most `rate` request starts per second and `max_in_flight` open requests."""
+
+    def __init__(self, rate: float, max_in_flight: int):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.max_in_flight = max(1, max_in_flight)
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+        self._slots: Dict[str, threading.Semaphore] = {}
+
+    def _semaphore(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.Semaphore(self.max_in_flight)
+            return sem
+
+    def acquire(self, host: str):
+        self._semaphore(host).acquire()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def release(self, host: str):
+        self._semaphore(host).release()
+
+
+@dataclass
+class DownloadReport:
+    succeeded: List[int] = field(default_factory=list)
+    failed: List[Tuple[int, str, str]] = field(default_factory=list)  # (index, url, last error)
+    attempts: int = 0
+    elapsed: float = 0.0
+
+
+class ChapterDownloader:
+    """Pooled HTTP session + bounded worker pool + per-host limiter + retry with backoff.
+
+    `get` has the same call shape as `requests.get`, so it can be handed to any
+    function that would otherwise call `requests` directly.
+    """
+
+    def __init__(self, headers: Optional[dict] = None, *, workers: int = 4, rate: float = 2.0,
+                 max_in_flight: int = 2, retries: int = 3, backoff: float = 1.0, timeout: float = 30):
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = HostLimiter(rate, max_in_flight)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url, **kwargs):
+        host = urlsplit(url).netloc
+        kwargs.setdefault("timeout", self.timeout)
+        self.limiter.acquire(host)
+        try:
+            response = self.session.get(url, **kwargs)
+        finally:
+            self.limiter.release(host)
+        if response.status_code in RETRY_STATUS:
+            response.raise_for_status()
+        return response
+
+    def _run_one(self, handler: Callable[[int, str], object], index: int, url: str):
+        last_error = ""
+        for attempt in range(self.retries + 1):
+            try:
+                handler(index, url)
+                return True, "", attempt + 1
+            except Exception as e:
+                last_error = str(e)
+                if attempt < self.retries:
+                    delay = self.backoff * (2 ** attempt)
+                    print(f"🔁 Chapter {index} failed ({e}); retry {attempt + 1}/{self.retries} in {delay:.1f}s")
+                    time.sleep(delay)
+        return False, last_error, self.retries + 1
+
+    def run(self, jobs: Iterable[Tuple[int, str]], handler: Callable[[int, str], object]) -> DownloadReport:
+        """Run `handler(index, url)` for every job; an exception from the handler counts as a failure."""
+        report = DownloadReport()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._run_one, handler, index, url): (index, url) for index, url in jobs}
+            for future in as_completed(futures):
+                index, url = futures[future]
+                ok, error, attempts = future.result()
+                report.attempts += attempts
+                if ok:
+                    report.succeeded.append(index)
+                else:
+                    report.failed.append((index, url, error))
+                    print(f"❌ Giving up on chapter {index}: {url}\nReason: {error}")
+        report.succeeded.sort()
+        report.failed.sort()
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def close(self):
+        self.session.close()
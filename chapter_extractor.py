@@ -0,0 +1,201 @@
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Tuple
+
+from bs4 import BeautifulSoup, NavigableString
+from bs4.builder import HTMLTreeBuilder
+
+DEFAULT_EXTRACTOR = "fast"
+
+
+# --- bs4 backend (reference) ---
+def extract_chapter_text(soup, chapter_number):
+    title_tag = soup.find("h1")
+    title = title_tag.get_text(strip=True) if title_tag else f"Chapter {chapter_number}"
+
+    content_lines = []
+    first_br = soup.find("br")
+    while first_br and not isinstance(first_br, NavigableString):
+        if first_br.name == "br":
+            break
+        first_br = first_br.next_element
+
+    current = first_br
+    while current:
+        if isinstance(current, NavigableString):
+            line = current.strip()
+            if line:
+                content_lines.append(line)
+        elif getattr(current, "name", None) == "br":
+            content_lines.append("")
+        elif getattr(current, "name", None) == "div" and current.get("class") == ["bottomlink"]:
+            break
+        current = current.next_element
+
+    content = "\n".join(content_lines).strip()
+    return title, content
+
+
+def extract_bs4(html: str, chapter_number) -> Tuple[str, str]:
+    return extract_chapter_text(BeautifulSoup(html, "html.parser"), chapter_number)
+
+
+# --- streaming backend ---
+class UnsupportedMarkup(Exception):
+    """The page uses markup the streaming extractor does not model exactly; use the bs4 backend."""
+
+
+_ATTRS = r"""(?:[^<>"'=]|=\s*(?:"[^"]*"|'[^']*'|[^\s"'<>=`]*))*"""
+# One alternative per html.parser token kind we model. Anything else starting with '<' + [/!?letter]
+# falls into `other` and aborts the fast path.
+_MARKUP_RE = re.compile(
+    r"<!--(?P<comment>.*?)--\s*>"
+    r"|<(?P<raw>script|style)(?=[\t\n\r\f />])(?P<rawattrs>" + _ATTRS + r")>(?P<rawbody>.*?)</\s*(?P=raw)\s*>"
+    r"|<!(?P<decl>(?!--|\[)[^>]*)>"
+    r"|<(?P<end>/)?(?P<name>[a-zA-Z][^\t\n\r\f />\x00]*)(?P<attrs>" + _ATTRS + r")>"
+    r"|<(?P<other>[/!?a-zA-Z])",
+    re.S | re.I,
+)
+_VOID_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+_ENTITY_RE = re.compile(r"&(?:#([0-9]+)|#[xX]([0-9a-fA-F]+)|([a-zA-Z][a-zA-Z0-9]*));|&")
+# Named references whose bs4 (html.parser builder) expansion we reproduce exactly.
+_NAMED_ENTITIES = {"nbsp": "\xa0", "amp": "&", "lt": "<", "gt": ">", "quot": '"'}
+
+
+def _unescape(text: str) -> str:
+    if "&" not in text:
+        return text
+
+    def repl(m):
+        if m.group(1) or m.group(2):
+            code = int(m.group(1)) if m.group(1) else int(m.group(2), 16)
+            if 32 <= code < 127 or 160 <= code < 0xD800 or 0xE000 <= code < 0xFDD0:
+                return chr(code)
+        elif m.group(3) in _NAMED_ENTITIES:
+            return _NAMED_ENTITIES[m.group(3)]
+        raise UnsupportedMarkup(f"character reference {m.group(0)!r}")
+
+    return _ENTITY_RE.sub(repl, text)
+
+
+class _ClassReader(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.classes = None
+
+    def handle_starttag(self, tag, attrs):
+        values = [v for k, v in attrs if k == "class"]
+        if len(values) > 1:
+            raise UnsupportedMarkup("duplicate class attribute")
+        self.classes = values[0].split() if values and values[0] is not None else None
+
+
+def _is_bottomlink(tag: str) -> bool:
+    if "bottomlink" not in tag:
+        return False
+    reader = _ClassReader()
+    reader.feed(tag)
+    reader.close()
+    return reader.classes == ["bottomlink"]
+
+
+def extract_streaming(html: str, chapter_number) -> Tuple[str, str]:
+    """Same (title, content) as the bs4 backend, computed from one regex scan of the decoded page.
+
+    Raises UnsupportedMarkup for constructs whose html.parser/bs4 handling is not modelled.
+    """
+    title_parts: List[str] = []
+    content_lines: List[str] = []
+    open_tags: List[str] = []  # bs4's stack of unclosed elements; decides where the <h1> ends
+    h1_depth = -1
+    title_state = 0  # 0 = no <h1> yet, 1 = inside it, 2 = closed
+    content_state = 0  # 0 = before first <br>, 1 = collecting, 2 = reached the bottomlink div
+    pos = 0
+    for m in _MARKUP_RE.finditer(html + "<br>"):  # sentinel tag flushes trailing text
+        if m.start() > pos and (title_state == 1 or content_state == 1):
+            line = _unescape(html[pos:m.start()]).strip()
+            if line:
+                if title_state == 1:
+                    title_parts.append(line)
+                if content_state == 1:
+                    content_lines.append(line)
+        if m.start() >= len(html):
+            break
+        pos = m.end()
+
+        if m.group("other") is not None:
+            raise UnsupportedMarkup(f"markup at offset {m.start()}: {html[m.start():m.start() + 20]!r}")
+        if m.group("comment") is not None:
+            if content_state == 1:
+                line = m.group("comment").strip()
+                if line:
+                    content_lines.append(line)
+            continue
+        if m.group("decl") is not None:
+            if title_state == 1 or content_state == 1:
+                raise UnsupportedMarkup(f"declaration at offset {m.start()}")
+            continue
+        if m.group("raw") is not None:
+            if m.group("rawattrs").rstrip().endswith("/") or title_state == 1:
+                raise UnsupportedMarkup(f"<{m.group('raw')}> element at offset {m.start()}")
+            if content_state == 1:
+                line = m.group("rawbody").strip()
+                if line:
+                    content_lines.append(line)
+            continue
+
+        name = m.group("name").lower()
+        if name in _VOID_TAGS:
+            if m.group("end"):
+                raise UnsupportedMarkup(f"</{name}> end tag")  # bs4 may merge the strings around it
+        elif m.group("end"):
+            if name in open_tags:
+                depth = len(open_tags) - 1 - open_tags[::-1].index(name)
+                del open_tags[depth:]
+                if title_state == 1 and depth <= h1_depth:
+                    title_state = 2
+                    if content_state == 2:
+                        break
+            continue
+        elif m.group("attrs").rstrip().endswith("/"):
+            raise UnsupportedMarkup(f"self-closing <{name}/>")
+        elif name in ("script", "style"):
+            raise UnsupportedMarkup(f"unterminated <{name}> at offset {m.start()}")
+        else:
+            open_tags.append(name)
+
+        if name == "h1" and title_state == 0:
+            title_state = 1
+            h1_depth = len(open_tags) - 1
+        elif name == "br":
+            if content_state == 0:
+                content_state = 1
+            if content_state == 1:
+                content_lines.append("")
+        elif name == "div" and content_state == 1 and _is_bottomlink(m.group(0)):
+            content_state = 2
+            if title_state == 2:
+                break
+
+    title = "".join(title_parts) if title_state else f"Chapter {chapter_number}"
+    return title, "\n".join(content_lines).strip()
+
+
+def extract_fast(html: str, chapter_number) -> Tuple[str, str]:
+    try:
+        return extract_streaming(html, chapter_number)
+    except UnsupportedMarkup:
+        return extract_bs4(html, chapter_number)
+
+
+EXTRACTORS: Dict[str, Callable[[str, int], Tuple[str, str]]] = {
+    "bs4": extract_bs4,
+    "fast": extract_fast,
+}
+
+
+def get_extractor(name: str = DEFAULT_EXTRACTOR) -> Callable[[str, int], Tuple[str, str]]:
+    try:
+        return EXTRACTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown extractor {name!r}; choose from {sorted(EXTRACTORS)}") from None
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from file_utils import atomic_write_text
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChapterManifest:
+    """Download manifest: ToC validators plus chapter URL -> index / content hash / last fetch.
+
+    Layout of manifest.json:
+        {"toc": {"url", "etag", "last_modified", "links": [[title, url], ...]},
+         "chapters": {url: {"index", "toc_title", "sha256", "etag", "last_modified", "fetched"}}}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"toc": {}, "chapters": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+            self.data.setdefault("toc", {})
+            self.data.setdefault("chapters", {})
+
+    @property
+    def chapters(self) -> Dict[str, dict]:
+        return self.data["chapters"]
+
+    def save(self):
+        with self._lock:
+            text = json.dumps(self.data, ensure_ascii=False, indent=2)
+        atomic_write_text(self.path, text)
+
+    # --- ToC ---
+    def toc_conditional_headers(self, url: str) -> Dict[str, str]:
+        toc = self.data["toc"]
+        if toc.get("url") != url or not toc.get("links"):
+            return {}
+        return _conditional_headers(toc)
+
+    def toc_links(self) -> List[Tuple[str, str]]:
+        return [(title, url) for title, url in self.data["toc"].get("links", [])]
+
+    def record_toc(self, url: str, links: List[Tuple[str, str]], response_headers):
+        with self._lock:
+            self.data["toc"] = {
+                "url": url,
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "links": [list(link) for link in links],
+            }
+
+    # --- chapters ---
+    def chapter_conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.chapters.get(url)
+        return _conditional_headers(entry) if entry else {}
+
+    def needs_fetch(self, index: int, title: str, url: str, path: str) -> Optional[str]:
+        """Return why the chapter must be downloaded, or None if the local copy is current."""
+        entry = self.chapters.get(url)
+        if entry is None:
+            return "new"
+        if entry.get("index") != index:
+            return "renumbered"
+        if entry.get("toc_title") != title:
+            return "retitled"
+        if not os.path.exists(path):
+            return "missing file"
+        return None
+
+    def record_chapter(self, url: str, index: int, toc_title: str, text: str, response_headers) -> bool:
+        """Store the fetch result. Returns True if the chapter text differs from the last fetch."""
+        digest = content_hash(text)
+        with self._lock:
+            previous = self.chapters.get(url, {})
+            self.chapters[url] = {
+                "index": index,
+                "toc_title": toc_title,
+                "sha256": digest,
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "fetched": datetime.now(timezone.utc).isoformat(),
+            }
+        return previous.get("sha256") != digest or previous.get("index") != index
+
+    def touch(self, url: str):
+        with self._lock:
+            if url in self.chapters:
+                self.chapters[url]["fetched"] = datetime.now(timezone.utc).isoformat()
+
+
+def _conditional_headers(entry: dict) -> Dict[str, str]:
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
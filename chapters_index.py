@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+from file_utils import atomic_write_text
+
+
+def state_path_for(output_file: str) -> str:
+    """Sidecar holding per-file mtime/size and rendered index entry, e.g. chapters.json -> .chapters.state.json."""
+    directory, name = os.path.split(output_file)
+    return os.path.join(directory, f".{os.path.splitext(name)[0]}.state.json")
+
+
+def read_title(path: str, fname: str) -> str:
+    """First non-empty line without leading '#', falling back to the file name."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                return line.lstrip("#").strip()
+    return fname
+
+
+def _load_state(state_path: str, output_file: str) -> Dict[str, dict]:
+    if not (os.path.exists(state_path) and os.path.exists(output_file)):
+        return {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _refresh(state: Dict[str, dict], chapters_dir: str, fname: str, st: os.stat_result) -> bool:
+    """Re-read `fname` if its mtime/size differ from the recorded ones. Returns True if it was re-read."""
+    prev = state.get(fname)
+    if prev and prev["mtime_ns"] == st.st_mtime_ns and prev["size"] == st.st_size:
+        return False
+    entry = {
+        "id": fname[:-3],
+        "title": read_title(os.path.join(chapters_dir, fname), fname),
+        "updated": datetime.fromtimestamp(st.st_mtime, tz=timezone.utc).isoformat(),
+    }
+    state[fname] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "entry": _render_entry(entry)}
+    return True
+
+
+def _render_entry(entry: dict) -> str:
+    """One element of chapters.json exactly as json.dump(..., indent=2) lays it out inside the list."""
+    return "  " + json.dumps(entry, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+
+
+def render_index(state: Dict[str, dict]) -> str:
+    """Join the pre-rendered entries; the C encoder never has to walk the whole index with indent=2."""
+    if not state:
+        return "[]"
+    return "[\n" + ",\n".join(state[fname]["entry"] for fname in sorted(state)) + "\n]"
+
+
+def update_chapters_index(chapters_dir: str, output_file: Optional[str] = None,
+                          changed: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Bring chapters.json up to date, re-reading only new or modified .md files.
+
+    With `changed` (paths the caller just wrote or removed), the directory is not scanned at all;
+    otherwise one scandir pass compares mtime/size against the sidecar state. chapters.json and the
+    state file are written atomically, and not at all when nothing changed.
+    Returns {"chapters", "reread", "removed"}.
+    """
+    if output_file is None:
+        output_file = os.path.join(chapters_dir, "chapters.json")
+    state_path = state_path_for(output_file)
+    state = _load_state(state_path, output_file)
+
+    reread = removed = 0
+    if changed is not None and state:
+        for path in changed:
+            fname = os.path.basename(path)
+            if not fname.endswith(".md"):
+                continue
+            try:
+                st = os.stat(os.path.join(chapters_dir, fname))
+            except FileNotFoundError:
+                removed += state.pop(fname, None) is not None
+                continue
+            reread += _refresh(state, chapters_dir, fname, st)
+    else:
+        seen = set()
+        with os.scandir(chapters_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".md") or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                reread += _refresh(state, chapters_dir, entry.name, entry.stat())
+        for fname in [f for f in state if f not in seen]:
+            del state[fname]
+            removed += 1
+
+    if reread or removed or not os.path.exists(output_file):
+        atomic_write_text(output_file, render_index(state))
+        atomic_write_text(state_path, json.dumps(state, ensure_ascii=False))
+    return {"chapters": len(state), "reread": reread, "removed": removed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update chapters.json for a chapters folder.")
+    parser.add_argument("chapters_dir")
+    parser.add_argument("--output", help="Index path (default: <chapters_dir>/chapters.json).")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the saved state and re-read every file.")
+    args = parser.parse_args()
+    output_file = args.output or os.path.join(args.chapters_dir, "chapters.json")
+    if args.rebuild and os.path.exists(state_path_for(output_file)):
+        os.remove(state_path_for(output_file))
+    stats = update_chapters_index(args.chapters_dir, output_file)
+    print(f"📖 {output_file}: {stats['chapters']} chapters ({stats['reread']} re-read, {stats['removed']} removed).")
+
+
+if __name__ == "__main__":
+    main()
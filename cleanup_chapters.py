@@ -1,20 +1,74 @@
 import re
 import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from file_utils import atomic_write_text
+from model_output import tokenize
 
-TRANSLATION_START_RE = re.compile(r'^=== TRANSLATION START ===\s*$', re.MULTILINE)
-TRANSLATION_END_RE = re.compile(r'^=== TRANSLATION END ===\s*$', re.MULTILINE)
-QA_BLOCK_RE = re.compile(r'^=== QA REPORT START ===[\s\S]*?^=== QA REPORT END ===\s*', re.MULTILINE)
 P_PREFIX_ONLY_RE = re.compile(r'^@P\d+:\s*', re.MULTILINE)
+WHITESPACE_RE = re.compile(r'\s*')
+
+MANIFEST_NAME = '.cleanup_manifest.json'  # source hash -> output hash per chapter, in the output dir
+
+
+def _at_line_start(text: str, pos: int) -> bool:
+    return pos == 0 or text[pos - 1] == '\n'
+
+
+def _cut(text: str, spans: List[Tuple[int, int]]) -> str:
+    pieces = []
+    prev = 0
+    for start, stop in spans:
+        pieces.append(text[prev:start])
+        prev = stop
+    pieces.append(text[prev:])
+    return ''.join(pieces)
 
 
 def strip_markers(text: str) -> str:
-    text = QA_BLOCK_RE.sub('', text)
-    text = TRANSLATION_START_RE.sub('', text)
-    text = TRANSLATION_END_RE.sub('', text)
+    """Drop QA REPORT blocks (with trailing whitespace) and whole-line TRANSLATION START/END markers.
+
+    Works from the marker tokens of model_output instead of regex searches; a block starts and ends
+    with markers at the beginning of a line, a marker line takes any blank lines after it along.
+    """
+    tokens = tokenize(text)
+    ends = [t for t in tokens if t.kind == 'END' and t.name == 'QA REPORT' and _at_line_start(text, t.start)]
+    spans = []
+    pos = k = 0
+    for t in tokens:
+        if t.kind != 'START' or t.name != 'QA REPORT' or t.start < pos or not _at_line_start(text, t.start):
+            continue
+        while k < len(ends) and ends[k].start < t.end:
+            k += 1
+        if k == len(ends):
+            break
+        pos = WHITESPACE_RE.match(text, ends[k].end).end()
+        spans.append((t.start, pos))
+    if spans:
+        text = _cut(text, spans)
+    text = _drop_marker_lines(text, 'START')
+    text = _drop_marker_lines(text, 'END')
     return text.strip('\n') + '\n'
 
 
+def _drop_marker_lines(text: str, kind: str) -> str:
+    """Remove TRANSLATION `kind` markers that open a line, up to the last newline of the blank run after them."""
+    spans = []
+    for t in tokenize(text):
+        if t.kind != kind or t.name != 'TRANSLATION' or not _at_line_start(text, t.start):
+            continue
+        run_end = WHITESPACE_RE.match(text, t.end).end()
+        stop = run_end if run_end == len(text) else text.rfind('\n', t.end, run_end)
+        if stop >= 0:
+            spans.append((t.start, stop))
+    return _cut(text, spans) if spans else text
+
+
 def remove_p_prefixes(text: str) -> str:
     """Remove @P<number>: prefixes but otherwise leave spacing and newlines untouched."""
     return P_PREFIX_ONLY_RE.sub('', text)
@@ -28,7 +82,82 @@ def transform(text: str) -> str:
     return text
 
 
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def clean_file(source: str, target: str, known: Optional[dict] = None) -> dict:
+    """Clean `source` into `target`, writing atomically and only if the output bytes change.
+
+    `known` is the manifest entry from the last run: when the source hash still matches and the
+    target is untouched, the transform is skipped. Returns the new manifest entry plus "written".
+    """
+    original = Path(source).read_text(encoding='utf-8')
+    source_sha = sha256_text(original)
+    target_unchanged = known is not None and _stat_matches(target, known, 'output_')
+    if known is not None and known['source_sha256'] == source_sha and target_unchanged:
+        return {**known, **_stat_fields(source, ''), 'written': False}
+
+    cleaned = transform(original)
+    output_sha = sha256_text(cleaned)
+    try:
+        existing = Path(target).read_text(encoding='utf-8')
+    except (OSError, UnicodeDecodeError):
+        existing = None
+    written = existing != cleaned
+    if written:
+        atomic_write_text(target, cleaned)
+    if os.path.abspath(source) == os.path.abspath(target):
+        source_sha = output_sha  # in place: next run sees the cleaned file as its source
+    return {'source_sha256': source_sha, 'output_sha256': output_sha,
+            **_stat_fields(source, ''), **_stat_fields(target, 'output_'), 'written': written}
+
+
+def _stat_fields(path: str, prefix: str) -> dict:
+    st = os.stat(path)
+    return {f'{prefix}mtime_ns': st.st_mtime_ns, f'{prefix}size': st.st_size}
+
+
+def _stat_matches(path: str, entry: dict, prefix: str) -> bool:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return entry.get(f'{prefix}mtime_ns') == st.st_mtime_ns and entry.get(f'{prefix}size') == st.st_size
+
+
+def _clean_job(job: Tuple[str, str, Optional[dict]]) -> Tuple[str, Optional[dict], Optional[str]]:
+    source, target, known = job
+    try:
+        return source, clean_file(source, target, known), None
+    except Exception as e:
+        return source, None, str(e)
+
+
+def load_manifest(path: Path) -> Dict[str, dict]:
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def plan_cleanup(files: List[Path], out_dir: Path, inplace: bool, manifest: Dict[str, dict],
+                 force: bool = False) -> Tuple[List[Tuple[str, str, Optional[dict]]], int]:
+    """Jobs for files that are new or whose source/output changed since the manifest; also the skip count."""
+    jobs = []
+    skipped = 0
+    for f in files:
+        target = f if inplace else out_dir / f.name
+        known = None if force else manifest.get(f.name)
+        if known is not None and _stat_matches(str(f), known, '') and _stat_matches(str(target), known, 'output_'):
+            skipped += 1
+            continue
+        jobs.append((str(f), str(target), known))
+    return jobs, skipped
+
+
 def process_file(path: Path, out_dir: Path, inplace: bool, dry_run: bool) -> bool:
+    """Clean one file; returns True if the output was (or, with dry_run, would be) written."""
     original = path.read_text(encoding='utf-8')
     cleaned = transform(original)
     if dry_run:
@@ -40,10 +169,7 @@ def process_file(path: Path, out_dir: Path, inplace: bool, dry_run: bool) -> boo
         print('--- end preview ---\n')
         return True
     target_path = path if inplace else (out_dir / path.name)
-    if not inplace:
-        out_dir.mkdir(parents=True, exist_ok=True)
-    target_path.write_text(cleaned, encoding='utf-8')
-    return True
+    return clean_file(str(path), str(target_path))['written']
 
 
 def main():
@@ -53,6 +179,8 @@ def main():
     parser.add_argument('--inplace', action='store_true', help='Modify files in place.')
     parser.add_argument('--dry-run', action='store_true', help='Show preview of cleaned content without writing.')
     parser.add_argument('--file', help='Single file to process instead of scanning directory.')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes for the files that need cleaning.')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and re-check every file.')
     args = parser.parse_args()
 
     if args.file:
@@ -68,17 +196,43 @@ def main():
         print(f"Source directory not found: {src_dir}")
         return
 
-    out_dir = Path(args.dest)
-    total = 0
-    changed = 0
-    for f in sorted(src_dir.glob('ch*.md')):
-        total += 1
-        try:
-            if process_file(f, out_dir, inplace=args.inplace, dry_run=args.dry_run):
-                changed += 1
-        except Exception as e:
-            print(f"Error processing {f.name}: {e}")
-    print(f"Processed {total} files. Cleaned: {changed}.")
+    out_dir = src_dir if args.inplace else Path(args.dest)
+    files = sorted(src_dir.glob('ch*.md'))
+    if args.dry_run:
+        for f in files:
+            process_file(f, out_dir, inplace=args.inplace, dry_run=True)
+        print(f"Previewed {len(files)} files.")
+        return
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    jobs, skipped = plan_cleanup(files, out_dir, args.inplace, manifest, force=args.force)
+
+    if args.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(_clean_job, jobs, chunksize=max(1, len(jobs) // (args.jobs * 4))))
+    else:
+        results = [_clean_job(job) for job in jobs]
+
+    written = errors = 0
+    for source, entry, error in results:
+        name = Path(source).name
+        if error is not None:
+            errors += 1
+            manifest.pop(name, None)
+            print(f"Error processing {name}: {error}")
+            continue
+        written += entry.pop('written')
+        manifest[name] = entry
+    present = {f.name for f in files}
+    for name in [n for n in manifest if n not in present]:
+        del manifest[name]
+    if results or len(manifest) != len(present):
+        atomic_write_text(str(manifest_path), json.dumps(manifest, indent=1, sort_keys=True))
+
+    print(f"Processed {len(files)} files. Cleaned: {written}. Unchanged: {len(jobs) - written - errors}. "
+          f"Skipped via manifest: {skipped}." + (f" Errors: {errors}." if errors else ""))
 
 
 if __name__ == '__main__':
@@ -1,16 +1,24 @@
 # editor_pass.py
-import json
+import argparse
 import re
 from pathlib import Path
 from dotenv import load_dotenv
 import os
 from openai import OpenAI
 import difflib
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from annotation_report import make_token_counter
+from glossary_matcher import annotate_with_glossary, find_terms, load_glossary, missing_translations
+from llm_cache import cached_completion
+from model_output import paragraph_lines, parse_model_output
+import chapters_index
+import profiling
+import telemetry
 
 # === Setup ===
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=telemetry.http_client())
 
 # === Configuration (mirrors your translator script and adds FINAL dir) ===
 RULES_PATH = "rules.md"
@@ -27,6 +35,13 @@ MODEL = "gpt-5-mini-2025-08-07"
 # MODEL = "gpt-4o-2024-08-06"
 # MODEL = "o4-mini-2025-04-16"
 
+# "patch": the model returns only the paragraphs it changes, as @Pn lines in a PATCH block, and they
+# are applied to the draft locally; "full": the model returns the whole corrected chapter.
+EDIT_MODE = "patch"
+
+HANZI_RE = re.compile(r"[\u4e00-\u9fff]")
+DRAFT_P_RE = re.compile(r"@P(\d+):")
+
 Path(FINAL_DIR).mkdir(parents=True, exist_ok=True)
 Path(PROMPT_DIR).mkdir(parents=True, exist_ok=True)
 
@@ -41,70 +56,54 @@ def load_file(path):
 def save_file(path, content):
     Path(path).write_text(content.strip(), encoding="utf-8")
 
-def call_gpt(system_prompt, user_prompt):
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        # temperature=0.2,  # lower for fidelity edits
-    )
+def call_gpt(system_prompt, user_prompt, use_cache=True, stage="edit", validate=None):
+    """Returns (content, usage). Only outputs `validate` accepts are kept in the response cache."""
+    def request():
+        response = client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            # temperature=0.2,  # lower for fidelity edits
+        )
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens,
+        }
+        return response.choices[0].message.content, usage
 
-    print("📊 Token Usage:")
-    print(f"- Prompt tokens: {response.usage.prompt_tokens}")
-    print(f"- Completion tokens: {response.usage.completion_tokens}")
-    print(f"- Total tokens: {response.usage.total_tokens}")
+    with profiling.phase("api call"), telemetry.track_call(MODEL, stage=stage) as call:
+        content, usage, cached = cached_completion(MODEL, system_prompt, user_prompt, request, use_cache=use_cache,
+                                                   validate=validate)
+        call.set_result(content, usage, cached)
 
-    return response.choices[0].message.content
+    print("📊 Token Usage:" + (" (cached response, no API call)" if cached else ""))
+    print(f"- Prompt tokens: {usage.get('prompt_tokens')} (provider-cached: {usage.get('cached_tokens', 0)})")
+    print(f"- Completion tokens: {usage.get('completion_tokens')}")
+    print(f"- Total tokens: {usage.get('total_tokens')}")
+    if not cached:
+        ttfb = f", first byte {call.ttfb_s:.1f}s" if call.ttfb_s is not None else ""
+        print(f"- Latency: {call.total_s:.1f}s{ttfb}")
 
-def annotate_with_glossary(text, glossary):
-    """
-    Same behavior as your translator: wraps Hanzi with [English] where known.
-    This helps the editor consistently enforce fixed terms without re-inventing them.
-    """
-    for hanzi, translation in sorted(glossary.items(), key=lambda x: len(x[0]), reverse=True):
-        pattern = re.escape(hanzi) + r"(?!\s*\()"
-        text = re.sub(pattern, f"{hanzi}[{translation}]")
-    return text
-
-def update_chapters_index(chapters_dir, output_file=None):
-    """Regenerate chapters.json from all .md files in chapters_dir with 'updated' timestamp."""
-    import json, os
+    return content, usage
+
+def update_chapters_index(chapters_dir, output_file=None, changed=None):
+    """Update chapters.json for chapters_dir, re-reading only new or changed .md files (see chapters_index)."""
     if output_file is None:
         output_file = os.path.join(chapters_dir, "chapters.json")
-    chapters = []
-    for fname in sorted(os.listdir(chapters_dir)):
-        if fname.endswith(".md"):
-            path = os.path.join(chapters_dir, fname)
-            title = fname
-            with open(path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        title = line.lstrip("#").strip()
-                        break
-            mtime = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).isoformat()
-            chapters.append({
-                "id": fname[:-3],
-                "title": title,
-                "updated": mtime
-            })
-    with open(output_file, "w", encoding="utf-8") as out:
-        json.dump(chapters, out, ensure_ascii=False, indent=2)
-    print(f"📖 Updated {output_file} with {len(chapters)} chapters (timestamps added).")
+    stats = chapters_index.update_chapters_index(chapters_dir, output_file, changed=changed)
+    print(f"📖 Updated {output_file} with {stats['chapters']} chapters ({stats['reread']} re-read).")
 
 def scan_latest_chapter_num():
     """
     Find the highest chNNNN present in TRANSLATED_DIR (draft translations).
     """
-    candidates = list(Path(TRANSLATED_DIR).glob("ch*.md"))
-    nums = [
-        int(m.group(1))
-        for p in candidates
-        if (m := re.search(r"ch(\d+)\.md$", p.name))
-    ]
-    return f"{max(nums):04}" if nums else None
+    drafts = chapter_mtimes(TRANSLATED_DIR, ".md")
+    return max(drafts, key=int) if drafts else None
 
 def extract_codeblock_or_text(s: str) -> str:
     """
@@ -117,6 +116,86 @@ def extract_codeblock_or_text(s: str) -> str:
         return m.group(1).strip()
     return s.strip()
 
+def draft_paragraphs(draft: str) -> Dict[int, str]:
+    """@P number -> text of the draft (its TRANSLATION block if it still has one)."""
+    parsed = parse_model_output(draft)
+    if parsed.section("TRANSLATION") is not None:
+        return parsed.paragraphs
+    return dict(paragraph_lines(draft))
+
+def validate_patch(response: str, draft_paras: Dict[int, str]) -> Tuple[Dict[int, str], List[str], int]:
+    """Patch ops from the model's PATCH block that are safe to apply, the rejected ones (as messages)
+    and the number of no-op ops. Raises ValueError if there is no PATCH block at all."""
+    parsed = parse_model_output(response, block="PATCH")
+    if parsed.section("PATCH") is None:
+        raise ValueError("No === PATCH START/END === block in the editor output.")
+    rejected = [str(p) for p in parsed.problems if p.kind == "duplicate_paragraph"]
+    patches = {}
+    unchanged = 0
+    for pnum, text in parsed.paragraphs.items():
+        if pnum not in draft_paras:
+            rejected.append(f"@P{pnum}: not a paragraph of the draft")
+        elif not text.strip():
+            rejected.append(f"@P{pnum}: empty replacement")
+        elif HANZI_RE.search(text):
+            rejected.append(f"@P{pnum}: replacement still contains Chinese")
+        elif text.strip() == draft_paras[pnum].strip():
+            unchanged += 1
+        else:
+            patches[pnum] = text.strip()
+    return patches, rejected, unchanged
+
+def has_patch_block(response: str) -> bool:
+    """Whether validate_patch can read `response` (a complete PATCH block)."""
+    parsed = parse_model_output(response, block="PATCH", paragraphs=False)
+    return parsed.section("PATCH") is not None and "unterminated_section" not in parsed.problem_kinds()
+
+def apply_patches(draft: str, patches: Dict[int, str]) -> str:
+    """The draft with each patched @P paragraph (and its continuation lines) replaced; the rest verbatim.
+
+    With a TRANSLATION block only its lines are eligible, so @P mentions in the QA report stay as they are.
+    """
+    out = []
+    replacing = False
+    blanks = []  # blank lines inside a replaced run: dropped if a continuation line follows
+    in_block = "=== TRANSLATION START ===" not in draft
+    for line in draft.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("=== TRANSLATION "):
+            in_block = stripped.startswith("=== TRANSLATION START")
+        m = DRAFT_P_RE.match(stripped) if in_block else None
+        # As in model_output's paragraph parser, continuation lines carry across blank lines:
+        # only the next @Pn: line or a === marker ends the replaced run.
+        if replacing and not m and not stripped.startswith("==="):
+            if stripped:
+                blanks.clear()
+            else:
+                blanks.append(line)
+            continue
+        out.extend(blanks)
+        blanks.clear()
+        replacing = False
+        if m:
+            pnum = int(m.group(1))
+            replacing = pnum in patches
+            if replacing:
+                out.append(f"@P{pnum}: {patches[pnum]}")
+                continue
+        out.append(line)
+    out.extend(blanks)
+    return "\n".join(out)
+
+def report_patch_savings(response: str, final_text: str, usage: Dict):
+    """Completion tokens of this patch call vs. a full rewrite, which would emit the whole final chapter."""
+    count_tokens, token_source = make_token_counter()
+    patch_out, full_out = count_tokens(response), count_tokens(final_text)
+    completion = usage.get("completion_tokens") or patch_out
+    saved = max(0, full_out - patch_out)
+    full_estimate = completion + saved  # same reasoning, the whole chapter as output
+    share = saved / full_estimate * 100 if full_estimate else 0.0
+    print(f"💾 Patch mode: {completion} completion tokens vs ~{full_estimate} for a full rewrite "
+          f"(~{saved} saved, {share:.0f}%; output tokens by {token_source}).")
+
 def print_diff(a: str, b: str, *, context=2, max_lines=200):
     a_lines = a.splitlines()
     b_lines = b.splitlines()
@@ -134,18 +213,48 @@ def print_diff(a: str, b: str, *, context=2, max_lines=200):
     else:
         print("✅ No textual changes (identical output).")
 
-# === Main ===
-def main():
-    # --- Choose chapter ---
-    # Option 1: set explicitly
-    # chapter_num = "0598"
-    # Option 2: auto-pick the latest draft in TRANSLATED_DIR
-    chapter_num = scan_latest_chapter_num()
-    if not chapter_num:
-        raise SystemExit("No draft chapters found in final_chapters/. Nothing to edit.")
+class EditorError(RuntimeError):
+    pass
 
-    print(f"🧪 Editorial pass for chapter ch{chapter_num}")
+# === Chapter selection ===
+def chapter_mtimes(directory, suffix):
+    """chNNNN -> mtime for every chNNNN<suffix> in directory, from a single listing."""
+    found = {}
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return found
+    with entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith("ch") and name.endswith(suffix) and name[2:-len(suffix)].isdigit():
+                found[name[2:-len(suffix)]] = entry.stat().st_mtime_ns
+    return found
 
+def is_up_to_date(chapter_num, drafts, finals, raws):
+    """The edited chapter exists and is newer than both its draft and its raw Chinese."""
+    final = finals.get(chapter_num)
+    return final is not None and final >= drafts[chapter_num] and final >= raws.get(chapter_num, 0)
+
+def select_chapters(start=None, end=None, stale=False):
+    """Draft chapter numbers to edit: a range, every draft newer than its edited version, or the latest draft."""
+    drafts = chapter_mtimes(TRANSLATED_DIR, ".md")
+    if start or end:
+        lo = int(start) if start else 0
+        hi = int(end) if end else float("inf")
+        return sorted(n for n in drafts if lo <= int(n) <= hi)
+    if stale:
+        finals = chapter_mtimes(FINAL_DIR, ".md")
+        return sorted(n for n in drafts if finals.get(n, -1) < drafts[n])
+    latest = scan_latest_chapter_num()
+    return [latest] if latest else []
+
+# === One chapter ===
+def edit_chapter(chapter_num, *, glossary, matcher, mode=None, verbose=True):
+    """Edit final_chapters/ch{chapter_num}.md into FINAL_DIR. Returns a summary dict; raises EditorError.
+
+    `glossary`/`matcher` are shared by every chapter of a run. Does not touch chapters.json.
+    """
     raw_path = Path(RAW_DIR) / f"ch{chapter_num}.txt"
     draft_path = Path(TRANSLATED_DIR) / f"ch{chapter_num}.md"
     final_path = Path(FINAL_DIR) / f"ch{chapter_num}.md"
@@ -153,36 +262,134 @@ def main():
     # obsidian_output_path = Path(OBSIDIAN_FINAL_DIR) / f"ch{chapter_num}.md"
 
     if not raw_path.exists():
-        raise FileNotFoundError(f"Missing raw chapter: {raw_path}")
+        raise EditorError(f"Missing raw chapter: {raw_path}")
     if not draft_path.exists():
-        raise FileNotFoundError(f"Missing draft translation: {draft_path}")
+        raise EditorError(f"Missing draft translation: {draft_path}")
 
-    rules = load_file(RULES_PATH)
-    glossary = json.loads(load_file(GLOSSARY_PATH))
-    raw_chinese = load_file(raw_path)
-    draft_english = load_file(draft_path)
+    with profiling.phase("load files"):
+        raw_chinese = load_file(raw_path)
+        draft_english = load_file(draft_path)
 
-    annotated_chinese = annotate_with_glossary(raw_chinese, glossary)
+    with profiling.phase("glossary scan", cpu=True):
+        hits = find_terms(raw_chinese, matcher)
+    with profiling.phase("annotate", cpu=True):
+        annotated_chinese = annotate_with_glossary(raw_chinese, glossary, hits=hits)
 
+    draft_paras = draft_paragraphs(draft_english)
+    mode = mode or EDIT_MODE
+    if mode == "patch" and not draft_paras:
+        print(f"⚠️ ch{chapter_num}: draft has no @P paragraphs to patch; using full-rewrite mode.")
+        mode = "full"
     system_prompt = """You are a bilingual xianxia fiction editor."""
-    user_prompt = f"""You will receive the raw chinese text and the draft of the first translation. Check the translation. Your main job is to find ANY inconsistencies in logic, context, character dialoge or actions and fix them in the final output. Fix the mistakes and output only the final fixed version of the translation\n\nRAW (Chinese with annotations):\n{annotated_chinese}\n\nDRAFT (English):\n{draft_english}\n"""
+    if mode == "patch":
+        user_prompt = f"""You will receive the raw chinese text and the draft of the first translation. Check the translation. Your main job is to find ANY inconsistencies in logic, context, character dialoge or actions and fix them. Do NOT output the whole chapter: output only the draft paragraphs you change.\n\nRAW (Chinese with annotations):\n{annotated_chinese}\n\nDRAFT (English):\n{draft_english}\n\nOUTPUT FORMAT (exactly):\n=== PATCH START ===\n@P<n>: <the complete corrected English paragraph>\n=== PATCH END ===\n- <n> is the @P number of the draft paragraph; one line per changed paragraph, unchanged paragraphs omitted.\n- If nothing needs fixing, output the two markers with nothing between them.\n- No Chinese, notes or explanations.\n"""
+    else:
+        user_prompt = f"""You will receive the raw chinese text and the draft of the first translation. Check the translation. Your main job is to find ANY inconsistencies in logic, context, character dialoge or actions and fix them in the final output. Fix the mistakes and output only the final fixed version of the translation\n\nRAW (Chinese with annotations):\n{annotated_chinese}\n\nDRAFT (English):\n{draft_english}\n"""
 
-    print("\n=== EDITOR PROMPT (preview) ===\n")
-    print(user_prompt[:2000] + ("..." if len(user_prompt) > 2000 else ""))
-    print("\n=== END PROMPT PREVIEW ===\n")
+    if verbose:
+        print("\n=== EDITOR PROMPT (preview) ===\n")
+        print(user_prompt[:2000] + ("..." if len(user_prompt) > 2000 else ""))
+        print("\n=== END PROMPT PREVIEW ===\n")
 
-    print(f"🛠️ Editing ch{chapter_num}...")
-    response = call_gpt(system_prompt, user_prompt)
+    print(f"🛠️ Editing ch{chapter_num} ({mode} mode)...")
+    with telemetry.context(chapter=chapter_num):
+        response, usage = call_gpt(system_prompt, user_prompt, stage="edit" if mode == "full" else "edit-patch",
+                                   validate=has_patch_block if mode == "patch" else None)
 
-    corrected = extract_codeblock_or_text(response)
+    summary = {"chapter": chapter_num, "mode": mode, "path": final_path, "usage": usage}
+    if mode == "patch":
+        with profiling.phase("extract output", cpu=True):
+            try:
+                patches, rejected, unchanged = validate_patch(response, draft_paras)
+            except ValueError as e:
+                save_file(prompt_path, user_prompt)
+                raise EditorError(f"ch{chapter_num}: {e} Nothing written; raw output:\n{response[:2000]}")
+            corrected = apply_patches(draft_english, patches)
+        print(f"🩹 ch{chapter_num}: applied {len(patches)} paragraph patch{'es' if len(patches) != 1 else ''}"
+              + (f", {unchanged} no-op" if unchanged else "") + (f", rejected {len(rejected)}" if rejected else "") + ".")
+        for message in rejected:
+            print(f"⚠️ ch{chapter_num}: rejected patch {message}")
+        report_patch_savings(response, corrected, usage)
+        summary["patches"] = len(patches)
+    else:
+        with profiling.phase("extract output", cpu=True):
+            corrected = extract_codeblock_or_text(response)
 
-    save_file(prompt_path, user_prompt)
-    save_file(final_path, corrected)
-    print_diff(draft_english, corrected)
+    with profiling.phase("save outputs"):
+        save_file(prompt_path, user_prompt)
+        save_file(final_path, corrected)
+    if verbose:
+        with profiling.phase("diff", cpu=True):
+            print_diff(draft_english, corrected)
 
-    update_chapters_index(FINAL_DIR, os.path.join(FINAL_DIR, "chapters.json"))
+    with profiling.phase("glossary QA", cpu=True):
+        glossary_misses = missing_translations(hits, corrected)
+    if glossary_misses:
+        print(f"🔎 ch{chapter_num} glossary QA: {len(glossary_misses)} term(s) not found in the edited text: "
+              + ", ".join(f"{k} → {v}" for k, v in glossary_misses[:10]))
+    summary["glossary_misses"] = glossary_misses
 
     print(f"🎉 Final chapter saved to: {final_path}")
+    return summary
+
+# === Main ===
+def main():
+    parser = argparse.ArgumentParser(description="Editorial pass over draft translations (default: the latest draft).")
+    parser.add_argument("--start", help="First chapter number of a range.")
+    parser.add_argument("--end", help="Last chapter number of a range, inclusive.")
+    parser.add_argument("--stale", action="store_true", help="Every draft newer than its edited version (or never edited).")
+    parser.add_argument("--workers", type=int, default=4, help="Chapters edited concurrently.")
+    parser.add_argument("--force", action="store_true", help="Edit chapters whose edited version is already up to date.")
+    parser.add_argument("--mode", choices=["patch", "full"], help=f"Edit mode (default {EDIT_MODE}).")
+    parser.add_argument("--verbose", action="store_true", help="Prompt preview and diff for every chapter of a batch.")
+    parser.add_argument("--profile", action="store_true", help="Print a per-phase timing breakdown (or set PROFILE=1).")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable()
+    else:
+        profiling.enable_from_env()
+
+    chapters = select_chapters(args.start, args.end, args.stale)
+    if not chapters:
+        raise SystemExit("No draft chapters selected in final_chapters/. Nothing to edit.")
+    if not args.force:
+        drafts = chapter_mtimes(TRANSLATED_DIR, ".md")
+        finals = chapter_mtimes(FINAL_DIR, ".md")
+        raws = chapter_mtimes(RAW_DIR, ".txt")
+        fresh = [n for n in chapters if is_up_to_date(n, drafts, finals, raws)]
+        if fresh:
+            print(f"⏭️ Skipping {len(fresh)} chapter(s) already up to date, edited after their draft (use --force to redo).")
+            chapters = [n for n in chapters if n not in set(fresh)]
+    if not chapters:
+        print("✅ Everything selected is up to date.")
+        return
+
+    print(f"🧪 Editorial pass for {len(chapters)} chapter(s): ch{chapters[0]}..ch{chapters[-1]}")
+    with profiling.phase("load files"):
+        glossary, matcher = load_glossary(GLOSSARY_PATH)
+    verbose = args.verbose or len(chapters) == 1
+
+    def job(chapter_num):
+        try:
+            return edit_chapter(chapter_num, glossary=glossary, matcher=matcher, mode=args.mode, verbose=verbose)
+        except Exception as e:
+            print(f"❌ ch{chapter_num}: {e}")
+            return {"chapter": chapter_num, "error": f"{type(e).__name__}: {e}"}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(chapters)))) as pool:
+        results = list(pool.map(job, chapters))
+
+    written = [r["path"] for r in results if "error" not in r]
+    if written:
+        with profiling.phase("update index", cpu=True):
+            update_chapters_index(FINAL_DIR, os.path.join(FINAL_DIR, "chapters.json"), changed=written)
+    failed = [r for r in results if "error" in r]
+    if len(chapters) > 1:
+        completion = sum(r["usage"].get("completion_tokens") or 0 for r in results if "error" not in r)
+        print(f"🏁 Edited {len(written)}/{len(chapters)} chapters ({completion:,} completion tokens).")
+    if failed:
+        print(f"❌ Failed: {', '.join('ch' + r['chapter'] for r in failed)}")
+    profiling.report()
 
 if __name__ == "__main__":
     main()
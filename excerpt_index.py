@@ -0,0 +1,156 @@
+import argparse
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from retranslate_excerpt import (FINAL_CHAPTERS_DIR, extract_translation_section, load_text,
+                                 locate_excerpt_in_chapter, normalise, parse_p_paragraphs)
+
+INDEX_PATH = os.getenv("EXCERPT_INDEX_PATH", ".excerpt_index/excerpts.sqlite3")
+
+# unicode61 splits on everything that is not a letter or a number.
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def fts_query(phrase: str) -> Optional[str]:
+    """FTS5 phrase query matching every chapter whose normalised text contains `phrase` as a substring.
+
+    The first/last words of an excerpt may be cut mid-word, so a leading partial token is dropped and
+    a trailing one becomes a prefix match. Returns None when no whole token is left to search on.
+    """
+    tokens = TOKEN_RE.findall(phrase)
+    if not tokens:
+        return None
+    open_end = TOKEN_RE.match(phrase[-1]) is not None
+    if TOKEN_RE.match(phrase[0]):
+        tokens = tokens[1:]
+        if not tokens:
+            return None
+    query = '"' + " ".join(tokens) + '"'
+    return query + " *" if open_end else query
+
+
+class ExcerptIndex:
+    """Persistent SQLite FTS5 index over final_chapters/ch*.md.
+
+    chapters_fts holds one document per chapter (the normalised translation section, so phrases that
+    cross @P boundaries still match); paragraphs holds the parsed (chapter, @P number, text) rows used
+    to map a hit back to paragraphs. refresh() re-indexes only files whose mtime/size changed.
+    """
+
+    def __init__(self, path: str = INDEX_PATH, chapters_dir: Path = FINAL_CHAPTERS_DIR):
+        self.path = path
+        self.chapters_dir = Path(chapters_dir)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS paragraphs ("
+                " chapter TEXT, seq INTEGER, pnum INTEGER, text TEXT, PRIMARY KEY (chapter, seq))"
+            )
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chapters_fts USING fts5("
+                " name UNINDEXED, body, tokenize = 'unicode61 remove_diacritics 0')"
+            )
+
+    def close(self):
+        self._db.close()
+
+    def _remove(self, name: str):
+        self._db.execute("DELETE FROM files WHERE name = ?", (name,))
+        self._db.execute("DELETE FROM paragraphs WHERE chapter = ?", (name,))
+        self._db.execute("DELETE FROM chapters_fts WHERE name = ?", (name,))
+
+    def refresh(self) -> Tuple[int, int]:
+        """Sync the index with the chapters folder. Returns (re-indexed, removed) file counts."""
+        known = dict((name, (mtime_ns, size)) for name, mtime_ns, size in
+                     self._db.execute("SELECT name, mtime_ns, size FROM files"))
+        updated = 0
+        seen = set()
+        with self._db:
+            if self.chapters_dir.is_dir():
+                with os.scandir(self.chapters_dir) as entries:
+                    for entry in entries:
+                        if not (entry.name.startswith("ch") and entry.name.endswith(".md")) or not entry.is_file():
+                            continue
+                        seen.add(entry.name)
+                        st = entry.stat()
+                        if known.get(entry.name) == (st.st_mtime_ns, st.st_size):
+                            continue
+                        self._index_file(entry.name, st)
+                        updated += 1
+            removed = [name for name in known if name not in seen]
+            for name in removed:
+                self._remove(name)
+        return updated, len(removed)
+
+    def _index_file(self, name: str, st: os.stat_result):
+        section = extract_translation_section(load_text(self.chapters_dir / name))
+        self._remove(name)
+        self._db.execute("INSERT INTO files (name, mtime_ns, size) VALUES (?, ?, ?)",
+                         (name, st.st_mtime_ns, st.st_size))
+        self._db.execute("INSERT INTO chapters_fts (name, body) VALUES (?, ?)", (name, normalise(section)))
+        self._db.executemany(
+            "INSERT INTO paragraphs (chapter, seq, pnum, text) VALUES (?, ?, ?, ?)",
+            [(name, seq, pnum, text) for seq, (pnum, text) in enumerate(parse_p_paragraphs(section))],
+        )
+
+    def chapters_containing(self, phrase: str) -> List[str]:
+        """Chapter file names whose normalised translation contains the (already normalised) phrase."""
+        query = fts_query(phrase)
+        if query is None:
+            rows = self._db.execute("SELECT name FROM chapters_fts WHERE instr(body, ?) > 0", (phrase,))
+        else:
+            rows = self._db.execute(
+                "SELECT name FROM chapters_fts WHERE chapters_fts MATCH ? AND instr(body, ?) > 0", (query, phrase)
+            )
+        return sorted(name for (name,) in rows)
+
+    def paragraphs(self, name: str) -> List[Tuple[int, str]]:
+        return self._db.execute(
+            "SELECT pnum, text FROM paragraphs WHERE chapter = ? ORDER BY seq", (name,)
+        ).fetchall()
+
+    def search(self, excerpt: str, fuzzy: bool = False) -> List[Tuple[str, List[int]]]:
+        """Same result as scanning every chapter file: [(file name, [@P numbers])] in file order."""
+        phrase = normalise(excerpt)
+        if not phrase:
+            return []
+        matches = []
+        for name in self.chapters_containing(phrase):
+            p_paras = self.paragraphs(name)
+            if not p_paras:
+                continue
+            p_hits = locate_excerpt_in_chapter(p_paras, excerpt, fuzzy=fuzzy) or []
+            if p_hits:
+                matches.append((name, p_hits))
+        return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build/refresh the excerpt index, or query it.")
+    parser.add_argument("excerpt", nargs="*", help="Optional phrase to look up after refreshing.")
+    parser.add_argument("--path", default=INDEX_PATH)
+    parser.add_argument("--chapters-dir", default=str(FINAL_CHAPTERS_DIR))
+    args = parser.parse_args()
+
+    index = ExcerptIndex(args.path, Path(args.chapters_dir))
+    t0 = time.perf_counter()
+    updated, removed = index.refresh()
+    print(f"🔎 Index {args.path}: {updated} chapter(s) re-indexed, {removed} removed ({time.perf_counter() - t0:.2f}s)")
+    excerpt = " ".join(args.excerpt).strip()
+    if excerpt:
+        t0 = time.perf_counter()
+        matches = index.search(excerpt)
+        print(f"{len(matches)} match(es) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for name, pnums in matches:
+            print(f"  {name} paragraphs {pnums}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import stat
+import tempfile
+
+# mkstemp creates files 0600; new files get the usual 0666 & ~umask instead. Read once at import,
+# since os.umask can only be queried by setting it (not safe to do while other threads create files).
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """Write via a temp file in the same directory + os.replace, so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def atomic_write_text(path: str, text: str):
+    atomic_write_bytes(path, text.encode("utf-8"))
@@ -0,0 +1,302 @@
+import contextlib
+import gc
+import hashlib
+import os
+import pickle
+import re
+import threading
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from file_utils import atomic_write_bytes
+from glossary_store import GlossaryStore
+
+MATCHER_CACHE_DIR = ".glossary_cache"
+MATCHER_FORMAT = 1  # bump when GlossaryMatcher's attributes change
+
+
+class GlossaryMatcher:
+    """Aho-Corasick automaton over the Hanzi keys of a glossary.
+
+    Built once per glossary; `find_all` scans a chapter in a single pass and
+    reports every (possibly overlapping) occurrence of every term.
+    """
+
+    def __init__(self, glossary: Dict[str, str]):
+        # Same priority the old per-term loop used: longest first, ties keep glossary order.
+        items = sorted(((k, v) for k, v in glossary.items() if k), key=lambda x: len(x[0]), reverse=True)
+        self.terms: List[str] = [k for k, _ in items]
+        self.translations: List[str] = [v for _, v in items]
+        self.lengths: List[int] = [len(k) for k in self.terms]
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for tid, term in enumerate(self.terms):
+            node = 0
+            for ch in term:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(tid)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+        # The single-pass resolver mirrors the old loop only if annotations can never create
+        # new matches (a key inside an English value, or a '[' in a key) and values contain no
+        # re.sub template escapes. Otherwise annotate_with_glossary falls back to the loop.
+        self.exact = (
+            len(self.terms) == len(glossary)
+            and not any("[" in t or "]" in t for t in self.terms)
+            and not any("\\" in v for v in self.translations)
+            and not self.find_all("\n".join(self.translations))
+        )
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """Return (start, term_id) for every occurrence of every term in `text`."""
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self.lengths
+        hits = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for tid in out[state]:
+                    hits.append((end - lengths[tid], tid))
+        return hits
+
+
+def compile_glossary(glossary: Dict[str, str]) -> GlossaryMatcher:
+    return GlossaryMatcher(glossary)
+
+
+def glossary_digest(glossary: Dict[str, str]) -> str:
+    """Hash of the glossary contents in insertion order (order decides ties between equal-length terms)."""
+    payload = "\x00".join(f"{k}\x01{v}" for k, v in glossary.items())
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_matchers: Dict[str, GlossaryMatcher] = {}  # only the newest: a batch moves on as terms are added
+_matchers_lock = threading.Lock()
+_pickle_written = False
+
+
+def load_matcher(glossary: Dict[str, str], cache_dir: str = MATCHER_CACHE_DIR) -> GlossaryMatcher:
+    """Compiled matcher for `glossary`, memoised in-process and pickled under `cache_dir`.
+
+    The pickle is keyed on glossary_digest, so it is rebuilt only when terms change; stale
+    pickles are removed when a new one is written. A process writes at most one pickle (for the
+    glossary it started with): the digests a batch passes through as chapters add terms are
+    compiled in memory only, and only the newest matcher is kept.
+    """
+    global _pickle_written
+    digest = glossary_digest(glossary)
+    with _matchers_lock:
+        matcher = _matchers.get(digest)
+        if matcher is not None:
+            return matcher
+        path = os.path.join(cache_dir, f"matcher-v{MATCHER_FORMAT}-{digest}.pickle")
+        try:
+            matcher = _read_pickle(path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            matcher = compile_glossary(glossary)
+            if not _pickle_written:
+                _pickle_written = True
+                atomic_write_bytes(path, pickle.dumps(matcher, protocol=pickle.HIGHEST_PROTOCOL))
+                for name in os.listdir(cache_dir):
+                    if name.startswith("matcher-") and name != os.path.basename(path):
+                        with contextlib.suppress(FileNotFoundError):  # another process got there first
+                            os.remove(os.path.join(cache_dir, name))
+        _matchers.clear()
+        _matchers[digest] = matcher
+        return matcher
+
+
+def _read_pickle(path: str) -> GlossaryMatcher:
+    # The automaton is hundreds of thousands of small dicts; the cyclic GC pausing mid-load
+    # costs more than the load itself.
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def load_glossary(path: str) -> Tuple[Dict[str, str], GlossaryMatcher]:
+    """glossary.json plus any terms still in its append log (see glossary_store), and its matcher."""
+    glossary = GlossaryStore(path).load()
+    return glossary, load_matcher(glossary)
+
+
+class GlossaryHits:
+    """The glossary terms present in one text, with every start position.
+
+    Computed with a single scan; annotation, the editor prompt and the glossary QA check all
+    work from this instead of the full glossary.
+    """
+
+    def __init__(self, matcher: GlossaryMatcher, text: str):
+        self.matcher = matcher
+        self.text = text
+        self.by_term: Dict[int, List[int]] = {}
+        for start, tid in matcher.find_all(text):
+            self.by_term.setdefault(tid, []).append(start)
+        for starts in self.by_term.values():
+            starts.sort()
+
+    def __len__(self) -> int:
+        return len(self.by_term)
+
+    def terms(self) -> Dict[str, str]:
+        """{Hanzi: English} for the terms present, longest first."""
+        return {self.matcher.terms[tid]: self.matcher.translations[tid] for tid in sorted(self.by_term)}
+
+    def positions(self) -> Dict[str, List[int]]:
+        return {self.matcher.terms[tid]: self.by_term[tid] for tid in sorted(self.by_term)}
+
+
+def find_terms(text: str, matcher: GlossaryMatcher) -> GlossaryHits:
+    return GlossaryHits(matcher, text)
+
+
+def missing_translations(hits: GlossaryHits, translation: str) -> List[Tuple[str, str]]:
+    """QA: (Hanzi, English) of present terms whose English name (minus any "(hint)") is absent from `translation`."""
+    lowered = translation.lower()
+    missing = []
+    for hanzi, english in hits.terms().items():
+        name = re.sub(r"\s*\([^)]*\)", "", english).strip().lower()
+        if name and name not in lowered:
+            missing.append((hanzi, english))
+    return missing
+
+
+def _followed_by_annotation(text: str, pos: int, inserts: Dict[int, str]) -> bool:
+    """Equivalent of the old `(?!\\s*\\[)` lookahead evaluated on the partially annotated text."""
+    n = len(text)
+    while True:
+        if pos in inserts:
+            return True
+        if pos < n and text[pos].isspace():
+            pos += 1
+            continue
+        return pos < n and text[pos] == "["
+
+
+def annotate_with_glossary_loop(text, glossary):
+    """Reference implementation: one re.sub over the whole text per glossary term."""
+    for hanzi, translation in sorted(glossary.items(), key=lambda x: len(x[0]), reverse=True):
+        # match hanzi not followed by another Chinese char, unless already annotated
+        pattern = re.escape(hanzi) + r"(?!\s*\[)"
+        text = re.sub(pattern, f"{hanzi}[{translation}]", text)
+    return text
+
+
+ANNOTATION_MODES = ("all", "first", "paragraphs", "table")
+
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+
+
+def _resolve_inserts(text: str, matcher: GlossaryMatcher, by_term: Dict[int, List[int]]) -> Dict[int, int]:
+    """End offset -> term id of every annotation the old per-term re.sub loop would insert."""
+    inserts: Dict[int, int] = {}
+    lengths = matcher.lengths
+    # Term ids are already in the old loop's processing order.
+    for tid in sorted(by_term):
+        size = lengths[tid]
+        last_end = -1
+        accepted = []
+        for start in sorted(by_term[tid]):
+            if start < last_end:
+                continue  # re.sub matches never overlap
+            end = start + size
+            if any(p in inserts for p in range(start + 1, end)):
+                continue  # split by an annotation added for a longer term
+            if _followed_by_annotation(text, end, inserts):
+                continue
+            accepted.append(end)
+            last_end = end
+        for end in accepted:
+            inserts[end] = tid
+    return inserts
+
+
+def _thin_inserts(text: str, inserts: Dict[int, int], mode: str, every: int) -> Dict[int, int]:
+    """Keep the first annotation of each term per chapter ("first") or per `every` paragraphs."""
+    if mode == "first":
+        window = lambda pos: 0
+    else:
+        breaks = [m.end() for m in PARAGRAPH_BREAK_RE.finditer(text)] or \
+                 [i + 1 for i, ch in enumerate(text) if ch == "\n"]
+        window = lambda pos: bisect_right(breaks, pos) // max(1, every)
+    seen = set()
+    kept: Dict[int, int] = {}
+    for end in sorted(inserts):
+        key = (inserts[end], window(end))
+        if key not in seen:
+            seen.add(key)
+            kept[end] = inserts[end]
+    return kept
+
+
+def annotate_with_glossary(text, glossary, matcher: Optional[GlossaryMatcher] = None,
+                           hits: Optional[GlossaryHits] = None, mode: str = "all", every: int = 10):
+    """Wrap known Hanzi terms as Hanzi[English].
+
+    mode="all" produces exactly what the old per-term re.sub loop produced (longest terms first,
+    shorter terms still annotated inside longer ones unless they end where an annotation already
+    starts), but from a single scan of the chapter. "first" keeps only the first of those
+    annotations per term, "paragraphs" the first per term in each block of `every` paragraphs,
+    and "table" adds none (pair it with glossary_table). Pass `hits` (found in this same text)
+    to reuse a scan that was already done.
+    """
+    if mode not in ANNOTATION_MODES:
+        raise ValueError(f"Unknown annotation mode {mode!r}; expected one of {', '.join(ANNOTATION_MODES)}")
+    if mode == "table":
+        return text
+    if hits is not None:
+        matcher = hits.matcher
+    elif matcher is None:
+        matcher = load_matcher(glossary)
+    if not matcher.exact and mode == "all":
+        return annotate_with_glossary_loop(text, glossary)
+
+    by_term = (hits if hits is not None else GlossaryHits(matcher, text)).by_term
+    inserts = _resolve_inserts(text, matcher, by_term)
+    if mode != "all":
+        inserts = _thin_inserts(text, inserts, mode, every)
+
+    if not inserts:
+        return text
+    pieces = []
+    prev = 0
+    for pos in sorted(inserts):
+        pieces.append(text[prev:pos])
+        pieces.append(f"[{matcher.translations[inserts[pos]]}]")
+        prev = pos
+    pieces.append(text[prev:])
+    return "".join(pieces)
+
+
+def glossary_table(hits: GlossaryHits) -> str:
+    """Compact one-line-per-term list of the glossary terms present, in Hanzi[English] form."""
+    return "\n".join(f"{hanzi}[{english}]" for hanzi, english in hits.terms().items())
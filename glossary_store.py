@@ -0,0 +1,179 @@
+import argparse
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from file_utils import atomic_write_text
+
+# glossary.json is a compacted snapshot. New terms are appended to glossary.json.log, one JSON object
+# per line, under an exclusive flock on glossary.json.lock, so any number of translator threads and
+# processes can add terms without losing any and without rewriting the whole glossary per chapter.
+# Readers see snapshot + log (the first value written for a key wins, as in merge_glossary);
+# `compact` folds the log into glossary.json atomically and empties it, under the same lock.
+LOG_SUFFIX = ".log"
+LOCK_SUFFIX = ".lock"
+COMPACT_LOG_BYTES = int(os.getenv("GLOSSARY_COMPACT_BYTES", str(64 * 1024)))  # maybe_compact threshold
+
+
+class GlossaryStore:
+    """Snapshot + append-log glossary at `path`. `terms` is the merged view as of the last read."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.log_path = path + LOG_SUFFIX
+        self.lock_path = path + LOCK_SUFFIX
+        self.terms: Dict[str, str] = {}
+        self._loaded = False
+        self._snapshot_id: Optional[Tuple[int, int]] = None  # (inode, mtime) of the snapshot we read
+        self._log_offset = 0                                 # bytes of the log already applied
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _snapshot_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _read_snapshot(self):
+        self._snapshot_id = self._snapshot_stat()
+        self.terms.clear()  # in place: callers hold on to the dict returned by load()
+        if self._snapshot_id is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.terms.update(json.load(f))
+        self._log_offset = 0
+        self._loaded = True
+
+    def _read_log(self) -> Dict[str, str]:
+        """Apply log lines past `_log_offset`; returns the terms that were new to `terms`."""
+        added = {}
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return added
+        end = data.rfind(b"\n") + 1  # a line without its newline is still being written (or torn)
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping a damaged line in {self.log_path}")
+                continue
+            for k, v in entry.get("terms", {}).items():
+                if k not in self.terms:
+                    self.terms[k] = v
+                    added[k] = v
+        self._log_offset += end
+        return added
+
+    def _catch_up(self) -> Dict[str, str]:
+        if not self._loaded:
+            self._read_snapshot()
+            self._read_log()
+            return {}
+        if self._snapshot_stat() != self._snapshot_id:
+            # Compacted (or edited by hand) since we read it: reload and report what is new to us.
+            before = set(self.terms)
+            self._read_snapshot()
+            self._read_log()
+            return {k: v for k, v in self.terms.items() if k not in before}
+        return self._read_log()
+
+    def load(self) -> Dict[str, str]:
+        """Full read of snapshot + log. Returns `terms` (kept up to date by refresh/add)."""
+        with self._lock, self._file_lock(exclusive=False):
+            self._read_snapshot()
+            self._read_log()
+            return self.terms
+
+    def refresh(self) -> Dict[str, str]:
+        """Terms other writers added since the last read; only the unread part of the log is parsed."""
+        with self._lock, self._file_lock(exclusive=False):
+            return self._catch_up()
+
+    def add(self, candidates: Dict[str, str], source: str = "") -> Dict[str, str]:
+        """Append the candidates not already in the glossary to the log. Returns the ones added."""
+        with self._lock, self._file_lock(exclusive=True):
+            self._catch_up()
+            added = {k: v for k, v in candidates.items() if k not in self.terms}
+            if not added:
+                return added
+            line = json.dumps({"time": time.time(), "source": source, "terms": added}, ensure_ascii=False) + "\n"
+            fd = os.open(self.log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b"\n":
+                    line = "\n" + line  # isolate a torn line left by a crashed writer
+                os.write(fd, line.encode("utf-8"))
+                self._log_offset = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            self.terms.update(added)
+            return added
+
+    def log_size(self) -> int:
+        try:
+            return os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+
+    def compact(self) -> int:
+        """Fold the log into glossary.json (atomic replace) and empty it. Returns the terms folded in."""
+        with self._lock, self._file_lock(exclusive=True):
+            self._read_snapshot()
+            snapshot_size = len(self.terms)
+            self._read_log()
+            folded = len(self.terms) - snapshot_size
+            if not self.log_size():
+                return folded
+            # The snapshot is replaced even when nothing is new: its changed identity is how other
+            # readers learn that their log offset is void. Crashing before the truncate is harmless,
+            # the log then only repeats keys already in the snapshot.
+            atomic_write_text(self.path, json.dumps(self.terms, ensure_ascii=False, indent=2))
+            self._snapshot_id = self._snapshot_stat()
+            os.truncate(self.log_path, 0)
+            self._log_offset = 0
+            return folded
+
+    def maybe_compact(self, max_log_bytes: int = COMPACT_LOG_BYTES) -> int:
+        return self.compact() if self.log_size() > max_log_bytes else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact the append-log glossary store.")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--path", default="glossary.json")
+    args = parser.parse_args()
+
+    store = GlossaryStore(args.path)
+    if args.command == "compact":
+        folded = store.compact()
+        print(f"🗜️ Folded {folded} logged term{'s' if folded != 1 else ''} into {args.path} ({len(store.terms)} total).")
+        return
+    terms = store.load()
+    snapshot = 0
+    if os.path.exists(args.path):
+        with open(args.path, "r", encoding="utf-8") as f:
+            snapshot = len(json.load(f))
+    print(f"📚 {len(terms)} terms: {snapshot} in {args.path}, {len(terms) - snapshot} pending in "
+          f"{store.log_path} ({store.log_size() / 1024:.1f} KB).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from file_utils import atomic_write_bytes, atomic_write_text
+
+CACHE_DIR = "raw_html_cache"
+
+
+class HtmlCache:
+    """Content-addressed store of raw chapter responses, gzip-compressed, indexed by URL.
+
+    Layout:
+        raw_html_cache/objects/ab/abcdef....html.gz   (sha256 of the raw bytes)
+        raw_html_cache/index.json                     {url: {"sha256", "index", "encoding", "fetched"}}
+    Identical pages share one object; the index always points at the latest fetch of a URL.
+    """
+
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self.index: Dict[str, dict] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.html.gz")
+
+    def put(self, url: str, index: int, raw: bytes, encoding: str = "gb2312") -> str:
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            atomic_write_bytes(path, gzip.compress(raw, mtime=0))
+        with self._lock:
+            self.index[url] = {
+                "sha256": digest,
+                "index": index,
+                "encoding": encoding,
+                "fetched": datetime.now(timezone.utc).isoformat(),
+            }
+        return digest
+
+    def get(self, url: str) -> Optional[bytes]:
+        entry = self.index.get(url)
+        if entry is None or not os.path.exists(self.object_path(entry["sha256"])):
+            return None
+        return read_object(self.object_path(entry["sha256"]))
+
+    def save(self):
+        with self._lock:
+            text = json.dumps(self.index, ensure_ascii=False, indent=2)
+        atomic_write_text(self.index_path, text)
+
+
+def read_object(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return gzip.decompress(f.read())
@@ -0,0 +1,182 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache/responses.sqlite3")
+MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+
+def cache_enabled() -> bool:
+    """Opt out with LLM_CACHE=0 (or off/false/no)."""
+    return os.getenv("LLM_CACHE", "1").strip().lower() not in ("0", "off", "false", "no")
+
+
+def cache_key(model: str, system_prompt: str, user_prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    payload = json.dumps(
+        {"model": model, "system": system_prompt, "user": user_prompt, "params": params or {}},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Persistent response cache keyed on hash(model, system prompt, user prompt, parameters).
+
+    Entries are evicted least-recently-used once the stored responses exceed `max_bytes`.
+    Hit/miss counters are kept both for this process (`hits`, `misses`) and on disk.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, content TEXT, usage TEXT,"
+                " size INTEGER, created REAL, last_access REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def _bump(self, name: str, amount: int = 1):
+        self._db.execute(
+            "INSERT INTO stats(name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, amount, amount),
+        )
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock, self._db:
+            row = self._db.execute("SELECT content, usage FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                self._bump("misses")
+                return None
+            self.hits += 1
+            self._bump("hits")
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0], json.loads(row[1] or "{}")
+
+    def put(self, key: str, model: str, content: str, usage: Dict[str, Any]):
+        size = len(content.encode("utf-8"))
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses(key, model, content, usage, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, content, json.dumps(usage), size, now, now),
+            )
+            self._evict()
+
+    def delete(self, key: str):
+        """Drop one response, e.g. one its caller could not use."""
+        with self._lock, self._db:
+            if self._db.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount:
+                self._bump("rejected")
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._bump("evictions", len(doomed))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "rejected": counters.get("rejected", 0),
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+        }
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM stats")
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[LLMCache]:
+    """Process-wide cache at CACHE_PATH, or None when disabled via LLM_CACHE=0."""
+    global _default_cache
+    if not cache_enabled():
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
+
+
+def cached_completion(model: str, system_prompt: str, user_prompt: str,
+                      call: Callable[[], Tuple[str, Dict[str, Any]]],
+                      params: Optional[Dict[str, Any]] = None,
+                      use_cache: bool = True,
+                      validate: Optional[Callable[[str], bool]] = None) -> Tuple[str, Dict[str, Any], bool]:
+    """Return (content, usage, from_cache); `call` performs the real request and returns (content, usage).
+
+    With `validate`, only content it accepts is stored, and a cached response it rejects (stored by an
+    older version) is dropped and requested again, so an unusable output is not replayed on every rerun.
+    """
+    cache = get_default_cache() if use_cache else None
+    if cache is None:
+        content, usage = call()
+        return content, usage, False
+    key = cache_key(model, system_prompt, user_prompt, params)
+    hit = cache.get(key)
+    if hit is not None:
+        if validate is None or validate(hit[0]):
+            return hit[0], hit[1], True
+        cache.delete(key)
+    content, usage = call()
+    if content and (validate is None or validate(content)):
+        cache.put(key, model, content, usage)
+    return content, usage, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--path", default=CACHE_PATH)
+    args = parser.parse_args()
+    cache = LLMCache(args.path)
+    if args.command == "clear":
+        cache.clear()
+        print(f"🧹 Cleared {args.path}")
+        return
+    s = cache.stats()
+    lookups = s["hits"] + s["misses"]
+    rate = s["hits"] / lookups * 100 if lookups else 0.0
+    print(f"📦 {args.path}: {s['entries']} responses, {s['bytes'] / 1024 / 1024:.1f} MB "
+          f"(limit {cache.max_bytes / 1024 / 1024:.0f} MB)")
+    print(f"   hits {s['hits']} / misses {s['misses']} ({rate:.1f}% hit rate), evictions {s['evictions']}, "
+          f"rejected {s['rejected']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Single-pass parser for the translation model's output contract:
+#   === TRANSLATION START === @Pn lines === TRANSLATION END ===
+#   === QA REPORT START === ... === QA REPORT END ===
+#   === GLOSSARY START === {json} === GLOSSARY END ===
+#   END-OF-OUTPUT
+# plus the RETRANSLATION (retranslate_excerpt) and PATCH (editor patch mode) blocks of @Pn lines.
+# One scan finds every marker, sentinel and ``` fence with its position; sections, paragraphs and
+# the glossary fallbacks are resolved from those tokens without re-searching the text.
+
+SECTION_NAMES = ("TRANSLATION", "QA REPORT", "GLOSSARY", "RETRANSLATION", "PATCH")
+SENTINEL = "END-OF-OUTPUT"
+FENCE = "```"
+MARKER_RE = re.compile(r"=== (TRANSLATION|QA REPORT|GLOSSARY|RETRANSLATION|PATCH) (START|END) ===")
+P_LINE_RE = re.compile(r"@P(\d+):(.*)")
+
+# Problems that make a translation unusable; the rest are contract violations worth reporting.
+PARAGRAPH_PROBLEMS = ("missing_paragraph", "duplicate_paragraph")
+
+
+@dataclass
+class Token:
+    kind: str            # "START", "END", "sentinel" or "fence"
+    name: Optional[str]  # section name for START/END
+    start: int
+    end: int
+
+
+@dataclass
+class Section:
+    name: str
+    start: int       # offset of the START marker
+    end: int         # offset just past the END marker
+    body: str
+
+    @property
+    def stripped(self) -> str:
+        return self.body.strip()
+
+
+@dataclass
+class OutputProblem:
+    kind: str
+    message: str
+    position: Optional[int] = None
+    paragraphs: Tuple[int, ...] = ()
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class OutputFormatError(ValueError):
+    def __init__(self, problems: List[OutputProblem]):
+        self.problems = problems
+        super().__init__("; ".join(p.message for p in problems))
+
+
+def tokenize(text: str) -> List[Token]:
+    """Every marker, sentinel and fence in order of position, non-overlapping.
+
+    Each anchor ("=== ", the sentinel, ```) is located with str.find, which skips ordinary prose far
+    faster than stepping a regex alternation through every character.
+    """
+    tokens = []
+    pos = text.find("=== ")
+    while pos >= 0:
+        m = MARKER_RE.match(text, pos)
+        if m:
+            tokens.append(Token(m.group(2), m.group(1), pos, m.end()))
+        pos = text.find("=== ", m.end() if m else pos + 1)
+    for literal, kind in ((SENTINEL, "sentinel"), (FENCE, "fence")):
+        pos = text.find(literal)
+        while pos >= 0:
+            tokens.append(Token(kind, None, pos, pos + len(literal)))
+            pos = text.find(literal, pos + len(literal))
+    tokens.sort(key=lambda t: t.start)
+    return tokens
+
+
+def paragraph_lines(body: str) -> List[Tuple[int, str]]:
+    """(number, text) for every `@Pn:` line, in order and including repeats; continuation lines are ignored."""
+    out = []
+    for line in body.splitlines():
+        m = P_LINE_RE.match(line.strip())
+        if m:
+            out.append((int(m.group(1)), m.group(2).strip()))
+    return out
+
+
+def _number_list(numbers: Iterable[int], limit: int = 10) -> str:
+    numbers = list(numbers)
+    shown = ", ".join(f"@P{n}" for n in numbers[:limit])
+    return shown + (f" (+{len(numbers) - limit} more)" if len(numbers) > limit else "")
+
+
+@dataclass
+class ParsedOutput:
+    text: str
+    sections: Dict[str, List[Section]] = field(default_factory=dict)
+    fences: List[Token] = field(default_factory=list)
+    sentinel: Optional[int] = None
+    paragraphs: Dict[int, str] = field(default_factory=dict)   # @P number -> text, continuation lines joined
+    problems: List[OutputProblem] = field(default_factory=list)
+
+    def section(self, name: str) -> Optional[Section]:
+        found = self.sections.get(name)
+        return found[0] if found else None
+
+    def body(self, name: str) -> Optional[str]:
+        sec = self.section(name)
+        return sec.stripped if sec else None
+
+    @property
+    def qa_lines(self) -> List[str]:
+        body = self.body("QA REPORT") or ""
+        return [ln.strip() for ln in body.split("\n") if ln.strip() and ln.strip() != "OK"]
+
+    def problem_kinds(self) -> List[str]:
+        return [p.kind for p in self.problems]
+
+    def require(self, *kinds: str):
+        """Raise OutputFormatError if any problem of the given kinds (default: all) was found."""
+        bad = [p for p in self.problems if not kinds or p.kind in kinds]
+        if bad:
+            raise OutputFormatError(bad)
+
+    def glossary_block(self, fallbacks: bool = True) -> Optional[Tuple[str, str, int]]:
+        """(raw JSON text, how it was found, offset where the translation part ends), or None.
+
+        Marker block first; then, with `fallbacks`, as the old extraction did, a ```json fence, any
+        ``` fence, and finally a JSON object running to the end of the output. All resolved without
+        backtracking.
+        """
+        for sec in self.sections.get("GLOSSARY", []):
+            raw = sec.stripped
+            if raw.startswith("{") and raw.endswith("}"):
+                return raw, "marker-based glossary block", sec.start
+        if not fallbacks:
+            return None
+        text = self.text
+        fenced = []
+        for opening, closing in zip(self.fences, self.fences[1:]):
+            tagged = text[opening.end:opening.end + 4].lower() == "json"
+            body_start = opening.end + 4 if tagged else opening.end
+            body = text[body_start:closing.start]
+            raw = body.strip()
+            if len(raw) > 2 and raw.startswith("{") and raw.endswith("}"):
+                fenced.append((not tagged, raw, body_start + len(body) - len(body.lstrip())))
+        if fenced:
+            _, raw, pos = min(fenced, key=lambda f: f[0])  # first ```json fence, else first fence
+            return raw, "legacy fenced glossary block", pos
+        tail = len(text.rstrip())
+        first = text.find("{")
+        if tail and text[tail - 1] == "}" and 0 <= first < tail - 2:
+            return text[first:tail], "trailing JSON fallback", first
+        return None
+
+
+def parse_model_output(text: str, expected: Optional[Iterable[int]] = None,
+                       block: str = "TRANSLATION", paragraphs: bool = True) -> ParsedOutput:
+    """Tokenise `text` once and validate it against the output contract.
+
+    `paragraphs` are read from the `block` section (TRANSLATION, or RETRANSLATION for excerpt
+    retranslations). `expected` is the set of @P numbers that must each appear exactly once there;
+    without it only repeats are checked; `paragraphs=False` skips the paragraph pass when only the
+    blocks are needed. Problems are collected on the result, never raised.
+    """
+    parsed = ParsedOutput(text)
+    problems = parsed.problems
+    open_sections: Dict[str, Token] = {}
+    for token in tokenize(text):
+        if token.kind == "START":
+            if token.name in open_sections:
+                problems.append(OutputProblem("nested_marker", f"=== {token.name} START === repeated before its END", token.start))
+                continue
+            open_sections[token.name] = token
+        elif token.kind == "END":
+            opening = open_sections.pop(token.name, None)
+            if opening is None:
+                problems.append(OutputProblem("unmatched_marker", f"=== {token.name} END === without a START", token.start))
+                continue
+            if token.name in parsed.sections:
+                problems.append(OutputProblem("duplicate_section", f"More than one {token.name} block", opening.start))
+            parsed.sections.setdefault(token.name, []).append(
+                Section(token.name, opening.start, token.end, text[opening.end:token.start]))
+        elif token.kind == "sentinel":
+            if parsed.sentinel is None:
+                parsed.sentinel = token.start
+        else:
+            parsed.fences.append(token)
+    for name, token in open_sections.items():
+        problems.append(OutputProblem("unterminated_section", f"=== {name} START === has no END (truncated output?)", token.start))
+
+    order = [(parsed.section(name).start, name) for name in ("TRANSLATION", "QA REPORT", "GLOSSARY") if parsed.section(name)]
+    if parsed.sentinel is not None:
+        order.append((parsed.sentinel, SENTINEL))
+    if [name for _, name in sorted(order)] != [name for _, name in order]:
+        problems.append(OutputProblem("section_order", "Blocks are not in the order TRANSLATION, QA REPORT, GLOSSARY, END-OF-OUTPUT"))
+
+    translation = parsed.section(block)
+    if translation is None:
+        problems.append(OutputProblem("missing_translation", f"Missing === {block} START/END === block."))
+    elif paragraphs:
+        _parse_paragraphs(parsed, translation, expected)
+    return parsed
+
+
+def _parse_paragraphs(parsed: ParsedOutput, translation: Section, expected: Optional[Iterable[int]]):
+    parts: Dict[int, List[str]] = {}
+    repeated: List[int] = []
+    current = None
+    for line in translation.body.strip().split("\n"):
+        line = line.strip()
+        m = P_LINE_RE.match(line)
+        if m:
+            number = int(m.group(1))
+            if number in parts:
+                repeated.append(number)
+                current = None  # the repeat and its continuation lines are dropped
+                continue
+            current = number
+            parts[number] = [m.group(2).strip()]
+        elif current is not None and line:
+            parts[current].append(line)
+    parsed.paragraphs = {number: "\n".join(lines) for number, lines in parts.items()}
+
+    problems = parsed.problems
+    if repeated:
+        problems.append(OutputProblem("duplicate_paragraph", f"Repeated {_number_list(repeated)}",
+                                      translation.start, tuple(repeated)))
+    if expected is not None:
+        wanted = set(expected)
+        missing = sorted(wanted - parts.keys())
+        extra = sorted(parts.keys() - wanted)
+        if missing:
+            problems.append(OutputProblem("missing_paragraph", f"Missing {_number_list(missing)}",
+                                          translation.start, tuple(missing)))
+        if extra:
+            problems.append(OutputProblem("unexpected_paragraph", f"Unexpected {_number_list(extra)}",
+                                          translation.start, tuple(extra)))
@@ -0,0 +1,130 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Opt-in phase timing: PROFILE=1 (or a script's --profile flag) prints a per-phase breakdown;
+# PROFILE_DIR=<dir> (or --profile-dir) additionally runs cProfile over the CPU-bound phases
+# and writes one <phase>.pstats file per phase there.
+PROFILE_TOP = 8  # functions listed per CPU phase in the report
+
+_lock = threading.Lock()
+_enabled = False
+_profiling_active = False  # one cProfile at a time per process (3.12+ raises on a second enable())
+_cprofile_dir: Optional[str] = None
+_started = 0.0
+_phases: Dict[str, List[float]] = {}   # name -> [calls, seconds]
+_profiles: Dict[str, pstats.Stats] = {}
+
+
+def enable(cprofile_dir: Optional[str] = None):
+    global _enabled, _cprofile_dir, _started
+    _enabled = True
+    _cprofile_dir = cprofile_dir
+    _started = time.perf_counter()
+
+
+def enable_from_env():
+    if os.getenv("PROFILE_DIR"):
+        enable(os.getenv("PROFILE_DIR"))
+    elif os.getenv("PROFILE", "").strip().lower() in ("1", "on", "true", "yes"):
+        enable()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    global _started
+    with _lock:
+        _phases.clear()
+        _profiles.clear()
+    _started = time.perf_counter()
+
+
+def _claim_profiler() -> Optional[cProfile.Profile]:
+    global _profiling_active
+    with _lock:
+        if _profiling_active:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiling tool (e.g. an outside cProfile run) is active
+            return None
+        _profiling_active = True
+        return profiler
+
+
+@contextmanager
+def phase(name: str, cpu: bool = False):
+    """Time the block under `name`; with a cProfile dir, also profile it when `cpu` is set.
+
+    A no-op unless profiling is enabled. Phases running on several threads at once are summed,
+    so the total can exceed the wall time.
+    """
+    global _profiling_active
+    if not _enabled:
+        yield
+        return
+    profiler = None
+    # cProfile profiles one thread and cannot nest or run twice at once: CPU phases that start while
+    # another thread (or an outer phase) is being profiled are timed only.
+    if cpu and _cprofile_dir:
+        profiler = _claim_profiler()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        with _lock:
+            if profiler is not None:
+                profiler.disable()
+                _profiling_active = False
+            entry = _phases.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            if profiler is not None:
+                if name in _profiles:
+                    _profiles[name].add(profiler)
+                else:
+                    _profiles[name] = pstats.Stats(profiler)
+
+
+def _file_name(phase_name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", phase_name).strip("_") + ".pstats"
+
+
+def report(top: int = PROFILE_TOP):
+    """Print the per-phase breakdown (and dump/print the cProfile stats) if profiling is on."""
+    if not _enabled:
+        return
+    wall = time.perf_counter() - _started
+    with _lock:
+        phases = sorted(_phases.items(), key=lambda item: item[1][1], reverse=True)
+        profiles = dict(_profiles)
+    print(f"\n⏱️ Phase breakdown ({wall:.2f}s wall):")
+    print(f"  {'phase':<22} | {'calls':>5} | {'total s':>8} | {'mean ms':>9} | {'% wall':>6}")
+    for name, (calls, seconds) in phases:
+        share = seconds / wall * 100 if wall else 0.0
+        print(f"  {name:<22} | {calls:>5} | {seconds:>8.3f} | {seconds / calls * 1000:>9.1f} | {share:>5.1f}%")
+    if not profiles:
+        return
+    os.makedirs(_cprofile_dir, exist_ok=True)
+    for name, stats in profiles.items():
+        path = os.path.join(_cprofile_dir, _file_name(name))
+        stats.dump_stats(path)
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("tottime").print_stats(top)
+        lines = [ln for ln in out.getvalue().splitlines() if ln.strip()]
+        header = next((i for i, ln in enumerate(lines) if ln.lstrip().startswith("ncalls")), 0)
+        print(f"\n🔬 {name}: top {top} by own time (full stats: python -m pstats {path})")
+        for line in lines[header:]:
+            print("  " + line)
@@ -0,0 +1,102 @@
+# Prompt templates for the translation pass.
+#
+# The "prefix" layout keeps everything static (system prompt, rules, task contract, output
+# format) in a byte-identical prefix and appends the chapter-specific parts last, so provider-side
+# prompt caching can reuse the whole prefix across chapters. "legacy" is the original order with
+# the source chapter between the rules and the tasks.
+from typing import Optional, Tuple
+
+PROMPT_LAYOUTS = ("prefix", "legacy")
+
+TRANSLATION_SYSTEM_PROMPT = (
+    "Professional Chinese→English xianxia translator. Priorities: fidelity, natural English, glossary adherence via inline annotations, zero omissions/additions. Do NOT invent details. Follow output contract exactly."
+)
+
+SOURCE_HEADER = "SOURCE CHAPTER (paragraph indexed, existing glossary terms already annotated as Hanzi[English]):"
+
+# Task contract and output format; identical for every chapter.
+TRANSLATION_TASKS = """Task 1: Translation
+Produce ONE English paragraph for every source paragraph @P{n}. Do not merge, split, omit, or reorder. Leave a blank line between paragraphs.
+Translate according to the RULES above. The whole chapter should be consistent in tone and style, like it's written in the RULES.
+Use the glossary terms already embedded in the source as a guide, hint, recommendation to translate the terms consistently. There should be no Hanzi or square brackets remaining in your English translated output, even if they are written twice. Whatever is in parentheses, like gender in [Zhong Miaoke (female)] or type of artifact like in [Small Water-Nang (medicine)] is a glossary HINT, not something to be copied verbatim. If the glossary is completely unsuitable, use a better English term that fits the context.
+Format exactly:
+=== TRANSLATION START ===
+@P1: ## Chapter # — Title of the Chapter
+
+@P2: <English>
+
+@P3: <English>
+...
+=== TRANSLATION END ===
+
+Task 2: Fidelity Self-Check
+If the translation is the best possible translation for the raw Chinese text, if every paragraph is faithful (no omission/addition/mistranslation/pronoun error/role error/subject-object reversal/term misuse/"lord or lady or sir" mistakes/herself or himself mistakes/"her or his" mistakes), output.
+=== QA REPORT START ===\nOK\n=== QA REPORT END ===
+Else, correct the translation and list the issues you corrected in the block like this:
+=== QA REPORT START ===
+@P7: issue_type=omission | Missing phrase "原文片段"
+@P12: issue_type=pronoun | he → she (她)
+...
+=== QA REPORT END ===
+
+Task 3: New Glossary Terms
+Identify NEW proper nouns / sects / artifacts / beasts / techniques present in raw Hanzi that are NOT already annotated (i.e., do NOT appear as Hanzi[English]) and NOT obvious generic terms. Keys must be ≥2 Hanzi (unless a consistent mononym). Provide English; append (male) or (female) ONLY for people. Format:
+=== GLOSSARY START ===
+{"新术语": "New Term"}
+=== GLOSSARY END ===
+If none:
+=== GLOSSARY START ===
+{}
+=== GLOSSARY END ===
+Constraints:
+- Do NOT repeat any Hanzi that appeared with [English] annotation.
+- No guesses, no inferred variants, no Latin keys, no duplicates.
+
+Order (strict):
+1. Translation block
+2. QA report block
+3. Glossary block
+4. Sentinel line: END-OF-OUTPUT
+
+Global Prohibitions:
+- No markdown fences ```
+- No extra sections or commentary.
+- Every @P index must appear exactly once in translation block.
+"""
+
+
+def dynamic_section(context: Optional[str] = None, term_table: Optional[str] = None) -> str:
+    """Chapter-specific material shown just before the source: term table and chunk context."""
+    section = f"{context}\n\n" if context else ""
+    # "table" annotation mode: the chapter's glossary terms listed once instead of inline.
+    if term_table:
+        section = (
+            "GLOSSARY TERMS IN THIS CHAPTER (treat as annotated Hanzi[English] wherever the Hanzi appears):\n"
+            f"{term_table}\n\n{section}"
+        )
+    return section
+
+
+def static_prefix(rules: str) -> str:
+    """The part of the "prefix" layout user prompt that does not depend on the chapter."""
+    return (
+        f"\nSECTION 0: RESOURCES\nRULES:\n{rules}\n\n"
+        "TASKS (execute strictly in order on the SOURCE CHAPTER at the end of this message):\n\n"
+        f"{TRANSLATION_TASKS}\n"
+    )
+
+
+def render_translation_prompt(rules: str, indexed_source: str, context: Optional[str] = None,
+                              term_table: Optional[str] = None, layout: str = "prefix") -> Tuple[str, str]:
+    """Returns (system_prompt, user_prompt) for one chapter or chunk."""
+    if layout not in PROMPT_LAYOUTS:
+        raise ValueError(f"Unknown prompt layout {layout!r}; expected one of {', '.join(PROMPT_LAYOUTS)}")
+    dynamic = dynamic_section(context, term_table)
+    if layout == "legacy":
+        user_prompt = (
+            f"\nSECTION 0: RESOURCES\nRULES:\n{rules}\n\n{dynamic}{SOURCE_HEADER}\n{indexed_source}\n\n"
+            f"TASKS (execute strictly in order):\n\n{TRANSLATION_TASKS}\nEND.\n"
+        )
+    else:
+        user_prompt = f"{static_prefix(rules)}\n{dynamic}{SOURCE_HEADER}\n{indexed_source}\n\nEND.\n"
+    return TRANSLATION_SYSTEM_PROMPT, user_prompt
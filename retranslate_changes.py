@@ -0,0 +1,227 @@
+import argparse
+import difflib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import translatorV3 as tr
+from model_output import parse_model_output
+import profiling
+
+# A re-scraped chapter (the site revised it) is diffed paragraph by paragraph against the raw text it
+# was last translated from, split with the translator's own split_into_paragraphs. Unchanged
+# paragraphs keep their English from final_chapters/ under their new @P number; only inserted and
+# modified paragraphs (with their translated neighbours as context) go to the model.
+#
+# The old raw text is the snapshot translate_chapter saves next to the indexed source. Chapters
+# translated before snapshots existed fall back to the indexed source with its Hanzi[English]
+# annotations stripped, whose paragraph numbering is exactly the one the old translation used.
+ANNOTATION_RE = re.compile(r"(?<=[\u4e00-\u9fff])\[[^\[\]\n]*\]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalise(paragraph: str) -> str:
+    return WHITESPACE_RE.sub(" ", paragraph).strip()
+
+
+def old_source_paragraphs(chapter_num: str) -> Optional[List[str]]:
+    """Raw paragraphs of the last translated version of the chapter, or None if there is no record of it."""
+    snapshot = tr.source_snapshot_path(chapter_num)
+    if snapshot.exists():
+        return tr.split_into_paragraphs(tr.load_file(snapshot))
+    indexed = Path(tr.INDEXED_DIR) / f"ch{chapter_num}_indexed.md"
+    if not indexed.exists():
+        return None
+    return [ANNOTATION_RE.sub("", m.group(2))
+            for m in map(tr.INDEXED_LINE_RE.match, tr.load_file(indexed).split("\n")) if m]
+
+
+def old_translation(chapter_num: str) -> Dict[int, str]:
+    """@P number -> English of final_chapters/ch{chapter_num}.md ({} if it was never translated)."""
+    path = Path(tr.OUTPUT_DIR) / f"ch{chapter_num}.md"
+    if not path.exists():
+        return {}
+    return parse_model_output(tr.load_file(path)).paragraphs
+
+
+def paragraph_diff(old: List[str], new: List[str]) -> Tuple[Dict[int, int], Dict[str, int]]:
+    """Align two paragraph lists. Returns ({new @P: old @P} for unchanged paragraphs, change counts).
+
+    Paragraphs are compared with whitespace collapsed, as build_indexed_source sends them.
+    """
+    matcher = difflib.SequenceMatcher(None, [normalise(p) for p in old], [normalise(p) for p in new],
+                                      autojunk=False)
+    unchanged: Dict[int, int] = {}
+    counts = {"unchanged": 0, "modified": 0, "inserted": 0, "deleted": 0}
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            unchanged.update((j + 1, i + 1) for i, j in zip(range(i1, i2), range(j1, j2)))
+            counts["unchanged"] += i2 - i1
+        elif op == "replace":
+            # A replaced run of unequal length counts its surplus as inserted or deleted.
+            common = min(i2 - i1, j2 - j1)
+            counts["modified"] += common
+            counts["inserted"] += (j2 - j1) - common
+            counts["deleted"] += (i2 - i1) - common
+        elif op == "insert":
+            counts["inserted"] += j2 - j1
+        else:
+            counts["deleted"] += i2 - i1
+    return unchanged, counts
+
+
+def plan_update(chapter_num: str) -> Optional[dict]:
+    """What re-translating the chapter needs: {"known": {new @P: English}, "counts", "renumbered"}.
+
+    None when the chapter has no earlier translation to start from (translate it in full instead).
+    """
+    old = old_source_paragraphs(chapter_num)
+    english = old_translation(chapter_num)
+    if old is None or not english:
+        return None
+    new = tr.split_into_paragraphs(tr.load_file(Path(tr.CHAPTER_DIR) / f"ch{chapter_num}.txt"))
+    unchanged, counts = paragraph_diff(old, new)
+    known = {new_p: english[old_p] for new_p, old_p in unchanged.items() if old_p in english}
+    counts["untranslated"] = len(unchanged) - len(known)  # unchanged, but missing from the old output
+    return {"known": known, "counts": counts, "paragraphs": len(new),
+            "renumbered": sum(1 for new_p, old_p in unchanged.items() if new_p != old_p)}
+
+
+def describe(plan: dict) -> str:
+    c = plan["counts"]
+    parts = [f"{c['unchanged']} unchanged", f"{c['modified']} modified", f"{c['inserted']} inserted",
+             f"{c['deleted']} deleted"]
+    if plan["renumbered"]:
+        parts.append(f"{plan['renumbered']} renumbered")
+    if c["untranslated"]:
+        parts.append(f"{c['untranslated']} unchanged but missing from the old translation")
+    return ", ".join(parts)
+
+
+def is_unchanged(plan: dict) -> bool:
+    return len(plan["known"]) == plan["paragraphs"] and not plan["renumbered"] and not plan["counts"]["deleted"]
+
+
+def update_chapter(chapter_num: str, *, rules=None, glossary=None, force=False, verbose=False,
+                   mirror_to_obsidian=True, update_index=True) -> dict:
+    """Re-translate only the changed paragraphs of a re-scraped chapter. Returns a summary dict.
+
+    A chapter without an earlier translation is translated in full; with `force` an unchanged one is
+    rewritten anyway (from the kept paragraphs alone, without a request).
+    """
+    with profiling.phase("diff", cpu=True):
+        plan = plan_update(chapter_num)
+    if plan is None:
+        print(f"📄 ch{chapter_num}: no earlier translation to diff against; translating in full.")
+        summary = tr.translate_chapter(chapter_num, rules=rules, glossary=glossary, verbose=verbose,
+                                       mirror_to_obsidian=mirror_to_obsidian, update_index=update_index)
+        return {**summary, "mode": "full"}
+    print(f"♻️ ch{chapter_num}: {describe(plan)}.")
+    if is_unchanged(plan) and not force:
+        # Only whitespace changed (or the snapshot predates this tool): record the new text as the
+        # translated source so changed_chapters does not list the chapter again.
+        raw_text = tr.load_file(Path(tr.CHAPTER_DIR) / f"ch{chapter_num}.txt")
+        tr.save_file(tr.source_snapshot_path(chapter_num), raw_text)
+        print(f"✅ ch{chapter_num}: the raw text did not change; translation kept.")
+        return {"chapter": chapter_num, "mode": "unchanged", "paragraphs": plan["paragraphs"],
+                "known_paragraphs": len(plan["known"]), "sent_paragraphs": 0}
+    summary = tr.translate_chapter(chapter_num, rules=rules, glossary=glossary, verbose=verbose,
+                                   mirror_to_obsidian=mirror_to_obsidian, update_index=update_index,
+                                   known=plan["known"])
+    return {**summary, "mode": "diff", "changes": plan["counts"]}
+
+
+def changed_chapters() -> List[str]:
+    """Translated chapters whose raw text differs from the snapshot it was translated from.
+
+    Chapters without a snapshot count as changed when the raw file is newer than the translation.
+    """
+    found = []
+    for path in sorted(Path(tr.OUTPUT_DIR).glob("ch*.md")):
+        chapter_num = path.stem[2:]
+        raw = Path(tr.CHAPTER_DIR) / f"ch{chapter_num}.txt"
+        if not chapter_num.isdigit() or not raw.exists():
+            continue
+        snapshot = tr.source_snapshot_path(chapter_num)
+        if snapshot.exists():
+            if tr.load_file(raw) != tr.load_file(snapshot):
+                found.append(chapter_num)
+        elif os.path.getmtime(raw) > os.path.getmtime(path):
+            found.append(chapter_num)
+    return found
+
+
+def print_report(results, elapsed):
+    print("\n=== Update report ===")
+    sent = known = 0
+    for r in results:
+        if not r["ok"]:
+            print(f"  ch{r['chapter']}: FAILED — {r['error']}")
+            continue
+        sent += r["sent_paragraphs"]
+        known += r["known_paragraphs"]
+        print(f"  ch{r['chapter']}: {r['mode']}, {r['sent_paragraphs']}/{r['paragraphs']} paragraphs sent "
+              f"({r['seconds']:.1f}s)")
+    total = sent + known
+    share = sent / total * 100 if total else 0.0
+    print(f"🏁 {sum(r['ok'] for r in results)}/{len(results)} chapters updated in {elapsed:.1f}s; "
+          f"{sent}/{total} paragraphs sent to the model ({share:.1f}%).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-translate only the paragraphs a re-scrape changed.")
+    parser.add_argument("chapters", nargs="*", help="Chapter numbers like 0694 (default: every changed chapter).")
+    parser.add_argument("--dry-run", action="store_true", help="Print the diff of each chapter without translating.")
+    parser.add_argument("--force", action="store_true", help="Rewrite chapters whose raw text did not change.")
+    parser.add_argument("--workers", type=int, default=4, help="Chapters updated concurrently.")
+    parser.add_argument("--verbose", action="store_true", help="Print full prompts and raw model output.")
+    parser.add_argument("--no-obsidian", action="store_true", help="Skip the Obsidian mirror and index update.")
+    parser.add_argument("--profile", action="store_true", help="Print a per-phase timing breakdown (or set PROFILE=1).")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable()
+    else:
+        profiling.enable_from_env()
+
+    chapters = args.chapters or changed_chapters()
+    if not chapters:
+        print("✅ No re-scraped chapters differ from their translated source.")
+        return
+    if args.dry_run:
+        for chapter_num in chapters:
+            plan = plan_update(chapter_num)
+            print(f"  ch{chapter_num}: {describe(plan) if plan else 'no earlier translation (full translation)'}")
+        return
+
+    print(f"📚 Updating {len(chapters)} chapter(s) with {args.workers} worker(s)")
+    rules = tr.load_file(tr.RULES_PATH)
+    glossary = tr.GLOSSARY_STORE.load()
+
+    def job(chapter_num):
+        t0 = time.perf_counter()
+        try:
+            summary = update_chapter(chapter_num, rules=rules, glossary=glossary, force=args.force,
+                                     verbose=args.verbose, mirror_to_obsidian=not args.no_obsidian,
+                                     update_index=False)
+            return {"ok": True, "seconds": time.perf_counter() - t0, **summary}
+        except Exception as e:
+            return {"chapter": chapter_num, "ok": False, "seconds": time.perf_counter() - t0,
+                    "error": f"{type(e).__name__}: {e}"}
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = [future.result() for future in as_completed([pool.submit(job, ch) for ch in chapters])]
+    results.sort(key=lambda r: r["chapter"])
+    if tr.GLOSSARY_STORE.compact():
+        print(f"🗜️ Compacted the glossary log into {tr.GLOSSARY_PATH}.")
+    if not args.no_obsidian and any(r["ok"] and r["mode"] != "unchanged" for r in results):
+        tr.update_chapters_index(tr.OBSIDIAN_CHAPTERS_DIR, os.path.join(tr.OBSIDIAN_CHAPTERS_DIR, "chapters.json"))
+    print_report(results, time.perf_counter() - t0)
+    profiling.report()
+
+
+if __name__ == "__main__":
+    main()
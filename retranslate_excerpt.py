@@ -1,9 +1,15 @@
 import argparse
 import os
 import re
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Union
 from dotenv import load_dotenv
+from llm_cache import cached_completion
+from model_output import OutputProblem, paragraph_lines, parse_model_output
+import telemetry
 
 load_dotenv()
 
@@ -14,27 +20,21 @@ except ImportError:
 
 FINAL_CHAPTERS_DIR = Path("final_chapters")
 RAW_CHINESE_DIR = Path("piaotian_chapters")
+BATCH_REPORT_DIR = Path("retranslations")
 
-P_LINE_RE = re.compile(r'^@P(\d+):\s*(.*)$')
-TRANSLATION_BLOCK_RE = re.compile(r'=== TRANSLATION START ===\s*([\s\S]*?)=== TRANSLATION END ===', re.MULTILINE)
-RETRANS_BLOCK_RE = re.compile(r'=== RETRANSLATION START ===\s*([\s\S]*?)\s*=== RETRANSLATION END ===', re.MULTILINE)
 BLANK_SPLIT_RE = re.compile(r"\n\s*\n")
+BATCH_PIN_RE = re.compile(r"^(ch\d+)\s*:\s*(.+)$")  # "ch0600: phrase" in a batch file pins the chapter
 
 
 def load_text(path: Path) -> str:
     return path.read_text(encoding="utf-8")
 
 def extract_translation_section(full_text: str) -> str:
-    m = TRANSLATION_BLOCK_RE.search(full_text)
-    return m.group(1).strip() if m else full_text
+    body = parse_model_output(full_text, paragraphs=False).body("TRANSLATION")
+    return body if body is not None else full_text
 
 def parse_p_paragraphs(translation_section: str) -> List[Tuple[int, str]]:
-    out = []
-    for line in translation_section.splitlines():
-        m = P_LINE_RE.match(line.strip())
-        if m:
-            out.append((int(m.group(1)), m.group(2).strip()))
-    return out
+    return paragraph_lines(translation_section)
 
 def split_raw_chinese(raw: str) -> List[str]:
     raw = raw.replace('\r\n', '\n').strip()
@@ -46,73 +46,161 @@ def split_raw_chinese(raw: str) -> List[str]:
 def normalise(s: str) -> str:
     return re.sub(r"\s+", " ", s).strip().lower()
 
-def locate_excerpt_in_chapter(paragraphs: List[Tuple[int, str]], excerpt: str, fuzzy: bool=False) -> Optional[List[int]]:
+class NormalisedChapter:
+    """A chapter's @P paragraphs normalised once and joined into a single string.
+
+    `starts`/`ends` are the offsets of each paragraph in `text`, so any match position maps back to
+    the covering paragraphs with a binary search. Token sets for the fuzzy fallback are built lazily.
+    """
+
+    def __init__(self, paragraphs: List[Tuple[int, str]]):
+        self.pnums = [pnum for pnum, _ in paragraphs]
+        self.norm = [normalise(txt) for _, txt in paragraphs]
+        self.text = ' '.join(self.norm)
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        pos = 0
+        for para in self.norm:
+            self.starts.append(pos)
+            pos += len(para)
+            self.ends.append(pos)
+            pos += 1
+        self._tokens: Optional[List[set]] = None
+
+    @property
+    def tokens(self) -> List[set]:
+        if self._tokens is None:
+            self._tokens = [set(para.split()) for para in self.norm]
+        return self._tokens
+
+    def paragraphs_containing(self, phrase: str) -> List[int]:
+        return [self.pnums[k] for k in range(len(self.norm)) if self.text.find(phrase, self.starts[k], self.ends[k]) >= 0]
+
+    def covering_span(self, phrase: str) -> Optional[List[int]]:
+        """@P numbers of the earliest-starting, then shortest, run of paragraphs containing `phrase`."""
+        pos = self.text.find(phrase)
+        if pos < 0:
+            return None
+        first = bisect_right(self.starts, pos) - 1
+        last = bisect_left(self.ends, pos + len(phrase))
+        return self.pnums[first:last + 1]
+
+    def best_token_overlap(self, phrase: str) -> Optional[List[int]]:
+        phrase_tokens = set(phrase.split())
+        scored = []
+        for pnum, tokens in zip(self.pnums, self.tokens):
+            inter = phrase_tokens & tokens
+            if inter:
+                scored.append((len(inter), pnum))
+        if not scored:
+            return None
+        scored.sort(reverse=True)
+        best_count = scored[0][0]
+        return [p for c, p in scored if c == best_count]
+
+
+def locate_excerpt_in_chapter(paragraphs: Union[List[Tuple[int, str]], NormalisedChapter], excerpt: str, fuzzy: bool=False) -> Optional[List[int]]:
     phrase = normalise(excerpt)
     if not phrase:
         return None
+    chapter = paragraphs if isinstance(paragraphs, NormalisedChapter) else NormalisedChapter(paragraphs)
     # First: exact single-paragraph containment
-    hits = [pnum for pnum, txt in paragraphs if phrase in normalise(txt)]
+    hits = chapter.paragraphs_containing(phrase)
     if hits:
         return hits
     # Multi-paragraph span search (contiguous) – only if phrase crosses boundaries
-    norm_paras = [normalise(txt) for _, txt in paragraphs]
-    n = len(norm_paras)
-    for i in range(n):
-        acc = norm_paras[i]
-        if phrase in acc:
-            return [paragraphs[i][0]]
-        for j in range(i+1, n):
-            acc += ' ' + norm_paras[j]
-            if phrase in acc:
-                return [paragraphs[k][0] for k in range(i, j+1)]
+    span = chapter.covering_span(phrase)
+    if span:
+        return span
     if fuzzy:
         # fallback: paragraph(s) containing largest overlap token set
-        phrase_tokens = set(phrase.split())
-        scored = []
-        for pnum, txt in paragraphs:
-            tokens = set(normalise(txt).split())
-            inter = phrase_tokens & tokens
-            if inter:
-                scored.append((len(inter), pnum))
-        if scored:
-            scored.sort(reverse=True)
-            best_count = scored[0][0]
-            return [p for c, p in scored if c == best_count]
+        return chapter.best_token_overlap(phrase)
     return None
 
-def find_best_chapter(excerpt: str, fuzzy: bool=False) -> List[Tuple[str, List[int]]]:
-    matches = []
-    phrase = normalise(excerpt)
-    if not phrase:
+def scan_chapters_many(excerpts: List[str], fuzzy: bool=False) -> List[List[Tuple[str, List[int]]]]:
+    """scan_chapters for several excerpts, reading and normalising each chapter file once."""
+    phrases = [normalise(e) for e in excerpts]
+    matches: List[List[Tuple[str, List[int]]]] = [[] for _ in excerpts]
+    if not any(phrases):
         return matches
     for path in sorted(FINAL_CHAPTERS_DIR.glob('ch*.md')):
-        full = load_text(path)
-        translation_section = extract_translation_section(full)
-        if phrase not in normalise(translation_section):
-            continue
-        p_paras = parse_p_paragraphs(translation_section)
-        if not p_paras:
-            continue
-        p_hits = locate_excerpt_in_chapter(p_paras, excerpt, fuzzy=fuzzy) or []
-        if p_hits:
-            matches.append((path.name, p_hits))
+        translation_section = extract_translation_section(load_text(path))
+        text = normalise(translation_section)
+        chapter = None
+        for i, phrase in enumerate(phrases):
+            if not phrase or phrase not in text:
+                continue
+            if chapter is None:
+                p_paras = parse_p_paragraphs(translation_section)
+                if not p_paras:
+                    break
+                chapter = NormalisedChapter(p_paras)
+            p_hits = locate_excerpt_in_chapter(chapter, excerpts[i], fuzzy=fuzzy) or []
+            if p_hits:
+                matches[i].append((path.name, p_hits))
     return matches
 
+def scan_chapters(excerpt: str, fuzzy: bool=False) -> List[Tuple[str, List[int]]]:
+    return scan_chapters_many([excerpt], fuzzy=fuzzy)[0]
+
+def find_chapters(excerpts: List[str], fuzzy: bool=False, use_index: bool=True) -> List[List[Tuple[str, List[int]]]]:
+    """Matching chapters (and @P numbers) for every excerpt; one index refresh or one scan of the files."""
+    if use_index:
+        import sqlite3
+        from excerpt_index import ExcerptIndex
+        try:
+            index = ExcerptIndex()
+        except sqlite3.OperationalError as e:  # e.g. SQLite built without FTS5
+            print(f"⚠️ Excerpt index unavailable ({e}); scanning chapter files.")
+        else:
+            try:
+                index.refresh()
+                return [index.search(excerpt, fuzzy=fuzzy) for excerpt in excerpts]
+            finally:
+                index.close()
+    return scan_chapters_many(excerpts, fuzzy=fuzzy)
+
+def find_best_chapter(excerpt: str, fuzzy: bool=False, use_index: bool=True) -> List[Tuple[str, List[int]]]:
+    """Chapters (and @P numbers) containing the excerpt, via the persistent excerpt index when possible."""
+    return find_chapters([excerpt], fuzzy=fuzzy, use_index=use_index)[0]
+
+def context_windows(hit_pnums: List[int], context: int, last: int) -> List[Tuple[int, int]]:
+    """Merged [p - context, p + context] ranges around the starred paragraphs.
+
+    A starred paragraph past `last` (the raw chapter has fewer paragraphs than the translation) keeps
+    its window; build_retranslation_prompt leaves out the context lines past `last` and sends the
+    starred paragraph with an empty ZH line.
+    """
+    windows: List[Tuple[int, int]] = []
+    for pnum in sorted(set(hit_pnums)):
+        lo, hi = min(pnum, max(1, pnum - context)), max(pnum, min(last, pnum + context))
+        if windows and lo <= windows[-1][1] + 1:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], hi))
+        else:
+            windows.append((lo, hi))
+    return windows
+
 def build_retranslation_prompt(chapter_id: str, hit_pnums: List[int], translation_paras: List[Tuple[int, str]], raw_chinese_paras: List[str], context: int) -> str:
     # Guarantee at least 1 paragraph of context above/below regardless of user input
     context = max(1, context)
-    pmin, pmax = min(hit_pnums), max(hit_pnums)
-    pmin_ctx = max(1, pmin - context)
-    pmax_ctx = min(len(raw_chinese_paras), pmax + context)
+    # Starred paragraphs far apart (a batch over one chapter) get separate windows, not one long slice.
+    windows = context_windows(hit_pnums, context, len(raw_chinese_paras))
     eng_slice = []
     zh_slice = []
     trans_map = {pnum: txt for pnum, txt in translation_paras}
-    for pnum in range(pmin_ctx, pmax_ctx + 1):
-        eng = trans_map.get(pnum, '').strip()
-        zh = raw_chinese_paras[pnum - 1] if pnum - 1 < len(raw_chinese_paras) else ''
-        mark = '*' if pnum in hit_pnums else ' '
-        eng_slice.append(f"@P{pnum}{mark}: {eng}")
-        zh_slice.append(f"@P{pnum}{mark}: {zh}")
+    for lo, hi in windows:
+        if eng_slice:
+            eng_slice.append("…")
+            zh_slice.append("…")
+        for pnum in range(lo, hi + 1):
+            if pnum > len(raw_chinese_paras) and pnum not in hit_pnums:
+                continue  # clip the context, never the starred paragraph
+            eng = trans_map.get(pnum, '').strip()
+            zh = raw_chinese_paras[pnum - 1] if pnum <= len(raw_chinese_paras) else ''
+            mark = '*' if pnum in hit_pnums else ' '
+            eng_slice.append(f"@P{pnum}{mark}: {eng}")
+            zh_slice.append(f"@P{pnum}{mark}: {zh}")
+    gaps = "\n- A line with only \"…\" marks skipped paragraphs." if len(windows) > 1 else ""
     system_prompt = ("You are a professional bilingual Chinese→English xianxia translator. Retranslate ONLY the starred paragraphs faithfully, concise, natural, no added lore.")
     user_prompt = f"""
 SOURCE (Chinese, context):
@@ -122,7 +210,7 @@ CURRENT TRANSLATION (English, context):
 {os.linesep.join(eng_slice)}
 
 INSTRUCTIONS:
-- Retranslate ONLY paragraphs with an asterisk (*). Context (non-star) lines are provided for reference; DO NOT output them.
+- Retranslate ONLY paragraphs with an asterisk (*). Context (non-star) lines are provided for reference; DO NOT output them.{gaps}
 - If possible, make the translation from a different angle of meaning that the provided translation, so that the meaning can be discerned.
 - Output format EXACTLY:
 === RETRANSLATION START ===
@@ -136,26 +224,194 @@ Provide only the block.
 """.strip()
     return system_prompt, user_prompt
 
+def has_retranslation_block(out: str) -> bool:
+    """Whether `out` has a complete RETRANSLATION block; only such replies are kept in the response cache."""
+    parsed = parse_model_output(out, block="RETRANSLATION", paragraphs=False)
+    return parsed.section("RETRANSLATION") is not None and "unterminated_section" not in parsed.problem_kinds()
+
 load_dotenv()
-def call_openai(system_prompt: str, user_prompt: str, model: str = "gpt-5-mini-2025-08-07") -> Tuple[str, Dict[str, Any]]:
-    if OpenAI is None:
-        raise RuntimeError("openai package not installed. pip install openai")
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-    client = OpenAI(api_key=api_key)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-    )
-    usage = {
-        "prompt_tokens": getattr(resp.usage, 'prompt_tokens', None),
-        "completion_tokens": getattr(resp.usage, 'completion_tokens', None),
-        "total_tokens": getattr(resp.usage, 'total_tokens', None),
-    }
-    content = resp.choices[0].message.content
+def call_openai(system_prompt: str, user_prompt: str, model: str = "gpt-5-mini-2025-08-07",
+                use_cache: bool = True) -> Tuple[str, Dict[str, Any]]:
+    def request() -> Tuple[str, Dict[str, Any]]:
+        if OpenAI is None:
+            raise RuntimeError("openai package not installed. pip install openai")
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY not set")
+        client = OpenAI(api_key=api_key, http_client=telemetry.http_client())
+        resp = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+        )
+        usage = {
+            "prompt_tokens": getattr(resp.usage, 'prompt_tokens', None),
+            "cached_tokens": getattr(getattr(resp.usage, 'prompt_tokens_details', None), 'cached_tokens', None) or 0,
+            "completion_tokens": getattr(resp.usage, 'completion_tokens', None),
+            "total_tokens": getattr(resp.usage, 'total_tokens', None),
+        }
+        return resp.choices[0].message.content, usage
+
+    with telemetry.track_call(model, stage="retranslate") as call:
+        content, usage, cached = cached_completion(model, system_prompt, user_prompt, request, use_cache=use_cache,
+                                                   validate=has_retranslation_block)
+        call.set_result(content, usage, cached)
+    if cached:
+        print("(cached response, no API call)")
     return content, usage
 
+def merge_retranslation(out: str, hit_pnums: List[int], raw_paragraphs: List[str]) -> Tuple[Optional[List[Tuple[int, str, str]]], List[OutputProblem]]:
+    """(@P number, Chinese, new English) per line of the RETRANSLATION block (None if there is no
+    block), plus the paragraph problems found: starred paragraphs missing, repeated or unexpected."""
+    parsed = parse_model_output(out, expected=hit_pnums, block="RETRANSLATION")
+    block = parsed.body("RETRANSLATION")
+    if block is None:
+        return None, []
+    problems = [p for p in parsed.problems
+                if p.kind in ("duplicate_paragraph", "missing_paragraph", "unexpected_paragraph")]
+    merged = []
+    for pnum, new_en in paragraph_lines(block):
+        zh = raw_paragraphs[pnum-1] if 0 <= pnum-1 < len(raw_paragraphs) else ''
+        merged.append((pnum, zh, new_en))
+    return merged, problems
+
+# =============================================================
+# Batch mode: many excerpts, one request per chapter
+# =============================================================
+
+def read_batch_file(path: Path) -> List[Tuple[Optional[str], str]]:
+    """(pinned chapter id or None, excerpt) per non-blank line; lines starting with # are comments."""
+    entries = []
+    for line in load_text(path).splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        m = BATCH_PIN_RE.match(line)
+        entries.append((m.group(1), m.group(2).strip()) if m else (None, line))
+    return entries
+
+def plan_batch(entries: List[Tuple[Optional[str], str]], fuzzy: bool=False, use_index: bool=True):
+    """Resolve every excerpt to (chapter, @P numbers) and group them by chapter, without prompting.
+
+    Returns (groups, unresolved, notes): groups maps chapter file name -> {@P number: [excerpts]};
+    an excerpt found in several chapters goes to the first, as the interactive default does, and
+    the others are listed in `notes`.
+    """
+    free = [excerpt for chapter_id, excerpt in entries if chapter_id is None]
+    found = iter(find_chapters(free, fuzzy=fuzzy, use_index=use_index) if free else [])
+    pinned: Dict[str, Optional[NormalisedChapter]] = {}
+    groups: Dict[str, Dict[int, List[str]]] = {}
+    unresolved: List[str] = []
+    notes: List[str] = []
+    for chapter_id, excerpt in entries:
+        if chapter_id is None:
+            matches = next(found)
+        else:
+            name = f"{chapter_id}.md"
+            if name not in pinned:
+                chap_file = FINAL_CHAPTERS_DIR / name
+                pinned[name] = NormalisedChapter(parse_p_paragraphs(extract_translation_section(load_text(chap_file)))) \
+                    if chap_file.exists() else None
+            hits = locate_excerpt_in_chapter(pinned[name], excerpt, fuzzy=fuzzy) if pinned[name] else None
+            matches = [(name, hits)] if hits else []
+        if not matches:
+            unresolved.append(excerpt)
+            continue
+        name, pnums = matches[0]
+        if len(matches) > 1:
+            others = ", ".join(f"{n} {p}" for n, p in matches[1:])
+            notes.append(f"\"{excerpt}\" also matches {others}; using {name}")
+        chapter = groups.setdefault(name, {})
+        for pnum in pnums:
+            chapter.setdefault(pnum, []).append(excerpt)
+    return groups, unresolved, notes
+
+def retranslate_chapter_batch(name: str, flagged: Dict[int, List[str]], context: int, model: str,
+                              use_cache: bool = True, dry_run: bool = False) -> Dict[str, Any]:
+    """One retranslation request for all flagged paragraphs of a chapter. Errors are returned, not raised."""
+    chapter_id = name.split('.')[0]
+    result: Dict[str, Any] = {"chapter": chapter_id, "flagged": flagged, "merged": [], "problems": [], "error": None}
+    raw_path = RAW_CHINESE_DIR / f"{chapter_id}.txt"
+    if not raw_path.exists():
+        result["error"] = f"Missing raw Chinese file: {raw_path}"
+        return result
+    translation_paras = parse_p_paragraphs(extract_translation_section(load_text(FINAL_CHAPTERS_DIR / name)))
+    raw_paragraphs = split_raw_chinese(load_text(raw_path))
+    hit_pnums = sorted(flagged)
+    system_prompt, user_prompt = build_retranslation_prompt(chapter_id, hit_pnums, translation_paras,
+                                                            raw_paragraphs, context)
+    result["old"] = dict(translation_paras)
+    if dry_run:
+        result["prompt"] = user_prompt
+        return result
+    try:
+        with telemetry.context(chapter=chapter_id.removeprefix("ch")):
+            out, usage = call_openai(system_prompt, user_prompt, model=model, use_cache=use_cache)
+    except Exception as e:
+        result["error"] = f"OpenAI error: {e}"
+        return result
+    result["usage"] = usage
+    merged, problems = merge_retranslation(out, hit_pnums, raw_paragraphs)
+    if merged is None:
+        result["error"] = "No RETRANSLATION block in the model output."
+        result["output"] = out
+        return result
+    result["merged"], result["problems"] = merged, problems
+    return result
+
+def write_batch_report(path: Path, results: List[Dict[str, Any]], unresolved: List[str], notes: List[str], model: str):
+    lines = [f"# Batch retranslation {time.strftime('%Y-%m-%d %H:%M')}", "", f"Model: {model}", ""]
+    for r in results:
+        lines += [f"## {r['chapter']}", ""]
+        if r["error"]:
+            lines += [f"⚠️ {r['error']}", ""]
+        for problem in r["problems"]:
+            lines += [f"⚠️ {problem}", ""]
+        for pnum, zh, new_en in r["merged"]:
+            for excerpt in r["flagged"].get(pnum, []):
+                lines.append(f"> {excerpt}")
+            lines += [f"@P{pnum} ZH: {zh}", f"@P{pnum} EN (old): {r['old'].get(pnum, '')}",
+                      f"@P{pnum} EN: {new_en}", ""]
+    if notes:
+        lines += ["## Ambiguous excerpts", ""] + [f"- {note}" for note in notes] + [""]
+    if unresolved:
+        lines += ["## Not found", ""] + [f"- {excerpt}" for excerpt in unresolved] + [""]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+def run_batch(args, model_name: str):
+    t0 = time.perf_counter()
+    entries = read_batch_file(Path(args.batch))
+    groups, unresolved, notes = plan_batch(entries, fuzzy=args.fuzzy, use_index=not args.no_index)
+    flagged_count = sum(len(flagged) for flagged in groups.values())
+    print(f"🔎 {len(entries)} excerpt(s) -> {flagged_count} paragraph(s) in {len(groups)} chapter(s); "
+          f"{len(unresolved)} not found (model: {model_name})")
+    for note in notes:
+        print(f"ℹ️ {note}")
+
+    def job(name):
+        return retranslate_chapter_batch(name, groups[name], args.context, model_name,
+                                         use_cache=not args.no_cache, dry_run=args.dry_run)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = list(pool.map(job, sorted(groups)))
+    if args.dry_run:
+        for r in results:
+            print(f"\n==== {r['chapter']} USER PROMPT ====")
+            print(r.get("prompt") or r["error"])
+        return
+
+    report = Path(args.report) if args.report else BATCH_REPORT_DIR / f"batch-{time.strftime('%Y%m%d-%H%M%S')}.md"
+    write_batch_report(report, results, unresolved, notes, model_name)
+    failed = [r for r in results if r["error"]]
+    done = sum(len(r["merged"]) for r in results)
+    prompt_tokens = sum((r.get("usage") or {}).get("prompt_tokens") or 0 for r in results)
+    completion_tokens = sum((r.get("usage") or {}).get("completion_tokens") or 0 for r in results)
+    print(f"🏁 {done} paragraph(s) retranslated in {len(results) - len(failed)}/{len(results)} request(s), "
+          f"{time.perf_counter() - t0:.1f}s; tokens prompt {prompt_tokens:,} / completion {completion_tokens:,}.")
+    for r in failed:
+        print(f"❌ {r['chapter']}: {r['error']}")
+    print(f"📝 Report written to {report}")
+
 def main():
     parser = argparse.ArgumentParser(description="Retranslate excerpt. Usage: python retranslate_excerpt.py your phrase here")
     parser.add_argument('excerpt', nargs='*', help='Excerpt phrase (no quotes needed).')
@@ -165,11 +421,20 @@ def main():
     parser.add_argument('--chapter', help='Force chapter id like ch0600')
     parser.add_argument('--dry-run', action='store_true')
     parser.add_argument('--fuzzy', action='store_true', help='Enable token-overlap fallback if exact phrase not found.')
+    parser.add_argument('--no-index', action='store_true', help='Scan every chapter file instead of using the excerpt index.')
+    parser.add_argument('--no-cache', action='store_true', help='Always call the API instead of reusing a cached response (or set LLM_CACHE=0).')
+    parser.add_argument('--batch', help='File of excerpts, one per line ("ch0600: phrase" pins a chapter); one request per chapter, no prompts.')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent chapter requests in --batch mode.')
+    parser.add_argument('--report', help='--batch report path (default retranslations/batch-<time>.md).')
     args = parser.parse_args()
 
     # Decide model (flag overrides explicit --model)
     model_name = 'gpt-5-2025-08-07' if args.gpt5 else args.model
 
+    if args.batch:
+        run_batch(args, model_name)
+        return
+
     excerpt = ' '.join(args.excerpt).strip()
     if not excerpt:
         print("No excerpt provided.")
@@ -188,7 +453,7 @@ def main():
             return
         matches = [(chap_file.name, hit_pnums)]
     else:
-        matches = find_best_chapter(excerpt, fuzzy=args.fuzzy)
+        matches = find_best_chapter(excerpt, fuzzy=args.fuzzy, use_index=not args.no_index)
 
     if not matches:
         print("No chapter match found.")
@@ -234,30 +499,23 @@ def main():
     print(user_prompt)
     print(f"\n==== CALLING MODEL (model: {model_name}) ====")
     try:
-        out, usage = call_openai(system_prompt, user_prompt, model=model_name)
+        with telemetry.context(chapter=chapter_id.removeprefix("ch")):
+            out, usage = call_openai(system_prompt, user_prompt, model=model_name, use_cache=not args.no_cache)
     except Exception as e:
         print(f"OpenAI error: {e}")
         return
     print("\n==== MODEL OUTPUT ====")
     print(out)
     print("\n==== TOKEN USAGE ====")
-    print(f"prompt: {usage.get('prompt_tokens')} | completion: {usage.get('completion_tokens')} | total: {usage.get('total_tokens')}")
+    print(f"prompt: {usage.get('prompt_tokens')} (cached {usage.get('cached_tokens', 0)}) | completion: {usage.get('completion_tokens')} | total: {usage.get('total_tokens')}")
 
-    m = RETRANS_BLOCK_RE.search(out)
-    if not m:
+    merged, problems = merge_retranslation(out, hit_pnums, raw_paragraphs)
+    if merged is None:
         print("⚠️ Could not find retranslation block for merging Chinese text.")
         return
-    block = m.group(1).strip()
-    new_lines = []
-    for line in block.splitlines():
-        line = line.strip()
-        pm = re.match(r'^@P(\d+):\s*(.*)$', line)
-        if not pm:
-            continue
-        pnum = int(pm.group(1))
-        new_en = pm.group(2)
-        zh = raw_paragraphs[pnum-1] if 0 <= pnum-1 < len(raw_paragraphs) else ''
-        new_lines.append(f"@P{pnum} ZH: {zh}\n@P{pnum} EN: {new_en}")
+    for problem in problems:
+        print(f"⚠️ Retranslation block: {problem}")
+    new_lines = [f"@P{pnum} ZH: {zh}\n@P{pnum} EN: {new_en}" for pnum, zh, new_en in merged]
     if new_lines:
         print("\n==== MERGED CHINESE + NEW ENGLISH ====")
         print("\n\n".join(new_lines))
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+TELEMETRY_PATH = os.getenv("TELEMETRY_PATH", ".telemetry/calls.jsonl")
+
+# USD per 1M tokens: (input, cached input, output). Matched on the longest model-name prefix.
+PRICES = {
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "o4-mini": (1.10, 0.275, 4.40),
+}
+
+
+def telemetry_enabled() -> bool:
+    """Opt out with TELEMETRY=0 (or off/false/no)."""
+    return os.getenv("TELEMETRY", "1").strip().lower() not in ("0", "off", "false", "no")
+
+
+def estimate_cost(model: str, usage: Dict[str, Any]) -> Optional[float]:
+    """Estimated USD cost of one call, or None for a model missing from PRICES."""
+    for prefix in sorted(PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            input_price, cached_price, output_price = PRICES[prefix]
+            break
+    else:
+        return None
+    prompt = usage.get("prompt_tokens") or 0
+    cached = usage.get("cached_tokens") or 0
+    completion = usage.get("completion_tokens") or 0
+    return ((prompt - cached) * input_price + cached * cached_price + completion * output_price) / 1e6
+
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def current_context() -> Dict[str, Any]:
+    return dict(getattr(_local, "context", {}))
+
+
+@contextmanager
+def context(**fields):
+    """Label every call made by this thread inside the block (chapter, stage, chunk, ...).
+
+    Worker threads do not inherit it: pass current_context() along and re-enter it there.
+    """
+    previous = getattr(_local, "context", {})
+    _local.context = {**previous, **fields}
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+class CallRecord:
+    """Timings and outcome of one model call; the HTTP hooks fill in send and first-byte times."""
+
+    def __init__(self, model: str, fields: Dict[str, Any]):
+        self.model = model
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.first_sent: Optional[float] = None
+        self.last_sent: Optional[float] = None
+        self.first_byte: Optional[float] = None
+        self.attempts = 0
+        self.usage: Dict[str, Any] = {}
+        self.outcome = "ok"
+        self.error: Optional[str] = None
+
+    def set_result(self, content: Optional[str], usage: Dict[str, Any], from_cache: bool = False):
+        self.usage = usage or {}
+        if from_cache:
+            self.outcome = "cache_hit"
+        elif not content:
+            self.outcome = "empty"
+
+    @property
+    def total_s(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def ttfb_s(self) -> Optional[float]:
+        if self.first_byte is None or self.last_sent is None:
+            return None
+        return self.first_byte - self.last_sent
+
+    def to_json(self) -> Dict[str, Any]:
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        api_call = self.outcome != "cache_hit"
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "model": self.model,
+            **self.fields,
+            "queue_ms": ms(self.first_sent - self.started) if self.first_sent is not None else None,
+            "ttfb_ms": ms(self.ttfb_s),
+            "total_ms": ms(self.total_s),
+            "attempts": self.attempts,
+            "prompt_tokens": self.usage.get("prompt_tokens"),
+            "cached_tokens": self.usage.get("cached_tokens"),
+            "completion_tokens": self.usage.get("completion_tokens"),
+            "cost_usd": estimate_cost(self.model, self.usage) if api_call else 0.0,
+            "outcome": self.outcome,
+        }
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+def _on_request(request):
+    call = getattr(_local, "call", None)
+    if call is not None:
+        now = time.perf_counter()
+        call.attempts += 1
+        call.first_sent = call.first_sent or now
+        call.last_sent = now
+        call.first_byte = None
+
+
+def _on_response(response):
+    call = getattr(_local, "call", None)
+    if call is not None and call.first_byte is None:
+        call.first_byte = time.perf_counter()
+
+
+def http_client():
+    """httpx client for OpenAI(http_client=...) that timestamps each request and its response headers."""
+    from openai import DefaultHttpxClient
+    return DefaultHttpxClient(event_hooks={"request": [_on_request], "response": [_on_response]})
+
+
+def write_record(record: Dict[str, Any], path: Optional[str] = None):
+    path = path or TELEMETRY_PATH
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _write_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+@contextmanager
+def track_call(model: str, **defaults):
+    """Time one model call made in this thread and append its record to TELEMETRY_PATH.
+
+    `defaults` (e.g. stage="translate") are overridden by the thread's context(). Call
+    `set_result` on the yielded record; an exception is logged with outcome "error" and re-raised.
+    """
+    call = CallRecord(model, {**defaults, **current_context()})
+    _local.call = call
+    try:
+        yield call
+    except Exception as e:
+        call.outcome = "error"
+        call.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        _local.call = None
+        if telemetry_enabled():
+            write_record(call.to_json())
+
+
+def load_records(path: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+            if since and record.get("ts", "") < since:
+                continue
+            records.append(record)
+    return records
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarise(records: List[Dict[str, Any]], key: str) -> Dict[str, Dict[str, Any]]:
+    """Aggregate records grouped by `key`; latency and throughput use successful API calls only."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(str(record.get(key) or "-"), []).append(record)
+    summary = {}
+    for name, group in sorted(groups.items()):
+        api = [r for r in group if r.get("outcome") != "cache_hit"]
+        ok = [r for r in api if r.get("outcome") == "ok"]
+        totals = [r["total_ms"] / 1000 for r in ok if r.get("total_ms") is not None]
+        ttfbs = [r["ttfb_ms"] / 1000 for r in ok if r.get("ttfb_ms") is not None]
+        completion = sum(r.get("completion_tokens") or 0 for r in ok)
+        summary[name] = {
+            "calls": len(api),
+            "cache_hits": len(group) - len(api),
+            "failed": len(api) - len(ok),
+            "p50_s": percentile(totals, 50),
+            "p95_s": percentile(totals, 95),
+            "ttfb_p50_s": percentile(ttfbs, 50),
+            "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in api),
+            "completion_tokens": sum(r.get("completion_tokens") or 0 for r in api),
+            "tokens_per_s": completion / sum(totals) if totals and sum(totals) else None,
+            "cost_usd": sum(r.get("cost_usd") or 0.0 for r in api),
+        }
+    return summary
+
+
+def print_summary(title: str, summary: Dict[str, Dict[str, Any]]):
+    def sec(value):
+        return f"{value:>7.1f}" if value is not None else f"{'-':>7}"
+
+    print(f"\n{title:<24} | {'calls':>5} | {'cached':>6} | {'failed':>6} | {'p50 s':>7} | {'p95 s':>7} | "
+          f"{'ttfb50':>7} | {'prompt tok':>10} | {'compl tok':>9} | {'out tok/s':>9} | {'cost $':>8}")
+    for name, s in summary.items():
+        rate = f"{s['tokens_per_s']:>9.1f}" if s["tokens_per_s"] is not None else f"{'-':>9}"
+        print(f"{name[:24]:<24} | {s['calls']:>5} | {s['cache_hits']:>6} | {s['failed']:>6} | {sec(s['p50_s'])} | "
+              f"{sec(s['p95_s'])} | {sec(s['ttfb_p50_s'])} | {s['prompt_tokens']:>10,} | "
+              f"{s['completion_tokens']:>9,} | {rate} | {s['cost_usd']:>8.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on the per-call model telemetry log.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--path", default=TELEMETRY_PATH)
+    parser.add_argument("--since", help="Only calls at or after this ISO date/time (UTC), e.g. 2025-09-01.")
+    parser.add_argument("--by", nargs="+", default=["model", "stage"], help="Record fields to group by.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"No telemetry log at {args.path}")
+        return
+    records = load_records(args.path, args.since)
+    if not records:
+        print("No calls recorded.")
+        return
+    api = [r for r in records if r.get("outcome") != "cache_hit"]
+    cost = sum(r.get("cost_usd") or 0.0 for r in api)
+    print(f"🧾 {args.path}: {len(records)} calls from {records[0].get('ts')} to {records[-1].get('ts')}, "
+          f"{len(records) - len(api)} served from the local cache, estimated cost ${cost:.4f}")
+    for key in args.by:
+        print_summary(f"by {key}", summarise(records, key))
+
+
+if __name__ == "__main__":
+    main()
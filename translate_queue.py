@@ -1,7 +1,133 @@
-import subprocess
+import argparse
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-for i in range(2):
-    print(f"Run {i+1}...")
-    subprocess.run(["python", "translatorV3.py"], check=True)
-    time.sleep(3)  # wait 3 seconds before next run
+import translatorV3 as tr
+from glossary_matcher import ANNOTATION_MODES
+from prompt_templates import PROMPT_LAYOUTS
+import profiling
+import telemetry
+
+
+def parse_chapter_range(start, end):
+    start_num = int(start) if start else int(tr.get_next_chapter_number())
+    end_num = int(end) if end else start_num + 1
+    return [f"{n:04}" for n in range(start_num, end_num + 1)]
+
+
+def run_batch(chapters, *, workers=4, verbose=False, mirror_to_obsidian=True, chunk_chars=None, chunk_overlap=None,
+              annotation_mode=None, annotation_every=None):
+    """Translate `chapters` in a thread pool sharing one client, one rules text and one glossary dict.
+
+    New terms go to the glossary store's log as chapters finish; the log is folded into glossary.json
+    once at the end, so several queues may run at the same time.
+
+    Returns a list of per-chapter results: {"chapter", "ok", "seconds", "error" | summary fields}.
+    """
+    rules = tr.load_file(tr.RULES_PATH)
+    glossary = tr.GLOSSARY_STORE.load()
+
+    def job(chapter_num):
+        t0 = time.perf_counter()
+        try:
+            summary = tr.translate_chapter(chapter_num, rules=rules, glossary=glossary, verbose=verbose,
+                                           mirror_to_obsidian=mirror_to_obsidian, update_index=False,
+                                           chunk_chars=chunk_chars, chunk_overlap=chunk_overlap,
+                                           annotation_mode=annotation_mode, annotation_every=annotation_every)
+            return {"ok": True, "seconds": time.perf_counter() - t0, **summary}
+        except Exception as e:
+            return {"chapter": chapter_num, "ok": False, "seconds": time.perf_counter() - t0,
+                    "error": f"{type(e).__name__}: {e}"}
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(job, ch) for ch in chapters]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result["ok"]:
+                print(f"✅ ch{result['chapter']} done in {result['seconds']:.1f}s")
+            else:
+                print(f"❌ ch{result['chapter']} failed after {result['seconds']:.1f}s: {result['error']}")
+
+    folded = tr.GLOSSARY_STORE.compact()
+    if folded:
+        print(f"🗜️ Folded {folded} new glossary term{'s' if folded != 1 else ''} into {tr.GLOSSARY_PATH}.")
+    if mirror_to_obsidian and any(r["ok"] for r in results):
+        tr.update_chapters_index(tr.OBSIDIAN_CHAPTERS_DIR, os.path.join(tr.OBSIDIAN_CHAPTERS_DIR, "chapters.json"))
+    return sorted(results, key=lambda r: r["chapter"])
+
+
+def print_report(results, elapsed):
+    ok = [r for r in results if r["ok"]]
+    failed = [r for r in results if not r["ok"]]
+    print("\n=== Batch report ===")
+    for r in results:
+        status = "ok" if r["ok"] else f"FAILED — {r['error']}"
+        extra = f", +{len(r['added_terms'])} terms" if r["ok"] and r.get("added_terms") else ""
+        print(f"  ch{r['chapter']}: {status} ({r['seconds']:.1f}s{extra})")
+    rate = len(ok) / elapsed * 60 if elapsed else 0.0
+    print(f"🏁 {len(ok)}/{len(results)} chapters translated in {elapsed:.1f}s ({rate:.1f} chapters/min).")
+    if failed:
+        print(f"❌ Failed: {', '.join('ch' + r['chapter'] for r in failed)}")
+    usage = dict(tr.USAGE_TOTALS)
+    if usage["calls"] or usage["cache_hits"]:
+        share = usage["cached_tokens"] / usage["prompt_tokens"] * 100 if usage["prompt_tokens"] else 0.0
+        print(f"🧮 {usage['calls']} API call(s), {usage['cache_hits']} served from the local response cache. "
+              f"Prompt tokens {usage['prompt_tokens']:,} ({usage['cached_tokens']:,} provider-cached, {share:.1f}%), "
+              f"completion tokens {usage['completion_tokens']:,}.")
+    remembered = [r for r in ok if r.get("memory_paragraphs")]
+    if remembered:
+        hits = sum(r["memory_hits"] for r in remembered)
+        total = sum(r["memory_paragraphs"] for r in remembered)
+        skipped = sum(1 for r in remembered if r["memory_full_skip"])
+        print(f"🧠 Translation memory: {hits}/{total} paragraphs reused ({hits / total * 100:.1f}%), "
+              f"~{sum(r['memory_prompt_tokens_avoided'] for r in remembered):,} prompt and "
+              f"~{sum(r['memory_completion_tokens_avoided'] for r in remembered):,} completion tokens avoided, "
+              f"{skipped} chapter(s) needed no request.")
+    if telemetry.telemetry_enabled():
+        print(f"🧾 Per-call telemetry appended to {telemetry.TELEMETRY_PATH} (python telemetry.py report).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate a range of chapters in-process with a worker pool.")
+    parser.add_argument("--start", help="First chapter number (default: next untranslated chapter).")
+    parser.add_argument("--end", help="Last chapter number, inclusive (default: start + 1).")
+    parser.add_argument("--workers", type=int, default=4, help="Chapters translated concurrently.")
+    parser.add_argument("--verbose", action="store_true", help="Print full prompts and raw model output.")
+    parser.add_argument("--no-obsidian", action="store_true", help="Skip the Obsidian mirror and index update.")
+    parser.add_argument("--chunk-chars", type=int, help=f"Split chapters longer than this into concurrent chunks (default {tr.CHUNK_CHARS}, 0 = off).")
+    parser.add_argument("--chunk-overlap", type=int, help=f"Context paragraphs around each chunk (default {tr.CHUNK_OVERLAP}).")
+    parser.add_argument("--annotation", choices=ANNOTATION_MODES, help=f"Glossary annotation density (default {tr.ANNOTATION_MODE}).")
+    parser.add_argument("--annotation-every", type=int, help=f"Paragraphs per window for --annotation paragraphs (default {tr.ANNOTATION_EVERY}).")
+    parser.add_argument("--prompt-layout", choices=PROMPT_LAYOUTS, help=f"Prompt order (default {tr.PROMPT_LAYOUT}).")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API instead of reusing cached responses.")
+    parser.add_argument("--no-memory", action="store_true", help="Translate every paragraph instead of reusing the translation memory.")
+    parser.add_argument("--profile", action="store_true", help="Print a per-phase timing breakdown (or set PROFILE=1).")
+    parser.add_argument("--profile-dir", help="Also cProfile the CPU-bound phases and write .pstats files here.")
+    args = parser.parse_args()
+    if args.profile or args.profile_dir:
+        profiling.enable(args.profile_dir)
+    else:
+        profiling.enable_from_env()
+    if args.no_cache:
+        os.environ["LLM_CACHE"] = "0"
+    if args.no_memory:
+        os.environ["TM"] = "0"
+    if args.prompt_layout:
+        tr.PROMPT_LAYOUT = args.prompt_layout
+
+    chapters = parse_chapter_range(args.start, args.end)
+    print(f"📚 Translating {len(chapters)} chapter(s): ch{chapters[0]}..ch{chapters[-1]} with {args.workers} worker(s)")
+    t0 = time.perf_counter()
+    results = run_batch(chapters, workers=args.workers, verbose=args.verbose,
+                        mirror_to_obsidian=not args.no_obsidian, chunk_chars=args.chunk_chars,
+                        chunk_overlap=args.chunk_overlap, annotation_mode=args.annotation,
+                        annotation_every=args.annotation_every)
+    print_report(results, time.perf_counter() - t0)
+    profiling.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MEMORY_PATH = os.getenv("TM_PATH", ".translation_memory/memory.sqlite3")
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def memory_enabled() -> bool:
+    """Opt out with TM=0 (or off/false/no)."""
+    return os.getenv("TM", "1").strip().lower() not in ("0", "off", "false", "no")
+
+
+def normalise_paragraph(text: str) -> str:
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+def memory_key(model: str, source: str, annotation: str = "") -> str:
+    """Key of one source paragraph: the model, the normalised paragraph as sent (its inline Hanzi[English]
+    annotations included) and any annotation state not visible in it, e.g. the term table of "table" mode."""
+    payload = json.dumps([model, normalise_paragraph(source), annotation], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """Accepted English per source paragraph, so paragraphs seen before are filled in without a request.
+
+    Only exact matches of the key are reused. Hit/miss counters are kept per process and on disk.
+    """
+
+    def __init__(self, path: str = MEMORY_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS paragraphs ("
+                " key TEXT PRIMARY KEY, model TEXT, source TEXT, english TEXT, chapter TEXT,"
+                " created REAL, last_used REAL, uses INTEGER DEFAULT 0)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def _bump(self, name: str, amount: int):
+        if amount:
+            self._db.execute(
+                "INSERT INTO stats(name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+                (name, amount, amount),
+            )
+
+    def lookup(self, keys: List[str]) -> Dict[str, str]:
+        """key -> English for the keys that are in memory (one query for the whole chapter)."""
+        found: Dict[str, str] = {}
+        with self._lock, self._db:
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+                batch = unique[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, english FROM paragraphs WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update(rows)
+            hit_count = sum(1 for k in keys if k in found)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+            self._bump("hits", hit_count)
+            self._bump("misses", len(keys) - hit_count)
+            if found:
+                self._db.executemany("UPDATE paragraphs SET last_used = ?, uses = uses + 1 WHERE key = ?",
+                                     [(time.time(), k) for k in found])
+        return found
+
+    def store(self, entries: Iterable[Tuple[str, str, str]], model: str, chapter: str = ""):
+        """Remember (key, source, English) triples; a newer translation of the same key replaces the old one."""
+        now = time.time()
+        rows = [(key, model, source, english, chapter, now, now) for key, source, english in entries if english.strip()]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO paragraphs(key, model, source, english, chapter, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            entries = self._db.execute("SELECT COUNT(*) FROM paragraphs").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+        }
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM paragraphs")
+            self._db.execute("DELETE FROM stats")
+        self.hits = self.misses = 0
+
+    def close(self):
+        self._db.close()
+
+
+_default_memory: Optional[TranslationMemory] = None
+_default_lock = threading.Lock()
+
+
+def get_default_memory() -> Optional[TranslationMemory]:
+    """Process-wide memory at MEMORY_PATH, or None when disabled via TM=0."""
+    global _default_memory
+    if not memory_enabled():
+        return None
+    with _default_lock:
+        if _default_memory is None:
+            _default_memory = TranslationMemory()
+        return _default_memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the paragraph translation memory.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--path", default=MEMORY_PATH)
+    args = parser.parse_args()
+    memory = TranslationMemory(args.path)
+    if args.command == "clear":
+        memory.clear()
+        print(f"🧹 Cleared {args.path}")
+        return
+    s = memory.stats()
+    lookups = s["hits"] + s["misses"]
+    rate = s["hits"] / lookups * 100 if lookups else 0.0
+    print(f"🧠 {args.path}: {s['entries']} paragraphs")
+    print(f"   hits {s['hits']} / misses {s['misses']} ({rate:.1f}% hit rate)")
+
+
+if __name__ == "__main__":
+    main()
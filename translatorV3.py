@@ -3,13 +3,25 @@ import re
 from pathlib import Path
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timezone
+import threading
 from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
 from cleanup_chapters import transform
+from prompt_templates import render_translation_prompt
+from chapter_chunks import Chunk, ChunkError, context_block, parse_chunk_output, split_indexed_source, stitch
+from model_output import parse_model_output
+from glossary_store import GlossaryStore
+from glossary_matcher import annotate_with_glossary, find_terms, glossary_table, load_matcher, missing_translations
+from llm_cache import cached_completion
+from translation_memory import get_default_memory, memory_key
+from annotation_report import make_token_counter
+import chapters_index
+import profiling
+import telemetry
 
 # === Setup ===
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=telemetry.http_client())
 
 # === Configuration ===
 RULES_PATH = "rules.md"
@@ -18,6 +30,8 @@ CHAPTER_DIR = "piaotian_chapters"
 OUTPUT_DIR = "final_chapters"
 INDEXED_DIR = "indexed_chapters"
 PROMPT_DIR = "prompt_to_gpt"
+OBSIDIAN_REVIEW_DIR = "/Users/meecosha/MEGA/Vault/Martial Peak/1 to review"
+OBSIDIAN_CHAPTERS_DIR = "/Users/meecosha/MEGA/Vault/Martial Peak/chapters"
 # MODEL = "gpt-5-2025-08-07"
 MODEL = "gpt-5-mini-2025-08-07"
 # MODEL = "gpt-4o-mini-2024-07-18"
@@ -25,8 +39,41 @@ MODEL = "gpt-5-mini-2025-08-07"
 # MODEL = "gpt-4o-2024-08-06"
 # MODEL = "o4-mini-2025-04-16"
 
+# Chunked translation of long chapters: 0 sends the whole chapter in one request.
+CHUNK_CHARS = 0           # max characters of indexed source per chunk
+CHUNK_OVERLAP = 1         # context paragraphs shown (not translated) on each side of a chunk
+CHUNK_WORKERS = 4         # chunks of one chapter requested concurrently
+CHUNK_RETRIES = 2         # extra attempts for a chunk whose output is unusable
+
+# Glossary annotation density: "all" (every occurrence), "first" (first per chapter),
+# "paragraphs" (first per ANNOTATION_EVERY paragraphs) or "table" (term list, no inline brackets).
+ANNOTATION_MODE = "all"
+ANNOTATION_EVERY = 10
+
+# Paragraphs whose English is already known (translation memory hits, or paragraphs a re-scrape left
+# unchanged, see retranslate_changes) are filled in locally and left out of the request; this note tells
+# the model why the @P numbers have gaps. Up to PARTIAL_CONTEXT_PARAGRAPHS known neighbours of each
+# sent paragraph are shown in English for continuity.
+PARTIAL_CONTEXT_PARAGRAPHS = 1
+PARTIAL_CONTEXT = ("Some paragraphs of this chapter are already translated and are left out, so the @P numbers "
+                  "below have gaps. Translate exactly the @P paragraphs listed, keeping their numbers.")
+
+# "prefix": rules + task contract as a stable prefix, chapter text last (prompt-cache friendly).
+# "legacy": the original order, source chapter between the rules and the tasks.
+PROMPT_LAYOUT = "prefix"
+
 Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
 Path(INDEXED_DIR).mkdir(parents=True, exist_ok=True)
+Path(PROMPT_DIR).mkdir(parents=True, exist_ok=True)
+
+# Guards the shared glossary dict when chapters are translated concurrently in this process.
+GLOSSARY_LOCK = threading.Lock()
+# glossary.json snapshot + append log; new terms are logged, other processes' terms are picked up.
+GLOSSARY_STORE = GlossaryStore(GLOSSARY_PATH)
+
+# Token usage of every call in this process (batch reports read it).
+USAGE_LOCK = threading.Lock()
+USAGE_TOTALS = {"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
 
 def get_next_chapter_number():
     existing = list(Path(OUTPUT_DIR).glob("ch*.md"))
@@ -39,22 +86,49 @@ def load_file(path):
 def save_file(path, content):
     Path(path).write_text(content.strip(), encoding="utf-8")
 
-def call_gpt(system_prompt, user_prompt):
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        # temperature=0.3
-    )
-
-    print("📊 Token Usage:")
-    print(f"- Prompt tokens: {response.usage.prompt_tokens}")
-    print(f"- Completion tokens: {response.usage.completion_tokens}")
-    print(f"- Total tokens: {response.usage.total_tokens}")
-
-    return response.choices[0].message.content
+def record_usage(usage, from_local_cache=False):
+    with USAGE_LOCK:
+        if from_local_cache:
+            USAGE_TOTALS["cache_hits"] += 1
+            return
+        USAGE_TOTALS["calls"] += 1
+        for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+            USAGE_TOTALS[key] += usage.get(key) or 0
+
+def call_gpt(system_prompt, user_prompt, use_cache=True, validate=None):
+    def request():
+        response = client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            # temperature=0.3
+        )
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens,
+        }
+        return response.choices[0].message.content, usage
+
+    with profiling.phase("api call"), telemetry.track_call(MODEL, stage="translate") as call:
+        content, usage, cached = cached_completion(MODEL, system_prompt, user_prompt, request, use_cache=use_cache,
+                                                   validate=validate)
+        call.set_result(content, usage, cached)
+    record_usage(usage, cached)
+
+    print("📊 Token Usage:" + (" (cached response, no API call)" if cached else ""))
+    print(f"- Prompt tokens: {usage.get('prompt_tokens')} (provider-cached: {usage.get('cached_tokens', 0)})")
+    print(f"- Completion tokens: {usage.get('completion_tokens')}")
+    print(f"- Total tokens: {usage.get('total_tokens')}")
+    if not cached:
+        ttfb = f", first byte {call.ttfb_s:.1f}s" if call.ttfb_s is not None else ""
+        print(f"- Latency: {call.total_s:.1f}s{ttfb}")
+
+    return content
 
 def merge_glossary(existing: dict, candidates: dict, *, overwrite: bool = False):
     """
@@ -84,43 +158,12 @@ def merge_glossary(existing: dict, candidates: dict, *, overwrite: bool = False)
     return existing, len(added_keys), len(updated_keys), added_keys, updated_keys, skipped_keys
 
 
-def annotate_with_glossary(text, glossary):
-    for hanzi, translation in sorted(glossary.items(), key=lambda x: len(x[0]), reverse=True):
-        # match hanzi not followed by another Chinese char, unless already annotated
-        pattern = re.escape(hanzi) + r"(?!\s*\[)"
-        text = re.sub(pattern, f"{hanzi}[{translation}]", text)
-    return text
-
-def update_chapters_index(chapters_dir, output_file=None):
-    """Regenerate chapters.json from all .md files in chapters_dir adding 'updated' UTC ISO timestamp."""
-    import json, os
-
+def update_chapters_index(chapters_dir, output_file=None, changed=None):
+    """Update chapters.json for chapters_dir, re-reading only new or changed .md files (see chapters_index)."""
     if output_file is None:
         output_file = os.path.join(chapters_dir, "chapters.json")
-
-    chapters = []
-    for fname in sorted(os.listdir(chapters_dir)):
-        if fname.endswith(".md"):
-            path = os.path.join(chapters_dir, fname)
-            # extract first non-empty line for title
-            title = fname
-            with open(path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        title = line.lstrip("#").strip()
-                        break
-            mtime = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).isoformat()
-            chapters.append({
-                "id": fname[:-3],
-                "title": title,
-                "updated": mtime
-            })
-
-    with open(output_file, "w", encoding="utf-8") as out:
-        json.dump(chapters, out, ensure_ascii=False, indent=2)
-
-    print(f"📖 Updated {output_file} with {len(chapters)} chapters (with timestamps).")
+    stats = chapters_index.update_chapters_index(chapters_dir, output_file, changed=changed)
+    print(f"📖 Updated {output_file} with {stats['chapters']} chapters ({stats['reread']} re-read).")
 
 def split_into_paragraphs(text: str):
     """Split raw chapter text into paragraphs for alignment.
@@ -139,202 +182,415 @@ def split_into_paragraphs(text: str):
     return paras
 
 # =============================================================
-# Main (refactored prompt)
+# Translation of one chapter (shared by main and translate_queue)
 # =============================================================
 
-def main():
-    # chapter_num = get_next_chapter_number()
-    chapter_num = "0694"
-    print(chapter_num)
-    chapter_file = f"ch{chapter_num}.txt"
-    input_path = Path(CHAPTER_DIR) / chapter_file
-    output_path = Path(OUTPUT_DIR) / f"ch{chapter_num}.md"
-    prompt_path = Path(PROMPT_DIR) / f"prompt_ch{chapter_num}.txt"
-    indexed_path = Path(INDEXED_DIR) / f"ch{chapter_num}_indexed.md"
-    obsidian_output_path = f"/Users/meecosha/MEGA/Vault/Martial Peak/1 to review/ch{chapter_num}.md"
+class TranslationError(RuntimeError):
+    pass
 
-    rules = load_file(RULES_PATH)
-    glossary = json.loads(load_file(GLOSSARY_PATH))
-    chapter_text = load_file(input_path)
 
+def build_indexed_source(chapter_text, glossary, hits=None, mode="all", every=ANNOTATION_EVERY):
     # Annotated Chinese first, then split into paragraphs for alignment.
-    annotated_text = annotate_with_glossary(chapter_text, glossary)
-    paragraphs = split_into_paragraphs(annotated_text)
+    with profiling.phase("annotate", cpu=True):
+        annotated_text = annotate_with_glossary(chapter_text, glossary, hits=hits, mode=mode, every=every)
+    with profiling.phase("split paragraphs", cpu=True):
+        paragraphs = split_into_paragraphs(annotated_text)
 
-    # Build indexed source string
-    indexed_source_lines = []
-    for idx, para in enumerate(paragraphs, start=1):
-        # Collapse internal excessive whitespace; keep single spaces
-        cleaned = re.sub(r"\s+", " ", para).strip()
-        indexed_source_lines.append(f"@P{idx}: {cleaned}")
-    indexed_source = "\n".join(indexed_source_lines)
-    save_file(indexed_path, indexed_source)
+        # Build indexed source string
+        indexed_source_lines = []
+        for idx, para in enumerate(paragraphs, start=1):
+            # Collapse internal excessive whitespace; keep single spaces
+            cleaned = re.sub(r"\s+", " ", para).strip()
+            indexed_source_lines.append(f"@P{idx}: {cleaned}")
+    return "\n".join(indexed_source_lines)
 
 
+INDEXED_LINE_RE = re.compile(r"@P(\d+): ?(.*)")
 
-    system_prompt = (
-        "Professional Chinese→English xianxia translator. Priorities: fidelity, natural English, glossary adherence via inline annotations, zero omissions/additions. Do NOT invent details. Follow output contract exactly."
-    )
 
+def request_annotator(chapter_text, glossary, matcher, mode, every, paragraph_count):
+    """Function re-annotating the @P lines of one request on their own, or None if not needed.
+
+    "first"/"paragraphs" annotate a term once per chapter or window. When only part of the chapter is
+    sent (chunks, memory hits, known paragraphs) the annotated occurrence may be outside the request,
+    so the thinning is redone over the paragraphs actually sent.
+    """
+    if mode not in ("first", "paragraphs"):
+        return None
+    raw = [re.sub(r"\s+", " ", p).strip() for p in split_into_paragraphs(chapter_text)]
+    if len(raw) != paragraph_count:
+        print(f"⚠️ Raw and annotated paragraph counts differ ({len(raw)} vs {paragraph_count}); "
+              "requests keep the chapter-wide annotations.")
+        return None
+
+    def annotate(lines):
+        numbers = [int(INDEXED_LINE_RE.match(line).group(1)) for line in lines]
+        text = annotate_with_glossary("\n\n".join(raw[n - 1] for n in numbers), glossary, matcher=matcher,
+                                      mode=mode, every=every)
+        return [f"@P{n}: {p}" for n, p in zip(numbers, text.split("\n\n"))]
+    return annotate
+
+
+def source_snapshot_path(chapter_num):
+    """Raw text the chapter was last translated from; retranslate_changes diffs a re-scrape against it."""
+    return Path(INDEXED_DIR) / f"ch{chapter_num}_source.txt"
+
+
+def memory_lookup(memory, indexed_source, hits, annotation_mode, known=None):
+    """Look up the indexed paragraphs not in `known` in the translation memory.
+
+    Returns (reused {@P: English}, source lines still to translate, {@P: (key, source)} for storing).
+    In "table" mode the terms of the table found in a paragraph are part of its key, since the
+    paragraph text itself carries no annotations then.
+    """
+    known = known or {}
+    table = hits.terms() if annotation_mode == "table" else {}
+    entries = {}
+    for line in indexed_source.split("\n"):
+        m = INDEXED_LINE_RE.match(line)
+        if not m:
+            continue
+        source = m.group(2)
+        annotation = ",".join(f"{h}[{e}]" for h, e in table.items() if h in source)
+        entries[int(m.group(1))] = (memory_key(MODEL, source, annotation), line)
+    found = memory.lookup([key for pnum, (key, _) in entries.items() if pnum not in known])
+    reused = {pnum: found[key] for pnum, (key, _) in entries.items() if key in found and pnum not in known}
+    to_send = [line for pnum, (_, line) in entries.items() if pnum not in reused and pnum not in known]
+    return reused, to_send, entries
+
+
+def partial_context(to_send, prefilled, around=PARTIAL_CONTEXT_PARAGRAPHS):
+    """PARTIAL_CONTEXT plus the English of the known paragraphs next to the ones being sent."""
+    sent = [int(INDEXED_LINE_RE.match(line).group(1)) for line in to_send]
+    neighbours = sorted({p + d for p in sent for d in range(-around, around + 1) if p + d in prefilled})
+    if not neighbours:
+        return PARTIAL_CONTEXT
+    lines = "\n".join(f"@P{p}: {prefilled[p]}" for p in neighbours)
+    return (f"{PARTIAL_CONTEXT}\n\nALREADY TRANSLATED NEIGHBOURS (for continuity only; do NOT output them):\n"
+            f"{lines}")
+
+
+def fill_known_paragraphs(text, prefilled):
+    """Put the prefilled paragraphs into the model's TRANSLATION block, in @P order; the rest of the output is kept."""
+    parsed = parse_model_output(text)
+    section = parsed.section("TRANSLATION")
+    if section is None:
+        return text
+    paragraphs = {**parsed.paragraphs, **prefilled}
+    translation = "\n\n".join(f"@P{p}: {paragraphs[p]}" for p in sorted(paragraphs))
+    return (text[:section.start] + f"=== TRANSLATION START ===\n{translation}\n=== TRANSLATION END ==="
+            + text[section.end:])
+
+
+def remember_paragraphs(memory, entries, reused, known, parsed, chapter_num):
+    """Store the paragraphs not taken from the memory that passed the output checks; return the memory stats.
+
+    Paragraphs named by an output problem or by a QA report line are not stored. `known` paragraphs
+    were not looked up, so they do not count as misses.
+    """
+    flagged = {p for problem in parsed.problems for p in problem.paragraphs}
+    flagged.update(int(n) for line in parsed.qa_lines for n in re.findall(r"@P(\d+)", line))
+    new = [(key, INDEXED_LINE_RE.match(line).group(2), parsed.paragraphs[pnum])
+           for pnum, (key, line) in entries.items()
+           if pnum not in reused and pnum in parsed.paragraphs and pnum not in flagged]
+    memory.store(new, MODEL, chapter_num)
+    count_tokens, _ = make_token_counter()
+    prompt_avoided = sum(count_tokens(entries[p][1]) for p in reused)
+    completion_avoided = sum(count_tokens(f"@P{p}: {text}") for p, text in reused.items())
+    if reused:
+        print(f"🧠 ~{prompt_avoided} prompt and ~{completion_avoided} completion tokens avoided; "
+              f"{len(new)} new paragraph{'s' if len(new) != 1 else ''} remembered.")
+    return {"memory_hits": len(reused), "memory_paragraphs": len(entries) - len(known),
+            "memory_prompt_tokens_avoided": prompt_avoided, "memory_completion_tokens_avoided": completion_avoided,
+            "memory_full_skip": bool(entries) and len(reused) + len(known) == len(entries)}
+
+
+def build_prompts(rules, indexed_source, context=None, term_table=None, layout=None):
     # (Token savings) — Do NOT embed entire glossary; rely on inline Hanzi[English] annotations only.
+    # Static parts first so provider-side prompt caching can reuse them (see prompt_templates).
+    return render_translation_prompt(rules, indexed_source, context, term_table, layout or PROMPT_LAYOUT)
 
-    user_prompt = f"""
-SECTION 0: RESOURCES
-RULES:
-{rules}
-
-SOURCE CHAPTER (paragraph indexed, existing glossary terms already annotated as Hanzi[English]):
-{indexed_source}
-
-TASKS (execute strictly in order):
-
-Task 1: Translation
-Produce ONE English paragraph for every source paragraph @P{{n}}. Do not merge, split, omit, or reorder. Leave a blank line between paragraphs.
-Translate according to the RULES above. The whole chapter should be consistent in tone and style, like it's written in the RULES.
-Use the glossary terms already embedded in the source as a guide, hint, recommendation to translate the terms consistently. There should be no Hanzi or square brackets remaining in your English translated output, even if they are written twice. Whatever is in parentheses, like gender in [Zhong Miaoke (female)] or type of artifact like in [Small Water-Nang (medicine)] is a glossary HINT, not something to be copied verbatim. If the glossary is completely unsuitable, use a better English term that fits the context.
-Format exactly:
-=== TRANSLATION START ===
-@P1: ## Chapter # — Title of the Chapter
-
-@P2: <English>
-
-@P3: <English>
-...
-=== TRANSLATION END ===
-
-Task 2: Fidelity Self-Check
-If the translation is the best possible translation for the raw Chinese text, if every paragraph is faithful (no omission/addition/mistranslation/pronoun error/role error/subject-object reversal/term misuse/"lord or lady or sir" mistakes/herself or himself mistakes/"her or his" mistakes), output.
-=== QA REPORT START ===\nOK\n=== QA REPORT END ===
-Else, correct the translation and list the issues you corrected in the block like this:
-=== QA REPORT START ===
-@P7: issue_type=omission | Missing phrase "原文片段"
-@P12: issue_type=pronoun | he → she (她)
-...
-=== QA REPORT END ===
-
-Task 3: New Glossary Terms
-Identify NEW proper nouns / sects / artifacts / beasts / techniques present in raw Hanzi that are NOT already annotated (i.e., do NOT appear as Hanzi[English]) and NOT obvious generic terms. Keys must be ≥2 Hanzi (unless a consistent mononym). Provide English; append (male) or (female) ONLY for people. Format:
-=== GLOSSARY START ===
-{{"新术语": "New Term"}}
-=== GLOSSARY END ===
-If none:
-=== GLOSSARY START ===
-{{}}
-=== GLOSSARY END ===
-Constraints:
-- Do NOT repeat any Hanzi that appeared with [English] annotation.
-- No guesses, no inferred variants, no Latin keys, no duplicates.
-
-Order (strict):
-1. Translation block
-2. QA report block
-3. Glossary block
-4. Sentinel line: END-OF-OUTPUT
-
-Global Prohibitions:
-- No markdown fences ```
-- No extra sections or commentary.
-- Every @P index must appear exactly once in translation block.
-
-END.
-"""
-
-    print("\n=== FINAL PROMPT SENT TO GPT (preview) ===\n")
-    print(user_prompt)
-    print("\n=== END PROMPT PREVIEW ===\n")
 
-    print(f"🚀 Translating Chapter {chapter_num}...")
-    response = call_gpt(system_prompt, user_prompt)
+def extract_glossary_block(text, parsed=None):
+    """Locate the glossary JSON in the model output. Returns (raw_block, translation_section, reason).
 
-    text = response
+    The marker block is preferred, then the legacy fenced and trailing-JSON forms (see model_output).
+    The translation section is everything before the glossary.
+    """
+    found = (parsed or parse_model_output(text, paragraphs=False)).glossary_block()
+    if found is None:
+        raise TranslationError("Could not locate a JSON glossary block.")
+    raw_glossary_block, reason, end = found
+    return raw_glossary_block, text[:end].strip(), reason
+
+
+def usable_output(text):
+    """Whether translate_chapter can extract `text`; only such outputs are kept in the response cache."""
+    parsed = parse_model_output(text, paragraphs=False)
+    if {"missing_translation", "unterminated_section"} & set(parsed.problem_kinds()):
+        return False  # truncated, or not in the output format at all
+    try:
+        json.loads(extract_glossary_block(text, parsed)[0])
+    except (TranslationError, json.JSONDecodeError):
+        return False
+    return True
 
-    print("\n=== Raw Model Output (truncated) ===\n")
-    print(text)
-    print("\n=== End Raw Output ===\n")
 
-    # ---------------- Extraction Phase ----------------
-    # 1. Extract glossary JSON between markers first (we need to locate it to split translation).
-    glossary_match = re.search(r"=== GLOSSARY START ===\s*({[\s\S]*?})\s*=== GLOSSARY END ===", text)
-    reason = None
-    if glossary_match:
-        reason = "marker-based glossary block"
-        raw_glossary_block = glossary_match.group(1)
-    else:
-        # Fallback to legacy fenced code parsing
-        fenced = re.search(r"```json\s*({[\s\S]+?})\s*```", text, flags=re.IGNORECASE) or \
-                 re.search(r"```\s*({[\s\S]+?})\s*```", text)
-        if fenced:
-            reason = "legacy fenced glossary block"
-            raw_glossary_block = fenced.group(1)
-        else:
-            # Last resort: trailing JSON object
-            trailing = re.search(r"({[\s\S]+})\s*$", text)
-            if trailing:
-                reason = "trailing JSON fallback"
-                raw_glossary_block = trailing.group(1)
-            else:
-                print("❌ Could not locate a JSON glossary block.")
-                return
+def chunk_output_validator(chunk):
+    def usable(text):
+        try:
+            parse_chunk_output(text, chunk)
+        except ChunkError:
+            return False
+        return True
+    return usable
 
-    # Translation portion is everything before glossary start marker (preferred)
-    if glossary_match:
-        translation_section = text[:glossary_match.start()].strip()
-    else:
-        translation_section = text[:text.find(raw_glossary_block)].strip()
 
+def apply_new_terms(glossary, raw_glossary_block, reason, source=""):
+    """Parse the model's glossary block, log new terms to the glossary store and merge them. Returns added keys."""
     # Parse glossary JSON
     try:
         new_terms = json.loads(raw_glossary_block)
     except json.JSONDecodeError as e:
-        print("❌ Glossary JSON block could not be parsed:", e)
-        print("Block preview:\n", raw_glossary_block[:500])
-        return
+        raise TranslationError(f"Glossary JSON block could not be parsed: {e}\nBlock preview:\n{raw_glossary_block[:500]}")
 
     print(f"ℹ️ Glossary block found via: {reason}. Keys received: {len(new_terms)}")
 
-    # Filter Hanzi keys ≥2 chars
-    filtered_terms = {
-        k: v for k, v in new_terms.items()
-        if len(re.findall(r"[\u4e00-\u9fff]", k)) >= 2 and not k in glossary
-    }
-    if len(filtered_terms) != len(new_terms):
-        skipped = [k for k in new_terms.keys() if k not in filtered_terms]
-        if skipped:
-            print(f"ℹ️ Filtered out existing or short/non-Hanzi keys: {skipped[:10]}{' …' if len(skipped) > 10 else ''}")
-
-    glossary, added_count, updated_count, added_keys, updated_keys, skipped_keys = merge_glossary(
-        glossary,
-        filtered_terms,
-        overwrite=False
-    )
-
-    if added_count or updated_count:
-        with open(GLOSSARY_PATH, "w", encoding="utf-8") as f:
-            json.dump(glossary, f, ensure_ascii=False, indent=2)
-        msg = f"📝 Appended {added_count} new glossary term{'s' if added_count != 1 else ''}."
-        if updated_count:
-            msg += f" Updated {updated_count} entr{'ies' if updated_count != 1 else 'y'}."
-        print(msg)
+    with GLOSSARY_LOCK:
+        # Filter Hanzi keys ≥2 chars
+        filtered_terms = {
+            k: v for k, v in new_terms.items()
+            if len(re.findall(r"[\u4e00-\u9fff]", k)) >= 2 and not k in glossary
+        }
+        if len(filtered_terms) != len(new_terms):
+            skipped = [k for k in new_terms.keys() if k not in filtered_terms]
+            if skipped:
+                print(f"ℹ️ Filtered out existing or short/non-Hanzi keys: {skipped[:10]}{' …' if len(skipped) > 10 else ''}")
+
+        # The store drops terms another process logged first, so every worker keeps the same value.
+        # `logged` is the result: when `glossary` is the store's own dict add() has already merged it.
+        logged = GLOSSARY_STORE.add(filtered_terms, source=source)
+        if glossary is not GLOSSARY_STORE.terms:
+            merge_glossary(glossary, logged, overwrite=False)
+        added_keys = list(logged)
+
         if added_keys:
+            print(f"📝 Appended {len(added_keys)} new glossary term{'s' if len(added_keys) != 1 else ''}.")
             print(f"   ➕ Added: {added_keys[:10]}{' …' if len(added_keys) > 10 else ''}")
+        else:
+            print("✅ No new glossary terms.")
+    return added_keys
+
+
+def annotated_chunk(chunk, annotate):
+    lines = annotate(chunk.before + chunk.lines + chunk.after)
+    a, b = len(chunk.before), len(chunk.before) + len(chunk.lines)
+    return Chunk(number=chunk.number, lines=lines[a:b], before=lines[:a], after=lines[b:])
+
+
+def translate_in_chunks(rules, indexed_source, *, chunk_chars=None, overlap=None, workers=None, retries=None,
+                        term_table=None, annotate=None):
+    """Translate paragraph-aligned chunks concurrently and stitch them into one model-style output.
+
+    A chunk whose output is unusable is re-requested up to `retries` times (unusable outputs are
+    never cached); only that chunk is repeated. The sizing arguments default to the CHUNK_* settings
+    as they are at call time. Returns (stitched_text, user_prompts).
+    """
+    chunk_chars = CHUNK_CHARS if chunk_chars is None else chunk_chars
+    overlap = CHUNK_OVERLAP if overlap is None else overlap
+    workers = CHUNK_WORKERS if workers is None else workers
+    retries = CHUNK_RETRIES if retries is None else retries
+    chunks = split_indexed_source(indexed_source, chunk_chars, overlap)
+    if annotate is not None:  # see request_annotator; context lines are annotated along with the chunk
+        chunks = [annotated_chunk(chunk, annotate) for chunk in chunks]
+    prompts = [build_prompts(rules, chunk.source, context_block(chunk, len(chunks)), term_table) for chunk in chunks]
+    print(f"✂️ Split into {len(chunks)} chunk(s) of ≤{chunk_chars} chars, {overlap} context paragraph(s) each side.")
+
+    labels = telemetry.current_context()
+
+    def run(i):
+        chunk = chunks[i]
+        system_prompt, user_prompt = prompts[i]
+        usable = chunk_output_validator(chunk)
+        for attempt in range(retries + 1):
+            with telemetry.context(**labels, stage="translate-chunk", chunk=chunk.number, attempt=attempt + 1):
+                output = call_gpt(system_prompt, user_prompt, validate=usable)
+            try:
+                return parse_chunk_output(output, chunk)
+            except ChunkError as e:
+                print(f"⚠️ Chunk {chunk.number} (@P{chunk.first}–@P{chunk.last}), attempt {attempt + 1}: {e}")
+        raise TranslationError(f"Chunk {chunk.number} (@P{chunk.first}–@P{chunk.last}) failed after {retries + 1} attempts.")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(run, range(len(chunks))))
+    return stitch(results), [user_prompt for _, user_prompt in prompts]
+
+
+def translate_chapter(chapter_num, *, rules=None, glossary=None, verbose=True, mirror_to_obsidian=True,
+                      update_index=True, chunk_chars=None, chunk_overlap=None, annotation_mode=None,
+                      annotation_every=None, use_memory=True, known=None):
+    """Translate piaotian_chapters/ch{chapter_num}.txt and write every output of the pass.
+
+    `rules` and `glossary` may be passed in so a batch shares one loaded copy; new glossary
+    terms are merged into the passed dict. Raises TranslationError if the output cannot be parsed.
+    With `chunk_chars` (default CHUNK_CHARS) > 0 the chapter is translated in concurrent chunks.
+    `annotation_mode`/`annotation_every` default to ANNOTATION_MODE/ANNOTATION_EVERY.
+    With `use_memory` paragraphs already in the translation memory are not sent (see translation_memory).
+    `known` maps @P numbers of this chapter to English to keep as is; those paragraphs are not sent either.
+    Returns a dict summary of the chapter.
+    """
+    chapter_file = f"ch{chapter_num}.txt"
+    input_path = Path(CHAPTER_DIR) / chapter_file
+    output_path = Path(OUTPUT_DIR) / f"ch{chapter_num}.md"
+    prompt_path = Path(PROMPT_DIR) / f"prompt_ch{chapter_num}.txt"
+    indexed_path = Path(INDEXED_DIR) / f"ch{chapter_num}_indexed.md"
+    obsidian_output_path = os.path.join(OBSIDIAN_REVIEW_DIR, f"ch{chapter_num}.md")
+
+    with profiling.phase("load files"):
+        if rules is None:
+            rules = load_file(RULES_PATH)
+        if glossary is None:
+            glossary = GLOSSARY_STORE.load()
+        chapter_text = load_file(input_path)
+    known = known or {}
+
+    with GLOSSARY_LOCK:
+        merge_glossary(glossary, GLOSSARY_STORE.refresh())  # terms logged by other translators meanwhile
+        glossary_snapshot = dict(glossary)  # other workers may add terms while we annotate
+    # One scan of the chapter finds the glossary terms present; annotation and QA reuse it.
+    with profiling.phase("glossary scan", cpu=True):
+        hits = find_terms(chapter_text, load_matcher(glossary_snapshot))
+    print(f"🔤 {len(hits)} glossary term{'s' if len(hits) != 1 else ''} present in ch{chapter_num}.")
+    annotation_mode = annotation_mode or ANNOTATION_MODE
+    indexed_source = build_indexed_source(chapter_text, glossary_snapshot, hits, mode=annotation_mode,
+                                          every=annotation_every or ANNOTATION_EVERY)
+    term_table = glossary_table(hits) if annotation_mode == "table" else None
+    if not indexed_source:
+        raise TranslationError(f"{input_path} has no paragraphs to translate.")
+    paragraph_count = indexed_source.count("\n") + 1
+    if known and max(known) > paragraph_count:
+        raise TranslationError(f"Known paragraphs go up to @P{max(known)} but ch{chapter_num} has {paragraph_count}.")
+    with profiling.phase("save outputs"):
+        save_file(indexed_path, indexed_source)
+    annotate = request_annotator(chapter_text, glossary_snapshot, hits.matcher, annotation_mode,
+                                 annotation_every or ANNOTATION_EVERY, paragraph_count)
+
+    memory = get_default_memory() if use_memory else None
+    reused, memory_entries = {}, {}
+    to_send = [line for line in indexed_source.split("\n") if int(INDEXED_LINE_RE.match(line).group(1)) not in known]
+    if memory is not None:
+        with profiling.phase("translation memory"):
+            reused, to_send, memory_entries = memory_lookup(memory, indexed_source, hits, annotation_mode, known)
+        if reused:
+            print(f"🧠 Translation memory: {len(reused)}/{len(memory_entries) - len(known)} paragraphs reused, "
+                  f"{len(to_send)} to translate.")
+    prefilled = {**known, **reused}
+    if not prefilled:
+        to_translate = indexed_source
     else:
-        print("✅ No new glossary terms.")
+        with profiling.phase("annotate", cpu=True):
+            to_translate = "\n".join(annotate(to_send) if annotate and to_send else to_send)
 
-    # Save translation (exclude QA & glossary sections for now – we keep everything before glossary)
-    save_file(output_path, translation_section)
+    with profiling.phase("build prompt", cpu=True):
+        context = partial_context(to_send, prefilled) if prefilled else None
+        system_prompt, user_prompt = build_prompts(rules, to_translate, context, term_table=term_table)
 
+    chunk_chars = CHUNK_CHARS if chunk_chars is None else chunk_chars
+    chunked = chunk_chars > 0 and len(to_translate) > chunk_chars
 
+    if verbose and not chunked:
+        print("\n=== FINAL PROMPT SENT TO GPT (preview) ===\n")
+        print(user_prompt)
+        print("\n=== END PROMPT PREVIEW ===\n")
 
-    save_file(prompt_path, user_prompt)
+    print(f"🚀 Translating Chapter {chapter_num}...")
+    with telemetry.context(chapter=chapter_num):
+        if not to_translate:
+            response = stitch([(prefilled, [], {})])  # every paragraph is already known: no request
+            user_prompt = "(all paragraphs already translated; nothing sent)"
+        elif chunked:
+            response, chunk_prompts = translate_in_chunks(
+                rules, to_translate, chunk_chars=chunk_chars,
+                overlap=chunk_overlap, term_table=term_table,
+                annotate=annotate,
+            )
+            user_prompt = "\n\n=== NEXT CHUNK PROMPT ===\n\n".join(chunk_prompts)
+        else:
+            response = call_gpt(system_prompt, user_prompt, validate=usable_output)
+    if prefilled and to_translate:
+        response = fill_known_paragraphs(response, prefilled)
 
-    cleaned = transform(translation_section)
-    save_file(obsidian_output_path, cleaned)
+    text = response
 
-    # Update index
-    obsidian_chapters_dir = "/Users/meecosha/MEGA/Vault/Martial Peak/chapters"
-    update_chapters_index(obsidian_chapters_dir, os.path.join(obsidian_chapters_dir, "chapters.json"))
+    if verbose:
+        print("\n=== Raw Model Output (truncated) ===\n")
+        print(text)
+        print("\n=== End Raw Output ===\n")
 
-    print(f"🎉 Chapter saved to: {output_path} and to Obsidian")
+    # ---------------- Extraction Phase ----------------
+    with profiling.phase("extract output", cpu=True):
+        parsed = parse_model_output(text, expected=range(1, paragraph_count + 1))
+        raw_glossary_block, translation_section, reason = extract_glossary_block(text, parsed)
+    if parsed.problems:
+        print(f"⚠️ Output check: {'; '.join(map(str, parsed.problems))}")
+    with profiling.phase("glossary merge"):
+        added_keys = apply_new_terms(glossary, raw_glossary_block, reason, source=f"ch{chapter_num}")
+
+    # Save translation (exclude QA & glossary sections for now – we keep everything before glossary)
+    with profiling.phase("save outputs"):
+        save_file(output_path, translation_section)
+        save_file(source_snapshot_path(chapter_num), chapter_text)  # only once the translation exists
+
+    memory_stats = remember_paragraphs(memory, memory_entries, reused, known, parsed, chapter_num) if memory else {}
+
+    with profiling.phase("glossary QA", cpu=True):
+        glossary_misses = missing_translations(hits, translation_section)
+    if glossary_misses:
+        shown = ", ".join(f"{k} → {v}" for k, v in glossary_misses[:10])
+        print(f"🔎 Glossary QA: {len(glossary_misses)} term(s) not found in the translation: {shown}{' …' if len(glossary_misses) > 10 else ''}")
+
+    with profiling.phase("save outputs"):
+        save_file(prompt_path, user_prompt)
+
+    if mirror_to_obsidian:
+        with profiling.phase("cleanup transform", cpu=True):
+            cleaned = transform(translation_section)
+        save_file(obsidian_output_path, cleaned)
+
+        if update_index:
+            with profiling.phase("update index", cpu=True):
+                update_chapters_index(OBSIDIAN_CHAPTERS_DIR, os.path.join(OBSIDIAN_CHAPTERS_DIR, "chapters.json"))
+
+    print(f"🎉 Chapter saved to: {output_path}{' and to Obsidian' if mirror_to_obsidian else ''}")
+    return {
+        "chapter": chapter_num,
+        "output_path": str(output_path),
+        "paragraphs": paragraph_count,
+        "added_terms": added_keys,
+        "glossary_misses": glossary_misses,
+        "output_problems": [p.kind for p in parsed.problems],
+        "known_paragraphs": len(known),
+        "sent_paragraphs": len(to_send),
+        **memory_stats,
+    }
+
+
+# =============================================================
+# Main (refactored prompt)
+# =============================================================
+
+def main():
+    # chapter_num = get_next_chapter_number()
+    chapter_num = "0694"
+    print(chapter_num)
+    profiling.enable_from_env()
+    try:
+        translate_chapter(chapter_num)
+    except TranslationError as e:
+        print(f"❌ {e}")
+    if GLOSSARY_STORE.maybe_compact():
+        print(f"🗜️ Compacted the glossary log into {GLOSSARY_PATH}.")
+    profiling.report()
 
 
 if __name__ == "__main__":